@@ -8,26 +8,17 @@
 # - Visualizations and CSV export
 # ---------------------------------------------------------------
 
-import pandas as pd
-import matplotlib.pyplot as plt
 from datetime import datetime
+import argparse
 import os
-from database import connect, check_monthly_budget
+from database import create_table, create_budget_table, check_monthly_budget
+from csv_io import write_transactions_csv
+import profiling
+# pandas/numpy (data_loader, insights) and matplotlib (charts) are imported
+# by the features that use them, so the module itself loads quickly
 
 # Export folder
 EXPORT_DIR = "data"
-os.makedirs(EXPORT_DIR, exist_ok=True)
-
-def load_data():
-    """Load all transactions from the SQLite database into a pandas DataFrame."""
-    conn = connect()  # Use the centralized connect function
-    # Query columns that exist in the database schema
-    query = "SELECT date, category, amount, type FROM transactions"
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    return df
 
 # 🧠 NEW: Generate Smart Insights
 def generate_insights(df):
@@ -36,41 +27,23 @@ def generate_insights(df):
         print("⚠️ No data available for insights.")
         return
 
-    # Current month filter
-    now = datetime.now()
-    this_month = df[df['date'].dt.month == now.month]
+    from insights import month_insights
 
-    if this_month.empty:
+    # Current month, computed in one pass over just this month's rows
+    insight = month_insights(df)
+    if insight['rows'].empty:
         print("\n📅 No transactions for this month yet.")
         return
 
-    # Basic stats
-    income = this_month.loc[this_month['type'] == 'income', 'amount'].sum()
-    expense = this_month.loc[this_month['type'] == 'expense', 'amount'].sum()
-    balance = income - expense
-    avg_daily_expense = this_month.loc[this_month['type'] == 'expense', 'amount'].sum() / max(1, this_month['date'].dt.day.nunique())
-
-    # Top 3 categories
-    top_categories = (
-        this_month[this_month['type'] == 'expense']
-        .groupby('category')['amount']
-        .sum()
-        .sort_values(ascending=False)
-        .head(3)
-    )
-
-    # Compare with last month (if data available)
-    last_month_num = now.month - 1 if now.month > 1 else 12
-    last_month = df[df['date'].dt.month == last_month_num]
-    if not last_month.empty:
-        last_income = last_month.loc[last_month['type'] == 'income', 'amount'].sum()
-        last_expense = last_month.loc[last_month['type'] == 'expense', 'amount'].sum()
-        savings_change = ((balance - (last_income - last_expense)) / max(1, (last_income - last_expense))) * 100
-    else:
-        savings_change = None
+    income = insight['total_income']
+    expense = insight['total_expense']
+    balance = insight['balance']
+    avg_daily_expense = insight['avg_daily_expense']
+    top_categories = insight['top_categories']
+    savings_change = insight['savings_change']
 
     print("\n===== 💡 SMART FINANCIAL INSIGHTS =====")
-    print(f"📆 Month: {now.strftime('%B %Y')}")
+    print(f"📆 Month: {insight['label']}")
     print(f"💰 Total Income: Ksh {income:,.2f}")
     print(f"💸 Total Expense: Ksh {expense:,.2f}")
     print(f"🪙 Balance: Ksh {balance:,.2f}")
@@ -112,30 +85,27 @@ def summarize_data(df):
 
 def plot_income_vs_expense(df):
     """Plot monthly income vs expense bar chart."""
-    df['month'] = df['date'].dt.to_period('M')
-    monthly_summary = df.groupby(['month', 'type'])['amount'].sum().unstack(fill_value=0)
-
-    monthly_summary.plot(kind='bar', figsize=(10, 6))
-    plt.title("Monthly Income vs Expense")
-    plt.xlabel("Month")
-    plt.ylabel("Amount (Ksh)")
-    plt.legend(title="Type")
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    plt.tight_layout()
+    import matplotlib.pyplot as plt
+    import charts
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    charts.draw_monthly_chart(ax, charts.monthly_totals(df))
+    fig.tight_layout()
     plt.show()
 
 def plot_expense_distribution(df):
     """Plot a pie chart showing expense distribution by category."""
-    expense_df = df[df['type'] == 'expense']
-    if expense_df.empty:
+    import matplotlib.pyplot as plt
+    import charts
+
+    category_sum = charts.category_totals(df)
+    if category_sum.empty:
         print("⚠️ No expense data to visualize yet.")
         return
 
-    category_sum = expense_df.groupby('category')['amount'].sum()
-    plt.figure(figsize=(7, 7))
-    plt.pie(category_sum, labels=category_sum.index, autopct='%1.1f%%', startangle=90)
-    plt.title("Expense Distribution by Category")
-    plt.tight_layout()
+    fig, ax = plt.subplots(figsize=(7, 7))
+    charts.draw_category_pie(ax, category_sum)
+    fig.tight_layout()
     plt.show()
 
 def export_to_csv(df):
@@ -145,25 +115,42 @@ def export_to_csv(df):
         return
 
     filename = f"transactions_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.csv"
+    os.makedirs(EXPORT_DIR, exist_ok=True)
     filepath = os.path.join(EXPORT_DIR, filename)
-    df.to_csv(filepath, index=False)
+    # Stream straight from the database instead of serializing the DataFrame
+    columns = ("date", "category", "amount", "type")
+    write_transactions_csv(filepath, header=columns, columns=columns)
     print(f"✅ Data exported successfully to: {filepath}")
 
 def export_current_month_to_csv(df):
     """Export only the current month's transactions to a CSV file."""
+    from data_loader import COLUMNS
+    from insights import month_rows
+
     now = datetime.now()
-    this_month_df = df[df['date'].dt.month == now.month]
+    this_month_df = month_rows(df, now.year, now.month)
 
     if this_month_df.empty:
         print(f"⚠️ No transactions found for {now.strftime('%B %Y')} to export.")
         return
 
     filename = f"transactions_{now.strftime('%Y-%m')}.csv"
+    os.makedirs(EXPORT_DIR, exist_ok=True)
     filepath = os.path.join(EXPORT_DIR, filename)
-    this_month_df.to_csv(filepath, index=False)
+    this_month_df[COLUMNS].to_csv(filepath, index=False)
     print(f"✅ Current month's data exported successfully to: {filepath}")
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize, chart and export the ledger.")
+    profiling.add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with profiling.profile_command(args, "analysis"):
+        run_analysis()
+
+def run_analysis():
+    from data_loader import load_data
+
     print("📊 Loading data from database...")
     df = load_data()
 
@@ -199,4 +186,7 @@ def main():
             print("❌ Invalid choice. Please try again.")
 
 if __name__ == "__main__":
+    # Ensure all tables (and schema migrations) exist on startup
+    create_table()
+    create_budget_table()
     main()
@@ -3,30 +3,297 @@ Finance Tracker - Flask Web Application
 Web interface for managing personal finances
 """
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for
-from datetime import datetime
+from flask import (Flask, render_template, request, jsonify, redirect, url_for, Response, stream_with_context,
+                   make_response, copy_current_request_context, send_from_directory, g)
+from werkzeug.http import is_resource_modified
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+import hashlib
 import os
+import threading
+import time
 from database import (
-    create_table,
-    create_budget_table,
-    add_transaction,
+    initialize_schema,
     get_summary,
     get_expenses_by_category,
-    get_all_transactions,
+    get_transactions_page,
     set_monthly_budget,
     check_monthly_budget,
-    get_transaction_by_id,
     delete_transaction_by_id,
     update_transaction_by_id,
+    apply_transaction_batch,
+    totals_between,
+    get_balance_history,
+    DuplicateTransactionError,
+    DUPLICATE_MODES,
+    PAGE_SIZE,
+    get_data_version,
 )
-from database import connect
+from database import get_connection, month_key
+from csv_io import stream_transactions_csv, import_csv, describe_import
+from live_updates import hub, event_stream
+from executor import Busy, EndpointLimit, lane
+import ingest
+import jobs
+import metrics
+import profiling
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-change-this'
-
-# Initialize database on startup
-create_table()
-create_budget_table()
+# Serialized JSON bodies kept by the response cache
+app.config['RESPONSE_CACHE_SIZE'] = 256
+# Background job worker threads per process (0: leave jobs to `python jobs.py`)
+app.config['JOB_WORKERS'] = 1
+# Open /api/events streams per process; each holds a server thread, so keep
+# this below the threads per worker. Further dashboards get a 503 and poll
+app.config['LIVE_UPDATE_CLIENTS'] = 4
+
+
+@app.before_request
+def ensure_schema():
+    """
+    Create/migrate the schema on the first request a process serves.
+    serve.py does this once before starting workers, so there this is
+    only a set lookup; it covers `flask run` and other WSGI servers.
+    """
+    initialize_schema()
+
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+def record_request(status, error=None):
+    """Add the current request's latency to its route's histogram (once per request)."""
+    started = g.pop('request_started', None)
+    if started is None or not metrics.ENABLED:
+        return
+    # Group by route template, so /api/jobs/<job_id> is one series; unmatched URLs share one
+    route = request.url_rule.rule if request.url_rule else '<unmatched>'
+    metrics.registry.observe_request(request.method, route, status, time.perf_counter() - started, error)
+
+
+@app.after_request
+def record_latency(response):
+    error = None
+    if response.status_code >= 500:
+        error = g.pop('server_error', None)
+        if error is None and response.is_json:
+            body = response.get_json(silent=True) or {}
+            error = body.get('error') or body.get('message')
+    record_request(response.status_code, error)
+    return response
+
+
+@app.teardown_request
+def record_failure(exc):
+    # Requests whose response never reached after_request
+    if exc is not None:
+        record_request(500, str(exc))
+
+
+@app.before_request
+def start_profile():
+    """Profile this request if it asks to (X-Profile header or ?profile=) or is sampled."""
+    trigger = request.headers.get('X-Profile') or request.args.get('profile')
+    if profiling.requested(trigger, debug=app.debug or app.testing) or profiling.sampled():
+        g.profiler = profiling.start()
+
+
+def finish_profile():
+    """Stop and save the current request's profile; returns the saved file paths, if any."""
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return None
+    profiling.stop(profiler)
+    return profiling.save_profile(profiler, f"{request.method} {request.path}")
+
+
+@app.after_request
+def save_profile(response):
+    try:
+        files = finish_profile()
+    except OSError as e:
+        app.logger.warning("Could not save request profile: %s", e)
+        return response
+    if files:
+        response.headers['X-Profile-File'] = os.path.basename(files['profile'])
+    return response
+
+
+@app.teardown_request
+def discard_profile(exc):
+    # A request that failed before after_request still has to release the profiler
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiling.stop(profiler)
+
+
+def warmup():
+    """
+    Prime a fresh worker before it takes traffic: open the pooled
+    connection, compile the dashboard template and fill the response
+    cache (and SQLite's page cache) for the dashboard's JSON endpoints.
+    """
+    initialize_schema()
+    start_job_workers()
+    with app.test_client() as client:
+        for path in ('/', '/api/summary', '/api/monthly-summary', '/api/category-distribution',
+                     '/api/expenses-by-category', '/api/transactions?limit=5'):
+            client.get(path)
+
+
+def page_args():
+    """
+    Read pagination and filter query parameters shared by the transaction
+    listing endpoints: limit, after, type, category, start, end.
+    """
+    trans_type = request.args.get('type', '').lower().strip() or None
+    if trans_type not in (None, 'income', 'expense'):
+        raise ValueError('Invalid transaction type')
+    return {
+        'limit': request.args.get('limit', PAGE_SIZE, type=int),
+        'after': request.args.get('after') or None,
+        'transaction_type': trans_type,
+        'category': request.args.get('category', '').strip() or None,
+        'start_date': request.args.get('start') or None,
+        'end_date': request.args.get('end') or None,
+    }
+
+
+class ResponseCache:
+    """Bounded, thread-safe LRU of serialized response bodies."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache(app.config['RESPONSE_CACHE_SIZE'])
+
+
+def start_job_workers():
+    """Start this process's background job workers, if configured."""
+    if app.config['JOB_WORKERS'] > 0:
+        jobs.pool.start(app.config['JOB_WORKERS'])
+
+
+def busy_response(error):
+    """503 with a Retry-After hint for work rejected by a full lane or endpoint limit."""
+    response = jsonify({'success': False, 'error': str(error), 'message': str(error)})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def run_on_lane(name, fn, *args, request_context=False, **kwargs):
+    """
+    Run fn on the named executor lane and wait for its result; with
+    request_context, fn runs in a copy of the current request context.
+    A profiled request runs fn inline instead: cProfile only sees the
+    thread that enabled it, and the lane's work is what is worth profiling.
+    """
+    if g.get('profiler') is not None:
+        # Inline, fn already has the request context (pushing a copy would tear it down afterwards)
+        return fn(*args, **kwargs)
+    if request_context:
+        fn = copy_current_request_context(fn)
+    return lane(name).run(fn, *args, **kwargs)
+
+
+def limited(limit, wait=0.0, retry_after=1):
+    """
+    Cap how many requests this endpoint serves at once (per process).
+    Requests over the cap wait up to `wait` seconds, then get a 503. For
+    streamed responses the slot is held until the stream is closed.
+    """
+    def decorator(view):
+        gate = EndpointLimit(view.__name__, limit, wait, retry_after)
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                gate.acquire()
+            except Busy as e:
+                return busy_response(e)
+            try:
+                response = make_response(view(*args, **kwargs))
+            except BaseException:
+                gate.release()
+                raise
+            if response.is_streamed:
+                response.call_on_close(gate.release)
+            else:
+                gate.release()
+            return response
+        return wrapper
+    return decorator
+
+
+def cached_json(view):
+    """
+    Serve a read-only JSON endpoint through the response cache.
+    The ledger's data version (bumped by database triggers on every write to
+    transactions or budget) and today's date, for endpoints that default to
+    the current month, identify the representation: they form a strong ETag
+    and the LRU key, so conditional GETs get a 304 and unchanged data is
+    served without running the view. Error responses are never cached.
+    Misses run on the interactive executor lane, so they never wait
+    behind imports or exports.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        generation, budget_generation, modified_at = get_data_version()
+        today = datetime.now().date()
+        key = (request.path, request.query_string, generation, budget_generation, today)
+        etag = hashlib.blake2b(repr(key).encode(), digest_size=12).hexdigest()
+        # Date-dependent defaults change at midnight even without a write
+        midnight = datetime.combine(today, datetime.min.time()).astimezone(timezone.utc)
+        last_modified = max(datetime.fromtimestamp(modified_at, timezone.utc), midnight)
+
+        if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            response = Response(status=304)
+        else:
+            body = response_cache.get(key)
+            if body is None:
+                # Run the queries on the bounded interactive lane
+                render = lambda: make_response(view(*args, **kwargs))
+                try:
+                    response = run_on_lane('interactive', render, request_context=True)
+                except Busy as e:
+                    return busy_response(e)
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                response_cache.put(key, body)
+            response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        # Let browsers keep the body but revalidate it on every request
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return wrapper
 
 
 @app.route('/')
@@ -35,7 +302,7 @@ def index():
     total_income, total_expense, balance = get_summary()
     budget_status = check_monthly_budget()
     expenses_by_category = get_expenses_by_category()
-    recent_transactions = get_all_transactions()[:5]  # Get last 5 transactions
+    recent_transactions, _ = get_transactions_page(limit=5)  # Get last 5 transactions
     
     return render_template('dashboard.html',
                          total_income=total_income,
@@ -64,14 +331,59 @@ def api_add_transaction():
         if amount <= 0:
             return jsonify({'success': False, 'message': 'Amount must be greater than 0'}), 400
         
-        add_transaction(trans_type, category, amount)
-        return jsonify({'success': True, 'message': f'{trans_type.capitalize()} added successfully!'})
+        # Committed together with concurrent writes by the group-commit writer
+        row = (trans_type, category, amount, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), None)
+        transaction_id, = ingest.writer.write([row])
+        return jsonify({'success': True, 'id': transaction_id,
+                        'message': f'{trans_type.capitalize()} added successfully!'})
     
+    except Busy as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@app.route('/api/ingest', methods=['POST'])
+def api_ingest():
+    """
+    Record a batch of transactions, e.g. forwarded mobile-money or POS
+    notifications. JSON body: a list of transactions, or
+    {"transactions": [...]}; each has type, category, amount, and
+    optionally date and reference. A transaction whose reference was
+    already recorded (with the same details) is reported as a duplicate,
+    so retried deliveries are safe.
+    Responds once the whole batch is durably committed.
+    """
+    try:
+        data = request.get_json(silent=True)
+        items = data.get('transactions') if isinstance(data, dict) else data
+        if not isinstance(items, list) or not items:
+            return jsonify({'success': False, 'message': 'Expected a non-empty list of transactions'}), 400
+        if len(items) > ingest.MAX_REQUEST_ROWS:
+            return jsonify({'success': False,
+                            'message': f'At most {ingest.MAX_REQUEST_ROWS} transactions per request'}), 413
+
+        rows, errors = [], []
+        for index, item in enumerate(items):
+            try:
+                rows.append(ingest.parse_row(item))
+            except ValueError as e:
+                errors.append({'index': index, 'message': str(e)})
+        if errors:
+            return jsonify({'success': False, 'message': 'Invalid transactions; nothing was recorded',
+                            'errors': errors[:100]}), 400
+
+        ids = ingest.writer.write(rows)
+        inserted = sum(1 for transaction_id in ids if transaction_id is not None)
+        return jsonify({'success': True, 'inserted': inserted, 'duplicates': len(ids) - inserted, 'ids': ids})
+    except Busy as e:
+        return busy_response(e)
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
 @app.route('/api/summary')
+@cached_json
 def api_summary():
     """API endpoint to get financial summary."""
     try:
@@ -89,10 +401,18 @@ def api_summary():
 
 
 @app.route('/api/transactions')
+@cached_json
 def api_transactions():
-    """API endpoint to get all transactions."""
+    """
+    API endpoint to get one page of transactions, newest first.
+    Query params: limit, after (cursor from the previous page), type,
+    category, start and end ('YYYY-MM-DD').
+    """
     try:
-        transactions = get_all_transactions()
+        try:
+            transactions, next_cursor = get_transactions_page(**page_args())
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         trans_list = [{
             'id': t[0],
             'date': t[1],
@@ -100,12 +420,13 @@ def api_transactions():
             'amount': t[3],
             'type': t[4]
         } for t in transactions]
-        return jsonify(trans_list)
+        return jsonify({'transactions': trans_list, 'next_cursor': next_cursor})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/expenses-by-category')
+@cached_json
 def api_expenses_by_category():
     """API endpoint to get expenses grouped by category."""
     try:
@@ -120,49 +441,44 @@ def api_expenses_by_category():
 
 
 @app.route('/api/monthly-summary')
+@cached_json
 def api_monthly_summary():
     """Return monthly totals for income and expense for the last 12 months."""
     try:
-        conn = connect()
-        cursor = conn.cursor()
-        # Group by year-month
-        cursor.execute("""
-            SELECT substr(date,1,7) as month,
-                   SUM(CASE WHEN type='income' THEN amount ELSE 0 END) as income,
-                   SUM(CASE WHEN type='expense' THEN amount ELSE 0 END) as expense
-            FROM transactions
-            GROUP BY month
-            ORDER BY month DESC
-            LIMIT 12
-        """)
-        rows = cursor.fetchall()
-        conn.close()
+        with get_connection() as conn:
+            # Group the per-(month, type, category) rollup by year-month
+            rows = conn.execute("""
+                SELECT month,
+                       SUM(CASE WHEN type='income' THEN total ELSE 0 END) as income,
+                       SUM(CASE WHEN type='expense' THEN total ELSE 0 END) as expense
+                FROM monthly_totals
+                GROUP BY month
+                ORDER BY month DESC
+                LIMIT 12
+            """).fetchall()
 
         # Return data in chronological order (oldest first)
         rows = list(reversed(rows))
-        result = [{'month': r[0], 'income': r[1] or 0, 'expense': r[2] or 0} for r in rows]
+        result = [{'month': f"{r[0] // 100:04d}-{r[0] % 100:02d}", 'income': r[1] or 0, 'expense': r[2] or 0} for r in rows]
         return jsonify(result)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/category-distribution')
+@cached_json
 def api_category_distribution():
     """Return expense totals per category for the current month."""
     try:
         from datetime import datetime
         month = datetime.now().strftime("%Y-%m")
-        conn = connect()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT category, SUM(amount) as total
-            FROM transactions
-            WHERE type='expense' AND substr(date,1,7)=?
-            GROUP BY category
-            ORDER BY total DESC
-        """, (month,))
-        rows = cursor.fetchall()
-        conn.close()
+        with get_connection() as conn:
+            rows = conn.execute("""
+                SELECT category, total
+                FROM monthly_totals
+                WHERE month = ? AND type='expense'
+                ORDER BY total DESC
+            """, (month_key(month),)).fetchall()
 
         result = [{'category': r[0], 'amount': r[1] or 0} for r in rows]
         return jsonify(result)
@@ -170,6 +486,64 @@ def api_category_distribution():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/balance-history')
+@limited(4, wait=2.0)
+@cached_json
+def api_balance_history():
+    """
+    Return the running balance per day between ?start= and ?end=
+    (YYYY-MM-DD, inclusive; default: the last 90 days).
+    """
+    try:
+        end = request.args.get('end') or datetime.now().strftime("%Y-%m-%d")
+        start = request.args.get('start') or (
+            datetime.strptime(end, "%Y-%m-%d") - timedelta(days=89)).strftime("%Y-%m-%d")
+        summary = totals_between(start, end)
+        return jsonify({
+            'start': summary['start'],
+            'end': summary['end'],
+            'opening_balance': summary['opening_balance'],
+            'closing_balance': summary['closing_balance'],
+            'days': get_balance_history(start, end),
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/range-summary')
+@cached_json
+def api_range_summary():
+    """
+    Return income, expense and net between ?start= and ?end= (YYYY-MM-DD,
+    inclusive; default: the current month to date) with opening and
+    closing balances.
+    """
+    try:
+        today = datetime.now()
+        start = request.args.get('start') or today.strftime("%Y-%m-01")
+        end = request.args.get('end') or today.strftime("%Y-%m-%d")
+        return jsonify(totals_between(start, end))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/events')
+@limited(app.config['LIVE_UPDATE_CLIENTS'], retry_after=60)
+def api_events():
+    """
+    Server-Sent Events stream of live updates (new, edited and deleted
+    transactions, imports, and the refreshed summary after each write).
+    At most LIVE_UPDATE_CLIENTS streams are open at once; the slot is freed
+    when the client disconnects.
+    """
+    return Response(stream_with_context(event_stream(hub.subscribe())), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 @app.route('/api/set-budget', methods=['POST'])
 def api_set_budget():
     """API endpoint to set monthly budget."""
@@ -192,10 +566,8 @@ def api_set_budget():
 def api_delete_transaction(trans_id):
     """API endpoint to delete a transaction."""
     try:
-        if not get_transaction_by_id(trans_id):
+        if not delete_transaction_by_id(trans_id):
             return jsonify({'success': False, 'message': 'Transaction not found'}), 404
-        
-        delete_transaction_by_id(trans_id)
         return jsonify({'success': True, 'message': 'Transaction deleted successfully!'})
     
     except Exception as e:
@@ -206,9 +578,6 @@ def api_delete_transaction(trans_id):
 def api_update_transaction(trans_id):
     """API endpoint to update a transaction."""
     try:
-        if not get_transaction_by_id(trans_id):
-            return jsonify({'success': False, 'message': 'Transaction not found'}), 404
-        
         data = request.get_json()
         new_type = data.get('type', '').lower()
         new_category = data.get('category', '').strip()
@@ -223,18 +592,112 @@ def api_update_transaction(trans_id):
         if new_amount <= 0:
             return jsonify({'success': False, 'message': 'Amount must be greater than 0'}), 400
         
-        update_transaction_by_id(trans_id, new_type, new_category, new_amount)
+        if not update_transaction_by_id(trans_id, new_type, new_category, new_amount):
+            return jsonify({'success': False, 'message': 'Transaction not found'}), 404
         return jsonify({'success': True, 'message': 'Transaction updated successfully!'})
     
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
+# Operations accepted in one /api/transactions/batch request
+MAX_BATCH_OPERATIONS = 10000
+
+
+def parse_batch_operation(item):
+    """Validate one /api/transactions/batch operation into a (kind, params) pair."""
+    if not isinstance(item, dict):
+        raise ValueError('each operation must be an object')
+    kind = str(item.get('op') or '').lower()
+    if kind == 'add':
+        if item.get('reference'):
+            raise ValueError('reference is only supported by /api/ingest')
+        return kind, ingest.parse_row(item)[:4]
+    if kind not in ('update', 'delete'):
+        raise ValueError("op must be 'add', 'update' or 'delete'")
+    transaction_id = item.get('id')
+    if isinstance(transaction_id, bool) or not isinstance(transaction_id, int) or transaction_id <= 0:
+        raise ValueError('id must be a positive integer')
+    if kind == 'delete':
+        return kind, (transaction_id,)
+
+    trans_type = category = amount = None
+    if item.get('type') is not None:
+        trans_type = str(item['type']).lower().strip()
+        if trans_type not in ('income', 'expense'):
+            raise ValueError("type must be 'income' or 'expense'")
+    if item.get('category') is not None:
+        category = str(item['category']).strip()
+        if not category:
+            raise ValueError('category must not be empty')
+    if item.get('amount') is not None:
+        try:
+            amount = float(item['amount'])
+        except (TypeError, ValueError):
+            raise ValueError('amount must be a number')
+        if not amount > 0:
+            raise ValueError('amount must be greater than 0')
+    if trans_type is None and category is None and amount is None:
+        raise ValueError('update needs at least one of type, category or amount')
+    return kind, (transaction_id, trans_type, category, amount)
+
+
+@app.route('/api/transactions/batch', methods=['POST'])
+def api_transactions_batch():
+    """
+    Add, update and delete many transactions in one database transaction.
+    JSON body: {"operations": [...], "atomic": true}, where each operation is
+    {"op": "add", "type", "category", "amount", "date"?},
+    {"op": "update", "id", and any of "type", "category", "amount"} or
+    {"op": "delete", "id"}.
+    With atomic (the default) nothing is applied if any update or delete
+    finds no transaction (409); otherwise those are skipped. Either way the
+    response reports a status per operation.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        items = data.get('operations') if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            return jsonify({'success': False, 'message': 'Expected a non-empty list of operations'}), 400
+        if len(items) > MAX_BATCH_OPERATIONS:
+            return jsonify({'success': False,
+                            'message': f'At most {MAX_BATCH_OPERATIONS} operations per request'}), 413
+
+        operations, errors = [], []
+        for index, item in enumerate(items):
+            try:
+                operations.append(parse_batch_operation(item))
+            except ValueError as e:
+                errors.append({'index': index, 'message': str(e)})
+        if errors:
+            return jsonify({'success': False, 'message': 'Invalid operations; nothing was applied',
+                            'errors': errors[:100]}), 400
+
+        result = apply_transaction_batch(operations, atomic=data.get('atomic', True) is not False)
+        if not result['applied']:
+            return jsonify({'success': False,
+                            'message': f"{result['not_found']} transactions were not found; nothing was applied",
+                            **result}), 409
+        return jsonify({'success': True, **result})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
 @app.route('/transactions')
 def transactions():
-    """View all transactions page."""
-    all_transactions = get_all_transactions()
-    return render_template('transactions.html', transactions=all_transactions)
+    """View transactions page, one page at a time."""
+    filters = {k: v for k, v in request.args.items() if k != 'after' and v}
+    try:
+        page, next_cursor = get_transactions_page(**page_args())
+    except ValueError as e:
+        return render_template('transactions.html', transactions=[], filters=filters,
+                               error=str(e)), 400
+
+    next_url = url_for('transactions', after=next_cursor, **filters) if next_cursor else None
+    first_url = url_for('transactions', **filters) if request.args.get('after') else None
+    # Only the unfiltered newest page takes new rows pushed over /api/events
+    return render_template('transactions.html', transactions=page, filters=filters,
+                           next_url=next_url, first_url=first_url, live=not request.args)
 
 
 @app.route('/add')
@@ -257,35 +720,41 @@ def csv_page():
 
 
 @app.route('/api/export-csv')
+@limited(4, wait=1.0, retry_after=5)
 def api_export_csv():
-    """Export all transactions to CSV format."""
+    """
+    Stream transactions as a CSV download.
+    Query params: type, category, start and end ('YYYY-MM-DD') filters, and
+    gzip=1 to compress the file on the fly.
+    """
     try:
-        import csv
-        from io import StringIO
-        from flask import make_response
-        
-        transactions = get_all_transactions()
-        output = StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['ID', 'Date', 'Category', 'Amount', 'Type'])
-        for trans_id, date, category, amount, trans_type in transactions:
-            writer.writerow([trans_id, date, category, amount, trans_type])
-        
-        response = make_response(output.getvalue())
-        response.headers['Content-Disposition'] = f'attachment; filename=transactions_{datetime.now().strftime("%Y-%m-%d_%H-%M-%S")}.csv'
-        response.headers['Content-Type'] = 'text/csv'
+        args = page_args()
+        compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+        # Filters are validated here, before the response starts streaming
+        chunks = stream_transactions_csv(
+            compress=compress,
+            transaction_type=args['transaction_type'],
+            category=args['category'],
+            start_date=args['start_date'],
+            end_date=args['end_date'],
+        )
+
+        filename = f'transactions_{datetime.now().strftime("%Y-%m-%d_%H-%M-%S")}.csv'
+        response = Response(stream_with_context(chunks),
+                            mimetype='application/gzip' if compress else 'text/csv')
+        response.headers['Content-Disposition'] = f'attachment; filename={filename}{".gz" if compress else ""}'
         return response
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/import-csv', methods=['POST'])
+@limited(2, retry_after=5)
 def api_import_csv():
     """Import transactions from uploaded CSV file."""
     try:
-        import csv
-        from io import TextIOWrapper
-        
         if 'file' not in request.files:
             return jsonify({'success': False, 'message': 'No file part'}), 400
         
@@ -296,59 +765,190 @@ def api_import_csv():
         if not file.filename.endswith('.csv'):
             return jsonify({'success': False, 'message': 'File must be a CSV'}), 400
         
-        stream = TextIOWrapper(file.stream, encoding='utf-8')
-        reader = csv.DictReader(stream)
-        
-        transactions_to_add = []
-        skipped = 0
-        
-        for row_num, row in enumerate(reader, start=2):
-            try:
-                trans_type = row.get('type', '').lower().strip()
-                category = row.get('category', '').strip()
-                amount = float(row.get('amount', 0))
-                date_str = row.get('date', '').strip()
-                
-                if trans_type not in ['income', 'expense']:
-                    skipped += 1
-                    continue
-                
-                if not category or amount <= 0:
-                    skipped += 1
-                    continue
-                
-                if date_str:
-                    try:
-                        parsed_date = datetime.strptime(date_str, '%Y-%m-%d %H:%M:%S')
-                        date_str = parsed_date.strftime('%Y-%m-%d %H:%M:%S')
-                    except ValueError:
-                        try:
-                            parsed_date = datetime.strptime(date_str, '%Y-%m-%d')
-                            date_str = parsed_date.strftime('%Y-%m-%d %H:%M:%S')
-                        except ValueError:
-                            date_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                else:
-                    date_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                
-                transactions_to_add.append((trans_type, category, amount, date_str))
-            except Exception as e:
-                skipped += 1
-                continue
-        
-        if transactions_to_add:
-            from database import add_bulk_transactions
-            add_bulk_transactions(transactions_to_add)
-            message = f'Successfully imported {len(transactions_to_add)} transactions.'
-            if skipped > 0:
-                message += f' ({skipped} rows skipped due to errors).'
-            return jsonify({'success': True, 'message': message, 'imported': len(transactions_to_add)})
-        else:
-            return jsonify({'success': False, 'message': f'No valid transactions found to import. {skipped} rows skipped.'}), 400
+        mode = request.form.get('mode', 'skip')
+        try:
+            # Parse and insert on the bulk lane, away from the interactive threads
+            result = run_on_lane('bulk', import_csv, file.stream, on_duplicate=mode)
+        except Busy as e:
+            return busy_response(e)
+        except DuplicateTransactionError:
+            return jsonify({'success': False, 'message': 'Import cancelled: the file contains transactions that were already imported.'}), 409
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+
+        success, message = describe_import(result, mode)
+        payload = {
+            'success': success,
+            'message': message,
+            'imported': result['imported'],
+            'updated': result['updated'],
+            'duplicates': result['duplicates'],
+            'skipped': result['skipped'],
+            'rejects': [{'line': line, 'reason': reason} for line, reason in result['rejects']],
+        }
+        return jsonify(payload), 200 if success else 400
     
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error processing CSV: {str(e)}'}), 500
 
 
+def job_payload(job):
+    """JSON view of a job, with status and download URLs."""
+    return {
+        'id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'progress': job['progress'],
+        'message': job['message'],
+        'result': job['result'],
+        'error': job['error'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'status_url': url_for('api_job_status', job_id=job['id']),
+        'download_url': url_for('api_job_download', job_id=job['id']) if job['result_file'] else None,
+    }
+
+
+def queued_response(job_id):
+    """202 Accepted pointing at the new job's status URL."""
+    start_job_workers()
+    response = jsonify({'success': True, 'job_id': job_id,
+                        'status_url': url_for('api_job_status', job_id=job_id)})
+    response.status_code = 202
+    response.headers['Location'] = url_for('api_job_status', job_id=job_id)
+    return response
+
+
+@app.route('/api/jobs/report', methods=['POST'])
+def api_job_report():
+    """
+    Queue PDF reports. JSON body: month ('YYYY-MM', default: current month),
+    or start and end ('YYYY-MM') for a zip of one report per month.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        params = {key: data.get(key) or None for key in ('month', 'start', 'end')}
+        for value in params.values():
+            if value:
+                datetime.strptime(value, "%Y-%m")
+        if params['end'] and not params['start']:
+            raise ValueError('end requires start')
+        if params['start'] and params['end'] and params['start'] > params['end']:
+            raise ValueError('start must not be after end')
+        return queued_response(jobs.submit_job('report', params))
+    except ValueError as e:
+        message = str(e) if 'start' in str(e) else 'months must be in YYYY-MM format'
+        return jsonify({'success': False, 'message': message}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@app.route('/api/jobs/export', methods=['POST'])
+def api_job_export():
+    """
+    Queue a CSV export. JSON body: type, category, start and end
+    ('YYYY-MM-DD') filters and gzip (bool).
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        trans_type = (data.get('type') or '').lower().strip() or None
+        if trans_type not in (None, 'income', 'expense'):
+            raise ValueError('Invalid transaction type')
+        for key in ('start', 'end'):
+            if data.get(key):
+                datetime.strptime(data[key], "%Y-%m-%d")
+        params = {
+            'type': trans_type,
+            'category': (data.get('category') or '').strip() or None,
+            'start': data.get('start') or None,
+            'end': data.get('end') or None,
+            'gzip': bool(data.get('gzip')),
+        }
+        return queued_response(jobs.submit_job('export', params))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@app.route('/api/jobs/import', methods=['POST'])
+def api_job_import():
+    """Queue a CSV import. Form fields: file and mode ('skip', 'update' or 'fail')."""
+    try:
+        file = request.files.get('file')
+        if file is None or file.filename == '':
+            return jsonify({'success': False, 'message': 'No file selected'}), 400
+        if not file.filename.endswith('.csv'):
+            return jsonify({'success': False, 'message': 'File must be a CSV'}), 400
+        mode = request.form.get('mode', 'skip')
+        if mode not in DUPLICATE_MODES:
+            return jsonify({'success': False, 'message': f"mode must be one of: {', '.join(DUPLICATE_MODES)}"}), 400
+        return queued_response(jobs.submit_job('import', {'mode': mode}, upload=file.stream))
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@app.route('/api/jobs')
+def api_jobs():
+    """List the most recent background jobs."""
+    try:
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        return jsonify([job_payload(job) for job in jobs.list_jobs(limit)])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<job_id>')
+def api_job_status(job_id):
+    """Status and progress of one background job."""
+    try:
+        job = jobs.get_job(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job_payload(job))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/jobs/<job_id>/download')
+def api_job_download(job_id):
+    """Download a finished job's result file."""
+    job = jobs.get_job(job_id)
+    if job is None or not job['result_file']:
+        return jsonify({'error': 'No result file for this job'}), 404
+    return send_from_directory(os.path.abspath(jobs.job_dir(job_id)), job['result_file'], as_attachment=True)
+
+
+def metrics_access(view):
+    """Serve a metrics endpoint only to requests allowed by metrics.authorized()."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        auth = request.headers.get('Authorization', '')
+        token = auth[len('Bearer '):] if auth.startswith('Bearer ') else request.args.get('token')
+        if not metrics.authorized(token, debug=app.debug or app.testing):
+            return jsonify({'success': False, 'error': 'Not found'}), 404
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@app.route('/metrics')
+@metrics_access
+def prometheus_metrics():
+    """Request and SQL metrics of this process in the Prometheus text format."""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/debug/perf')
+@metrics_access
+def debug_perf():
+    """Slowest routes, costliest SQL statements, recent slow queries and server errors of this process."""
+    try:
+        return jsonify(metrics.perf_summary(top=request.args.get('top', 20, type=int)))
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @app.errorhandler(404)
 def page_not_found(e):
     """Handle 404 errors."""
@@ -358,9 +958,11 @@ def page_not_found(e):
 @app.errorhandler(500)
 def server_error(e):
     """Handle 500 errors."""
+    g.server_error = str(getattr(e, 'original_exception', None) or e)
     return render_template('500.html'), 500
 
 
 if __name__ == '__main__':
-    # Run the Flask app in debug mode (change to False in production)
+    # Development server with the reloader and debugger; use serve.py in production
+    metrics.log_slow_queries()
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,8 @@
+"""
+Benchmarks for the Finance Tracker.
+
+    python -m benchmarks.run --rows 10000 1000000 --output results.json   # suites on synthetic ledgers
+    python -m benchmarks.compare baseline.json results.json               # flag regressions
+    python -m benchmarks.synthetic --rows 50000 --csv statement.csv       # generate load data
+    python -m benchmarks.startup                                          # start-up cost of each entry point
+"""
@@ -0,0 +1,80 @@
+"""
+Compare two benchmark result files and flag regressions.
+
+    python -m benchmarks.compare baseline.json results.json --threshold 0.10
+
+Works with the output of benchmarks.run and benchmarks.startup. Every
+result with a median is matched by name (and ledger size); one whose
+median grew by more than --threshold (a fraction) and by at least
+--min-ms is reported as a regression, and the exit status is 1.
+"""
+import argparse
+import json
+import sys
+
+
+def flatten(results, prefix=""):
+    """Map 'ledger/benchmark' style paths to median milliseconds."""
+    medians = {}
+    for key, value in results.items():
+        if not isinstance(value, dict):
+            continue
+        path = f"{prefix}{key}"
+        if "median_ms" in value:
+            medians[path] = value["median_ms"]
+        else:
+            medians.update(flatten(value, path + "/"))
+    return medians
+
+
+def compare(old, new, threshold=0.10, min_ms=0.05):
+    """
+    Compare two result dictionaries.
+    Returns:
+        A list of (name, old_ms, new_ms, change) for every benchmark in both,
+        and the names of those that regressed.
+    """
+    old_medians, new_medians = flatten(old), flatten(new)
+    rows, regressions = [], []
+    for name in sorted(old_medians.keys() & new_medians.keys()):
+        before, after = old_medians[name], new_medians[name]
+        change = (after - before) / before if before else 0.0
+        rows.append((name, before, after, change))
+        if change > threshold and after - before >= min_ms:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("results")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative slowdown reported as a regression (default: 0.10)")
+    parser.add_argument("--min-ms", type=float, default=0.05,
+                        help="ignore slowdowns smaller than this many ms (default: 0.05)")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        old = json.load(f)
+    with open(args.results) as f:
+        new = json.load(f)
+    rows, regressions = compare(old, new, args.threshold, args.min_ms)
+    if not rows:
+        print("⚠️ The files have no benchmarks in common.")
+        return 1
+
+    print(f"{'Benchmark':<70} | {'before':>10} | {'after':>10} | {'change':>8}")
+    print("-" * 108)
+    for name, before, after, change in rows:
+        flag = " ❌" if name in regressions else ""
+        print(f"{name:<70} | {before:>10.2f} | {after:>10.2f} | {change:>+7.1%}{flag}")
+    if regressions:
+        print(f"\n❌ {len(regressions)} of {len(rows)} benchmarks slowed down by more than {args.threshold:.0%}.")
+        return 1
+    print(f"\n✅ No regressions in {len(rows)} benchmarks.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
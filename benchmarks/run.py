@@ -0,0 +1,413 @@
+"""
+Micro and macro benchmarks over synthetic ledgers.
+
+    python -m benchmarks.run --rows 10000 1000000 --output results.json
+    python -m benchmarks.run --rows 10000000 --suites db api --workdir /var/tmp/finance-bench
+    python -m benchmarks.compare baseline.json results.json
+
+For each ledger size a seeded synthetic ledger is built (see
+benchmarks.synthetic) in its own directory under --workdir, and reused by
+later runs with the same parameters. The suites:
+- db:       database.py read functions
+- api:      every app.py endpoint through the Flask test client, both
+            uncached (response cache cleared) and cached; writes included
+- csv:      both import paths (csv_io.import_csv from a file, as the CLI
+            does, and the /api/import-csv upload) plus the streaming export
+- analysis: data_loader.load_data (cold and warm) and analysis.generate_insights
+- report:   report_generator.main for one month and for a 12-month batch
+Writes go to the benchmark ledger, never to data/finance.db. Suites run in
+the order above, so the read benchmarks see the ledger as generated.
+
+Timings are wall-clock milliseconds (min, median, mean, max over --repeat
+runs after one warm-up run; --macro-repeat for whole-ledger operations).
+Results are written as JSON for benchmarks.compare.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from benchmarks.synthetic import add_generator_arguments, build_ledger, generator_options, write_csv
+
+SUITES = ("db", "api", "csv", "analysis", "report")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Benchmarks that read every row into Python are skipped above this size
+FULL_SCAN_LIMIT = 1000000
+
+
+def measure(fn, repeat, warmup=1, setup=None):
+    """
+    Time fn() repeat times after warmup untimed runs.
+    setup, if given, runs (untimed) before every call, e.g. to clear a cache.
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        "runs": repeat,
+        "min_ms": round(min(times), 3),
+        "median_ms": round(statistics.median(times), 3),
+        "mean_ms": round(statistics.fmean(times), 3),
+        "max_ms": round(max(times), 3),
+    }
+
+
+def skipped(reason):
+    return {"skipped": reason}
+
+
+def silenced(fn):
+    """Wrap fn so its progress messages do not interleave with the results."""
+    def call():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fn()
+    return call
+
+
+class Context:
+    """Options and state shared by the suites for one ledger."""
+
+    def __init__(self, args, rows, workspace, ledger):
+        self.args = args
+        self.rows = rows
+        self.workspace = workspace
+        self.ledger = ledger
+        self.repeat = args.repeat
+        self.macro_repeat = args.macro_repeat
+        self.results = {}
+
+    def record(self, name, fn, macro=False, **kwargs):
+        """Run one benchmark and store its result; errors are recorded, not raised."""
+        try:
+            self.results[name] = measure(fn, self.macro_repeat if macro else self.repeat,
+                                         warmup=0 if macro else 1, **kwargs)
+        except Exception as e:
+            self.results[name] = {"error": f"{type(e).__name__}: {e}"}
+        if not self.args.quiet:
+            result = self.results[name]
+            value = f"{result['median_ms']:>10.2f} ms" if "median_ms" in result else f"  {next(iter(result.values()))}"
+            print(f"   {name:<52} {value}")
+
+
+def latest_month():
+    import database
+
+    with database.get_connection() as conn:
+        last = conn.execute("SELECT MAX(date) FROM transactions").fetchone()[0]
+    return (last or datetime.now().strftime("%Y-%m"))[:7]
+
+
+def suite_db(ctx):
+    import database
+
+    month = latest_month()
+    start = f"{month}-01"
+    ctx.record("db.get_summary", database.get_summary)
+    ctx.record("db.get_expenses_by_category", database.get_expenses_by_category)
+    ctx.record("db.check_monthly_budget", lambda: database.check_monthly_budget(month))
+    ctx.record("db.get_transactions_page", database.get_transactions_page)
+    ctx.record("db.get_transactions_page[category]", lambda: database.get_transactions_page(category="Food"))
+    ctx.record("db.get_transactions_page[deep]", lambda: database.get_transactions_page(
+        after=database.encode_cursor("2000-01-01 00:00:00", 1)))
+    ctx.record("db.count_transactions", database.count_transactions)
+    ctx.record("db.count_transactions[month]", lambda: database.count_transactions(start_date=start))
+    ctx.record("db.totals_between", lambda: database.totals_between(start, f"{month}-28"))
+    ctx.record("db.get_balance_history[month]", lambda: database.get_balance_history(start, f"{month}-28"))
+    ctx.record("db.get_balance_history[year]", lambda: database.get_balance_history(
+        f"{int(month[:4]) - 1}{month[4:]}-01", f"{month}-28"))
+    ctx.record("db.balance_at", lambda: database.balance_at(start))
+    ctx.record("db.get_data_version", database.get_data_version)
+    ctx.record("db.iter_transactions[month]", lambda: sum(
+        len(batch) for batch in database.iter_transactions(start_date=start)))
+    if ctx.rows <= FULL_SCAN_LIMIT:
+        ctx.record("db.get_all_transactions", database.get_all_transactions, macro=True)
+    else:
+        ctx.results["db.get_all_transactions"] = skipped(f"more than {FULL_SCAN_LIMIT:,} rows")
+    ctx.record("db.verify_rollups", database.verify_rollups, macro=True)
+
+
+def suite_api(ctx):
+    import database
+    import app as webapp
+
+    webapp.app.config['JOB_WORKERS'] = 0  # keep background jobs from skewing the timings
+    client = webapp.app.test_client()
+    month = latest_month()
+    clear = webapp.response_cache.clear
+
+    def get(path, expect=200):
+        def call():
+            response = client.get(path)
+            response.get_data()
+            # Releases the endpoint's concurrency slot, as a server does when the response ends
+            response.close()
+            if response.status_code != expect:
+                raise RuntimeError(f"{path} answered {response.status_code}")
+        return call
+
+    for path in ("/", "/transactions", "/add", "/budget", "/csv"):
+        ctx.record(f"api.GET {path}", get(path))
+    for path in ("/api/summary", "/api/transactions", "/api/transactions?category=Food&limit=100",
+                 "/api/expenses-by-category", "/api/monthly-summary", "/api/category-distribution",
+                 "/api/balance-history", f"/api/balance-history?start={month}-01",
+                 f"/api/range-summary?start={month}-01", "/api/jobs"):
+        ctx.record(f"api.GET {path}", get(path), setup=clear)
+        ctx.record(f"api.GET {path} [cached]", get(path))
+    ctx.record(f"api.GET /api/export-csv?start={month}-01", get(f"/api/export-csv?start={month}-01"))
+    if ctx.rows <= FULL_SCAN_LIMIT:
+        ctx.record("api.GET /api/export-csv", get("/api/export-csv"), macro=True)
+    else:
+        ctx.results["api.GET /api/export-csv"] = skipped(f"more than {FULL_SCAN_LIMIT:,} rows")
+    # Streams until the client disconnects, so it has no meaningful latency
+    ctx.results["api.GET /api/events"] = skipped("long-lived event stream")
+
+    def post(path, body, method="post", expect=(200,)):
+        def call():
+            response = getattr(client, method)(path, json=body() if callable(body) else body)
+            if response.status_code not in expect:
+                raise RuntimeError(f"{path} answered {response.status_code}: {response.get_data(as_text=True)[:200]}")
+            return response
+        return call
+
+    ctx.record("api.POST /api/add-transaction",
+               post("/api/add-transaction", {"type": "expense", "category": "Bench", "amount": 12.5}))
+    counter = iter(range(10 ** 9))
+    ctx.record("api.POST /api/ingest [100 rows]", post("/api/ingest", lambda: [
+        {"type": "expense", "category": "Bench", "amount": 1 + i, "reference": f"bench-{next(counter)}"}
+        for i in range(100)]))
+    ctx.record("api.POST /api/set-budget", post("/api/set-budget", {"month": month, "amount": 60000}))
+
+    with database.get_connection() as conn:
+        ids = [row[0] for row in conn.execute(
+            "SELECT id FROM transactions WHERE type = 'expense' ORDER BY id DESC LIMIT 100")]
+    ctx.record("api.PUT /api/update-transaction/<id>", post(
+        f"/api/update-transaction/{ids[0]}", {"type": "expense", "category": "Bench", "amount": 9}, method="put"))
+    ctx.record("api.POST /api/transactions/batch [100 updates]", post("/api/transactions/batch", {
+        "operations": [{"op": "update", "id": i, "category": "Bench"} for i in ids]}))
+
+    added = []
+
+    def add_victim():
+        added.append(database.apply_transaction_batch(
+            [("add", ("expense", "Bench", 1.0, f"{month}-01 00:00:00"))])["results"][0]["id"])
+
+    ctx.record("api.DELETE /api/delete-transaction/<id>",
+               lambda: post(f"/api/delete-transaction/{added[-1]}", None, method="delete")(), setup=add_victim)
+
+    job_ids = []
+    ctx.record("api.POST /api/jobs/export", lambda: job_ids.append(
+        post("/api/jobs/export", {"start": f"{month}-01"}, expect=(202,))().get_json()["job_id"]))
+    ctx.record("api.POST /api/jobs/report", post("/api/jobs/report", {"month": month}, expect=(202,)))
+    ctx.record("api.GET /api/jobs/<job_id>", get(f"/api/jobs/{job_ids[-1]}"))
+
+    import jobs
+    # Run the queued jobs here instead of on background workers; the last export is timed
+    while True:
+        job = jobs.claim_job("benchmark")
+        if job is None:
+            break
+        if job["id"] == job_ids[-1]:
+            ctx.record("jobs.run_job[export month]", lambda job=job: jobs.run_job(job), macro=True)
+        else:
+            silenced(lambda: jobs.run_job(job))()
+    ctx.record("api.GET /api/jobs/<job_id>/download", get(f"/api/jobs/{job_ids[-1]}/download"))
+
+
+def suite_csv(ctx):
+    import app as webapp
+    from csv_io import import_csv, write_transactions_csv
+
+    rows = min(ctx.args.csv_rows, max(ctx.rows, 1000))
+    options = generator_options(ctx.args)
+    statements = os.path.join(ctx.workspace, "statements")
+    os.makedirs(statements, exist_ok=True)
+    runs = iter(range(10 ** 6))
+
+    def statement():
+        # A new seed each run, so every import inserts instead of skipping duplicates
+        path = os.path.join(statements, "statement.csv")
+        return write_csv(path, rows, seed=ctx.args.seed + 1000 + next(runs), **options)
+
+    paths = []
+    ctx.record(f"csv.import_csv[file, {rows} rows]", lambda: import_csv(paths[-1]),
+               setup=lambda: paths.append(statement()))
+    ctx.record(f"csv.import_csv[duplicates, {rows} rows]", lambda: import_csv(paths[-1]))
+
+    client = webapp.app.test_client()
+
+    def upload():
+        with open(paths[-1], "rb") as f:
+            response = client.post("/api/import-csv", data={"file": (f, "statement.csv")},
+                                   content_type="multipart/form-data")
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/import-csv answered {response.status_code}")
+
+    ctx.record(f"api.POST /api/import-csv[{rows} rows]", upload, setup=lambda: paths.append(statement()))
+
+    export = os.path.join(statements, "export.csv")
+    month = latest_month()
+    ctx.record("csv.write_transactions_csv[month]", lambda: write_transactions_csv(export, start_date=f"{month}-01"))
+    if ctx.rows <= FULL_SCAN_LIMIT:
+        ctx.record("csv.write_transactions_csv[all]", lambda: write_transactions_csv(export), macro=True)
+    else:
+        ctx.results["csv.write_transactions_csv[all]"] = skipped(f"more than {FULL_SCAN_LIMIT:,} rows")
+
+
+def suite_analysis(ctx):
+    import data_loader
+    import analysis
+
+    def cold():
+        data_loader._cache.update(key=None, frame=None)
+        shutil.rmtree(data_loader.snapshot_dir(), ignore_errors=True)
+
+    def forget_frame():
+        data_loader._cache.update(key=None, frame=None)
+
+    ctx.record("analysis.load_data[no snapshot]", data_loader.load_data, macro=True, setup=cold)
+    ctx.record("analysis.load_data[snapshot]", data_loader.load_data, setup=forget_frame)
+    ctx.record("analysis.load_data[cached]", data_loader.load_data)
+    df = data_loader.load_data()
+    ctx.record("analysis.generate_insights", silenced(lambda: analysis.generate_insights(df)))
+
+
+def suite_report(ctx):
+    import charts
+    import report_generator
+
+    month = latest_month()
+    year, mon = int(month[:4]), int(month[5:])
+    first = f"{year - 1:04d}-{mon % 12 + 1:02d}" if mon < 12 else f"{year:04d}-01"
+    output = os.path.join(ctx.workspace, "reports")
+
+    def clear_charts():
+        shutil.rmtree(charts.cache_dir(), ignore_errors=True)
+
+    def report(*argv):
+        return silenced(lambda: report_generator.main([*argv, "--output", output]))
+
+    ctx.record("report.main[month]", report("--month", month), setup=clear_charts)
+    ctx.record("report.main[month, cached chart]", report("--month", month))
+    ctx.record("report.main[12 months]", report("--from", first, "--to", month), macro=True, setup=clear_charts)
+    ctx.record("report.main[12 months, 1 process]", report("--from", first, "--to", month, "--processes", "1"),
+               macro=True, setup=clear_charts)
+
+
+SUITE_FUNCTIONS = {"db": suite_db, "api": suite_api, "csv": suite_csv, "analysis": suite_analysis,
+                   "report": suite_report}
+
+
+def prepare_ledger(args, rows):
+    """Build (or reuse) the ledger for one size; returns its workspace and description."""
+    options = generator_options(args)
+    name = f"ledger-{rows}-s{args.seed}-c{args.categories}-y{args.years:g}-i{args.income_share:g}"
+    workspace = os.path.join(os.path.abspath(args.workdir), name)
+    db_path = os.path.join(workspace, "data", "finance.db")
+    pristine = os.path.join(workspace, "pristine.db")
+    meta_path = os.path.join(workspace, "ledger.json")
+
+    import database
+    database.close_connections()
+    if args.rebuild or not (os.path.exists(pristine) and os.path.exists(meta_path)):
+        shutil.rmtree(workspace, ignore_errors=True)
+        print(f"🛠️  Building a {rows:,}-row ledger in {workspace} ...")
+        ledger = build_ledger(pristine, rows, args.seed, **options)
+        database.close_connections()
+        with open(meta_path, "w") as f:
+            json.dump(ledger, f, indent=2)
+    with open(meta_path) as f:
+        ledger = json.load(f)
+
+    # Benchmarks write to the ledger, so every run starts from a copy of the pristine one
+    shutil.rmtree(os.path.join(workspace, "data"), ignore_errors=True)
+    os.makedirs(os.path.dirname(db_path))
+    shutil.copyfile(pristine, db_path)
+    database.DB_NAME = db_path
+    database.close_connections()
+    database.initialize_schema()
+    return workspace, ledger
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Finance Tracker benchmarks on synthetic ledgers.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000],
+                        help="ledger sizes to benchmark (default: 10000)")
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per micro benchmark (default: 5)")
+    parser.add_argument("--macro-repeat", type=int, default=1,
+                        help="timed runs per whole-ledger benchmark (default: 1)")
+    parser.add_argument("--csv-rows", type=int, default=10000, help="rows per imported CSV (default: 10000)")
+    parser.add_argument("--workdir", default=os.path.join(ROOT, "data", "benchmarks"),
+                        help="where ledgers are built and kept (default: data/benchmarks)")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild ledgers even if a matching one exists")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--quiet", action="store_true", help="do not print each result")
+    add_generator_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.repeat < 1 or args.macro_repeat < 1:
+        parser.error("--repeat and --macro-repeat must be at least 1")
+
+    results = {
+        "benchmark": "suite",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": {"repeat": args.repeat, "macro_repeat": args.macro_repeat, "csv_rows": args.csv_rows,
+                   "seed": args.seed, "suites": args.suites, **generator_options(args)},
+        "ledgers": {},
+    }
+    cwd = os.getcwd()
+    try:
+        for rows in args.rows:
+            workspace, ledger = prepare_ledger(args, rows)
+            # Relative paths used by the tools (e.g. report output) land in the workspace
+            os.chdir(workspace)
+            ctx = Context(args, rows, workspace, ledger)
+            print(f"\n===== ⏱️  {rows:,} transactions =====")
+            for suite in SUITES:
+                if suite in args.suites:
+                    SUITE_FUNCTIONS[suite](ctx)
+            results["ledgers"][str(rows)] = {"ledger": ledger, "results": ctx.results}
+            os.chdir(cwd)
+    finally:
+        os.chdir(cwd)
+        import database
+        import ingest
+        ingest.writer.stop()
+        database.close_connections()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Start-up cost of the CLI and server entry points.
+
+Every measurement runs in a fresh interpreter, as a user or a cron job
+would start it:
+- imports: `python -X importtime -c "import <module>"`, reporting the
+  module's total (cumulative) import time and its heaviest dependencies;
+- commands: wall time of whole CLI invocations such as
+  `finance_tracker.py summary`.
+Commands run in a scratch directory with their own data/finance.db, so
+the real ledger is never touched.
+
+    python -m benchmarks.startup --repeat 7 --output startup.json
+
+Results are printed as a table and, with --output, written as JSON so
+runs can be compared over time.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules whose import cost is tracked
+ENTRY_MODULES = ("finance_tracker", "analysis", "report_generator", "jobs", "app", "serve")
+# Whole invocations, as argument lists relative to the repository root
+COMMANDS = {
+    "python (baseline)": ["-c", "pass"],
+    "finance_tracker --help": ["finance_tracker.py", "--help"],
+    "finance_tracker summary": ["finance_tracker.py", "summary"],
+    "finance_tracker add": ["finance_tracker.py", "add", "expense", "Benchmark", "1"],
+    "report_generator --help": ["report_generator.py", "--help"],
+}
+# Heaviest dependencies listed per module
+TOP_IMPORTS = 5
+
+
+def _run(args, cwd):
+    env = dict(os.environ, PYTHONPATH=ROOT, MPLBACKEND="Agg")
+    return subprocess.run([sys.executable] + args, cwd=cwd, env=env,
+                          capture_output=True, text=True, check=True)
+
+
+def parse_importtime(stderr):
+    """Parse `-X importtime` output into (module, self_us, cumulative_us, depth) rows."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:
+            continue  # the header line
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), self_us, cumulative_us, depth))
+    return rows
+
+
+def measure_import(module, repeat, cwd):
+    """Median total import time of module, in ms, and its heaviest direct dependencies."""
+    totals, heaviest = [], {}
+    for _ in range(repeat):
+        rows = parse_importtime(_run(["-X", "importtime", "-c", f"import {module}"], cwd).stderr)
+        total = next((cum for name, _, cum, depth in rows if name == module and depth == 0), None)
+        if total is None:
+            raise RuntimeError(f"no import time reported for {module}")
+        totals.append(total / 1000)
+        for name, _, cum, depth in rows:
+            if depth == 1:
+                heaviest.setdefault(name, []).append(cum / 1000)
+    top = sorted(((statistics.median(v), k) for k, v in heaviest.items()), reverse=True)[:TOP_IMPORTS]
+    return {
+        "median_ms": round(statistics.median(totals), 2),
+        "min_ms": round(min(totals), 2),
+        "heaviest": {name: round(ms, 2) for ms, name in top},
+    }
+
+
+def measure_command(args, repeat, cwd):
+    """Median and best wall time of a whole invocation, in ms."""
+    args = [os.path.join(ROOT, args[0])] + args[1:] if args[0].endswith(".py") else args
+    _run(args, cwd)  # warm the OS cache and create the scratch schema
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _run(args, cwd)
+        times.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": round(statistics.median(times), 2), "min_ms": round(min(times), 2)}
+
+
+def run(repeat=5, modules=ENTRY_MODULES, commands=COMMANDS):
+    """Measure every entry point; returns the results as a dictionary."""
+    with tempfile.TemporaryDirectory(prefix="finance-bench-") as cwd:
+        os.makedirs(os.path.join(cwd, "data"))
+        return {
+            "benchmark": "startup",
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "imports": {module: measure_import(module, repeat, cwd) for module in modules},
+            "commands": {name: measure_command(args, repeat, cwd) for name, args in commands.items()},
+        }
+
+
+def print_results(results):
+    print(f"\n===== ⏱️  Start-up cost (median of {results['repeat']}) =====")
+    print(f"{'Import':<28} | {'ms':>9} | Heaviest dependencies")
+    print("-" * 70)
+    for module, result in results["imports"].items():
+        heaviest = ", ".join(f"{name} {ms:.0f}" for name, ms in list(result["heaviest"].items())[:3])
+        print(f"{module:<28} | {result['median_ms']:>9.1f} | {heaviest}")
+    print(f"\n{'Command':<28} | {'ms':>9}")
+    print("-" * 40)
+    for name, result in results["commands"].items():
+        print(f"{name:<28} | {result['median_ms']:>9.1f}")
+    print()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the start-up cost of the Finance Tracker entry points.")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (default: 5)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    results = run(args.repeat)
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
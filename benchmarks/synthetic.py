@@ -0,0 +1,172 @@
+"""
+Seeded synthetic ledgers for benchmarks.
+
+The same parameters and seed always produce the same transactions, so
+numbers from different machines or commits describe the same data:
+
+    python -m benchmarks.synthetic --rows 1000000 --output /tmp/bench/data/finance.db
+    python -m benchmarks.synthetic --rows 50000 --csv statement.csv
+
+Transactions are spread over the last --years years in date order (ids
+follow dates, as in a real ledger). --income-share of them are income
+(a few large amounts), the rest expenses across --categories categories
+with log-normally distributed amounts. Every month also gets a budget.
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+INCOME_CATEGORIES = ("Salary", "Freelance", "Interest", "Refunds", "Gifts")
+EXPENSE_CATEGORIES = ("Food", "Rent", "Transport", "Utilities", "Airtime", "Entertainment", "Health",
+                      "Education", "Clothing", "Savings", "Insurance", "Travel", "Household", "Fees")
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Rows generated and inserted per chunk
+CHUNK_SIZE = 200000
+
+
+def category_names(count):
+    """Expense category names: the common ones first, then numbered extras."""
+    names = list(EXPENSE_CATEGORIES[:count])
+    names += [f"Category {i}" for i in range(len(names) + 1, count + 1)]
+    return names
+
+
+def generate_rows(rows, categories=len(EXPENSE_CATEGORIES), years=3, income_share=0.15, seed=42, end=None):
+    """
+    Yield the ledger in date-ordered chunks of (type, category, amount, date) tuples.
+    Parameters:
+        rows (int): Number of transactions
+        categories (int): Number of expense categories
+        years (float): Span of the ledger, ending at `end`
+        income_share (float): Fraction of transactions that are income
+        seed (int): Random seed; equal parameters give equal ledgers
+        end (datetime): Last possible timestamp (default: today's midnight)
+    """
+    if rows < 0 or categories < 1 or years <= 0 or not 0 <= income_share <= 1:
+        raise ValueError("rows >= 0, categories >= 1, years > 0 and 0 <= income_share <= 1 are required")
+    rng = np.random.default_rng(seed)
+    end = end or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    end_ts = int(end.timestamp())
+    start_ts = end_ts - int(years * 365.25 * 86400)
+
+    expense_names = np.array(category_names(categories), dtype=object)
+    income_names = np.array(INCOME_CATEGORIES, dtype=object)
+    # Skewed popularity and typical amount per category
+    expense_weights = rng.pareto(1.2, categories) + 1
+    expense_weights /= expense_weights.sum()
+    expense_scale = rng.uniform(4.5, 8.5, categories)
+
+    # Sorted uniform timestamps, drawn chunk by chunk: each chunk covers its
+    # share of the time span, so the whole ledger is in date order
+    span = end_ts - start_ts
+    for offset in range(0, rows, CHUNK_SIZE):
+        count = min(CHUNK_SIZE, rows - offset)
+        lo = start_ts + span * offset // max(rows, 1)
+        hi = start_ts + span * (offset + count) // max(rows, 1)
+        stamps = np.sort(rng.integers(lo, max(hi, lo + 1), count))
+        is_income = rng.random(count) < income_share
+
+        categories_idx = rng.choice(categories, count, p=expense_weights)
+        amounts = np.round(rng.lognormal(expense_scale[categories_idx], 0.6), 2)
+        income_idx = rng.integers(0, len(income_names), count)
+        income_amounts = np.round(rng.lognormal(10.5, 0.4, count), 2)
+
+        names = np.where(is_income, income_names[income_idx], expense_names[categories_idx])
+        amounts = np.where(is_income, income_amounts, amounts)
+        types = np.where(is_income, "income", "expense")
+        dates = [datetime.fromtimestamp(ts).strftime(DATE_FORMAT) for ts in stamps.tolist()]
+        yield list(zip(types.tolist(), names.tolist(), amounts.tolist(), dates))
+
+
+def build_ledger(path, rows, seed=42, budgets=True, **options):
+    """
+    Create a fresh database at path holding a synthetic ledger.
+    Points database.DB_NAME at path (and leaves it there, so the caller
+    can go on to use the ledger).
+    Parameters:
+        path (str): Database file to create; an existing one is replaced
+        rows (int), seed (int), **options: As for generate_rows
+        budgets (bool): Also set a budget for every month in the ledger
+    Returns:
+        A dictionary describing the ledger and how long it took to build.
+    """
+    import database
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    database.DB_NAME = os.path.abspath(path)
+    database.close_connections()
+    database.initialize_schema()
+
+    started = time.perf_counter()
+    months = set()
+    for chunk in generate_rows(rows, seed=seed, **options):
+        with database.transaction() as conn:
+            conn.executemany("INSERT INTO transactions (type, category, amount, date) VALUES (?, ?, ?, ?)", chunk)
+        months.update({chunk[0][3][:7], chunk[-1][3][:7]})
+    if budgets and months:
+        first, last = min(months), max(months)
+        year, month = int(first[:4]), int(first[5:])
+        while f"{year:04d}-{month:02d}" <= last:
+            database.set_monthly_budget(f"{year:04d}-{month:02d}", 50000 + (year * 12 + month) % 7 * 5000)
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    with database.get_connection() as conn:
+        conn.execute("PRAGMA optimize")
+    return {"path": database.DB_NAME, "rows": rows, "seed": seed, "budgets": budgets,
+            "build_seconds": round(time.perf_counter() - started, 2), **options}
+
+
+def write_csv(path, rows, seed=42, **options):
+    """Write a synthetic bank statement (date, type, category, amount) to path; returns path."""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(("date", "type", "category", "amount"))
+        for chunk in generate_rows(rows, seed=seed, **options):
+            writer.writerows((date, trans_type, category, amount) for trans_type, category, amount, date in chunk)
+    return path
+
+
+def add_generator_arguments(parser):
+    """Add the ledger-shaping options shared by the benchmark CLIs."""
+    parser.add_argument("--seed", type=int, default=42, help="random seed (default: 42)")
+    parser.add_argument("--categories", type=int, default=len(EXPENSE_CATEGORIES),
+                        help=f"expense categories (default: {len(EXPENSE_CATEGORIES)})")
+    parser.add_argument("--years", type=float, default=3, help="years of history (default: 3)")
+    parser.add_argument("--income-share", type=float, default=0.15,
+                        help="fraction of transactions that are income (default: 0.15)")
+
+
+def generator_options(args):
+    return {"categories": args.categories, "years": args.years, "income_share": args.income_share}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic ledger.")
+    parser.add_argument("--rows", type=int, default=10000, help="transactions to generate (default: 10000)")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--output", help="SQLite database to create")
+    target.add_argument("--csv", help="CSV statement to write instead of a database")
+    add_generator_arguments(parser)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.csv:
+            write_csv(args.csv, args.rows, args.seed, **generator_options(args))
+            print(f"✅ Wrote {args.rows:,} transactions to {args.csv}")
+        else:
+            info = build_ledger(args.output, args.rows, args.seed, **generator_options(args))
+            print(f"✅ Built a {args.rows:,}-transaction ledger at {info['path']} in {info['build_seconds']}s")
+    except ValueError as e:
+        parser.error(str(e))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+Chart rendering for the reports and analytics tools.
+
+Charts are drawn on object-oriented matplotlib Figures and rendered by the
+non-interactive Agg canvas straight into in-memory PNG buffers, so nothing
+here touches pyplot's global figure state or a GUI backend, and any number
+of reports can render at once (threads or processes).
+
+Rendered PNGs are cached under data/chart_cache/, keyed by a hash of the
+chart kind, its size and the aggregated data it plots: a report whose
+numbers did not change reuses the image instead of drawing it again.
+Cache files are written atomically, so concurrent renders of the same
+chart are harmless.
+
+The draw_* functions take an Axes, so analysis.py can draw the same charts
+into an interactive pyplot window.
+"""
+import hashlib
+import io
+import os
+import uuid
+
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import database
+
+CACHE_DIRNAME = "chart_cache"
+# Cached images kept before the least recently used are removed
+CACHE_LIMIT = 500
+# Bumped whenever the look of a chart changes, so stale images are not reused
+CHART_STYLE_VERSION = 1
+DPI = 100
+
+GOOD_COLOR = "#2a9d8f"
+BAD_COLOR = "#e63946"
+LEGEND_COLOR = "#e9ecef"
+
+
+def cache_dir():
+    """Directory holding cached chart images, next to the database file."""
+    return os.path.join(os.path.dirname(database.DB_NAME) or ".", CACHE_DIRNAME)
+
+
+def draw_daily_chart(ax, daily, colors=(GOOD_COLOR, BAD_COLOR), legend_color=LEGEND_COLOR):
+    """Stacked income vs expense bars per day of the month."""
+    daily.plot(kind='bar', stacked=True, color=list(colors), ax=ax)
+    ax.set_title("Daily Income vs Expense")
+    ax.set_xlabel("Day of Month")
+    ax.set_ylabel("Amount (Ksh)")
+    ax.legend(title="Type", facecolor=legend_color)
+    ax.grid(axis='y', linestyle='--', alpha=0.6)
+
+
+def draw_monthly_chart(ax, monthly):
+    """Income vs expense bars per month."""
+    monthly.plot(kind='bar', ax=ax)
+    ax.set_title("Monthly Income vs Expense")
+    ax.set_xlabel("Month")
+    ax.set_ylabel("Amount (Ksh)")
+    ax.legend(title="Type")
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+
+
+def draw_category_pie(ax, totals):
+    """Share of each category in the expense totals."""
+    ax.pie(totals, labels=totals.index, autopct='%1.1f%%', startangle=90)
+    ax.set_title("Expense Distribution by Category")
+
+
+def daily_totals(rows):
+    """Income/expense totals per day of month for one month's rows."""
+    # Group on a derived day-of-month key without adding a column to rows
+    day = rows['date'].dt.day.rename('day')
+    return rows.groupby([day, 'type'], observed=True)['amount'].sum().unstack(fill_value=0)
+
+
+def monthly_totals(df):
+    """Income/expense totals per 'YYYY-MM' month."""
+    # Group on the precomputed year_month key instead of adding a column to df
+    monthly = df.groupby(['year_month', 'type'], observed=True)['amount'].sum().unstack(fill_value=0)
+    monthly.index = [f"{ym // 100}-{ym % 100:02d}" for ym in monthly.index]
+    return monthly
+
+
+def category_totals(df):
+    """Expense totals per category."""
+    return df.loc[df['type'] == 'expense'].groupby('category', observed=True)['amount'].sum()
+
+
+def chart_key(kind, data, size, *extra):
+    """Cache key for a chart: its kind, size, style and a hash of its data."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((kind, size, CHART_STYLE_VERSION, extra)).encode())
+    labels = list(data.columns) if isinstance(data, pd.DataFrame) else [data.name]
+    digest.update(repr((list(data.index), labels)).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+    return f"{kind}-{digest.hexdigest()}"
+
+
+def render_png(draw, data, size, *args):
+    """Draw data on a fresh Agg-backed Figure and return the PNG bytes."""
+    fig = Figure(figsize=size, dpi=DPI)
+    canvas = FigureCanvasAgg(fig)
+    draw(fig.add_subplot(), data, *args)
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    canvas.print_png(buffer)
+    return buffer.getvalue()
+
+
+def _prune_cache(root):
+    entries = []
+    for name in os.listdir(root):
+        if name.endswith(".png"):
+            path = os.path.join(root, name)
+            try:
+                entries.append((os.stat(path).st_mtime, path))
+            except OSError:
+                continue
+    if len(entries) <= CACHE_LIMIT:
+        return
+    entries.sort()
+    for _, path in entries[:len(entries) - CACHE_LIMIT]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def cached_png(kind, draw, data, size, *args):
+    """
+    PNG bytes for a chart, rendered only if no cached copy matches its data.
+    Parameters:
+        kind (str): Chart name, part of the cache key
+        draw (callable): draw(ax, data, *args), e.g. draw_daily_chart
+        data: The aggregated Series/DataFrame the chart plots
+        size (tuple): Figure size in inches
+    Returns:
+        The PNG image as bytes.
+    """
+    root = cache_dir()
+    path = os.path.join(root, chart_key(kind, data, size, *args) + ".png")
+    try:
+        with open(path, "rb") as f:
+            png = f.read()
+        os.utime(path)
+        return png
+    except OSError:
+        pass
+
+    png = render_png(draw, data, size, *args)
+    try:
+        os.makedirs(root, exist_ok=True)
+        # Write under a unique name and rename, so readers never see a partial file
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(png)
+        os.replace(tmp, path)
+        _prune_cache(root)
+    except OSError:
+        # The cache is only an optimization; the rendered image is still good
+        pass
+    return png
+
+
+def daily_chart_png(rows, size=(8, 4), colors=(GOOD_COLOR, BAD_COLOR), legend_color=LEGEND_COLOR):
+    """Daily income vs expense chart for one month's rows, as a PNG buffer (None if rows is empty)."""
+    if rows.empty:
+        return None
+    png = cached_png("daily", draw_daily_chart, daily_totals(rows), size, tuple(colors), legend_color)
+    return io.BytesIO(png)
@@ -0,0 +1,237 @@
+"""
+CSV streaming helpers shared by the web app and the CLI tools.
+Exports are produced batch by batch from database.iter_transactions, and
+imports are parsed and inserted chunk by chunk, so memory use stays flat
+no matter how large the ledger or the uploaded statement grows.
+"""
+import csv
+import io
+import zlib
+from contextlib import nullcontext
+from datetime import datetime
+
+from database import iter_transactions, insert_transactions, transaction, notify_write, DUPLICATE_MODES
+
+# Header and columns written by the web export (/api/export-csv)
+EXPORT_HEADER = ("ID", "Date", "Category", "Amount", "Type")
+EXPORT_COLUMNS = ("id", "date", "category", "amount", "type")
+
+# Rows parsed per chunk (one database transaction each) and rows per executemany call
+IMPORT_CHUNK_SIZE = 50000
+IMPORT_BATCH_SIZE = 5000
+# Rejected rows listed individually in an import report; the rest are only counted
+MAX_REPORTED_REJECTS = 100
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+REQUIRED_COLUMNS = ("type", "category", "amount")
+
+
+def iter_csv_chunks(batches, header=EXPORT_HEADER, compress=False):
+    """
+    Encode batches of row tuples as CSV, yielding one bytes chunk per batch.
+    Parameters:
+        batches (iterable): Lists of row tuples, e.g. from iter_transactions
+        header (tuple): Column names written as the first line
+        compress (bool): Gzip the stream on the fly
+    Yields:
+        bytes chunks ready to send or write.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # wbits=31 produces a gzip container rather than a raw zlib stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def drain():
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    writer.writerow(header)
+    yield drain()
+    for rows in batches:
+        writer.writerows(rows)
+        chunk = drain()
+        if chunk:
+            yield chunk
+    if compressor:
+        yield compressor.flush()
+
+
+def stream_transactions_csv(header=EXPORT_HEADER, columns=EXPORT_COLUMNS, compress=False, **filters):
+    """
+    Stream the transactions table as CSV bytes.
+    Filters (transaction_type, category, start_date, end_date) are validated
+    up front, so a bad date raises ValueError before the first chunk.
+    """
+    return iter_csv_chunks(iter_transactions(columns=columns, **filters), header=header, compress=compress)
+
+
+def write_transactions_csv(filepath, header=EXPORT_HEADER, columns=EXPORT_COLUMNS, compress=False,
+                           progress=None, **filters):
+    """
+    Write the transactions table to a CSV file without loading it into memory.
+    Parameters:
+        progress (callable): Optional; called with the number of rows
+            written so far after each batch
+    Returns:
+        The number of bytes written.
+    """
+    def counted(batches):
+        rows = 0
+        for batch in batches:
+            yield batch
+            rows += len(batch)
+            progress(rows)
+
+    batches = iter_transactions(columns=columns, **filters)
+    written = 0
+    with open(filepath, "wb") as f:
+        for chunk in iter_csv_chunks(counted(batches) if progress else batches, header=header, compress=compress):
+            f.write(chunk)
+            written += len(chunk)
+    return written
+
+
+def import_csv(source, on_duplicate="skip", chunk_size=IMPORT_CHUNK_SIZE, batch_size=IMPORT_BATCH_SIZE,
+               progress=None, before_commit=None):
+    """
+    Import transactions from a CSV file, path or binary stream.
+    The file is read in chunks of chunk_size rows; each chunk is validated
+    with vectorized pandas operations and inserted in its own transaction,
+    batch_size rows per executemany call.
+
+    Column names are matched case-insensitively. 'type', 'category' and
+    'amount' are required; 'date' is optional (YYYY-MM-DD or
+    YYYY-MM-DD HH:MM:SS, other formats are tried as a fallback) and empty
+    dates default to now. An optional 'reference' column (e.g. the bank's
+    transaction ID) tells apart otherwise identical rows.
+
+    Rows already in the ledger are detected by content hash or reference
+    and handled per on_duplicate: 'skip', 'update' (a row whose reference
+    is in the ledger overwrites that transaction) or 'fail'. In 'fail' mode
+    the whole file is imported as one transaction, so nothing is kept if
+    any row is a duplicate.
+
+    progress, if given, is called with the number of rows processed so far
+    after each chunk. before_commit, if given, is called with the
+    connection at the end of each chunk, inside its transaction; if it
+    raises, the transaction is rolled back and the import stops.
+
+    Returns:
+        A dictionary with 'imported', 'updated', 'duplicates' and 'skipped'
+        counts and 'rejects', a list of (line_number, reason) for up to
+        MAX_REPORTED_REJECTS invalid rows.
+    Raises:
+        ValueError: if the file is missing a required column or on_duplicate
+            is unknown.
+        DuplicateTransactionError: in 'fail' mode, if a row already exists.
+    """
+    if on_duplicate not in DUPLICATE_MODES:
+        raise ValueError(f"on_duplicate must be one of: {', '.join(DUPLICATE_MODES)}")
+    import pandas as pd  # only needed when importing
+
+    result = {"imported": 0, "updated": 0, "duplicates": 0, "skipped": 0, "rejects": []}
+    reader = pd.read_csv(source, chunksize=chunk_size, dtype=str, keep_default_na=False,
+                         skipinitialspace=True, encoding="utf-8-sig")
+    whole_file = transaction() if on_duplicate == "fail" else nullcontext()
+    processed = 0
+    with reader, whole_file as file_conn:
+        for chunk in reader:
+            chunk.columns = [str(c).strip().lower() for c in chunk.columns]
+            missing = [c for c in REQUIRED_COLUMNS if c not in chunk.columns]
+            if missing:
+                raise ValueError(f"CSV must contain the following columns: {', '.join(REQUIRED_COLUMNS)}")
+
+            rows, rejects = _prepare_chunk(pd, chunk)
+            with (nullcontext(file_conn) if file_conn else transaction()) as conn:
+                for start in range(0, len(rows), batch_size):
+                    counts = insert_transactions(conn, rows[start:start + batch_size], on_duplicate)
+                    result["imported"] += counts["inserted"]
+                    result["updated"] += counts["updated"]
+                    result["duplicates"] += counts["duplicates"]
+                if before_commit:
+                    before_commit(conn)
+
+            result["skipped"] += len(rejects)
+            room = MAX_REPORTED_REJECTS - len(result["rejects"])
+            result["rejects"].extend(rejects[:max(room, 0)])
+            processed += len(chunk)
+            if progress:
+                progress(processed)
+    if result["imported"] or result["updated"]:
+        notify_write("transactions_imported", {"inserted": result["imported"], "updated": result["updated"],
+                                               "duplicates": result["duplicates"]})
+    return result
+
+
+def _prepare_chunk(pd, chunk):
+    """
+    Validate and normalize one chunk of raw CSV rows.
+    Returns:
+        (rows, rejects) where rows are (type, category, amount, date, reference)
+        tuples ready to insert and rejects are (line_number, reason) pairs.
+    """
+    trans_type = chunk["type"].str.strip().str.lower()
+    category = chunk["category"].str.strip()
+    amount = pd.to_numeric(chunk["amount"].str.strip(), errors="coerce")
+
+    raw_date = chunk["date"].str.strip() if "date" in chunk.columns else pd.Series("", index=chunk.index)
+    has_date = raw_date != ""
+    parsed = pd.to_datetime(raw_date, format=DATE_FORMAT, errors="coerce")
+    retry = parsed.isna() & has_date
+    if retry.any():
+        parsed[retry] = pd.to_datetime(raw_date[retry], format="%Y-%m-%d", errors="coerce")
+        retry = parsed.isna() & has_date
+    if retry.any():
+        # Uncommon formats: let pandas infer each remaining value's format
+        parsed[retry] = _parse_mixed_dates(pd, raw_date[retry])
+    dates = parsed.dt.strftime(DATE_FORMAT).where(has_date, datetime.now().strftime(DATE_FORMAT))
+
+    # Later assignments win, so the checks run from least to most important
+    reason = pd.Series("", index=chunk.index)
+    reason[has_date & parsed.isna()] = "invalid date"
+    reason[~(amount > 0)] = "amount must be a number greater than 0"
+    reason[category == ""] = "category is required"
+    reason[~trans_type.isin(("income", "expense"))] = "type must be 'income' or 'expense'"
+
+    valid = reason == ""
+    reference = chunk["reference"].str.strip() if "reference" in chunk.columns else pd.Series("", index=chunk.index)
+    reference = reference.where(reference != "", None)
+    rows = list(zip(trans_type[valid], category[valid], amount[valid].astype(float), dates[valid], reference[valid]))
+    # Line 1 is the header, so data row i of the file is line i + 2
+    rejected = reason[~valid]
+    rejects = list(zip((rejected.index + 2).tolist(), rejected.tolist()))
+    return rows, rejects
+
+
+def _parse_mixed_dates(pd, values):
+    """
+    Parse dates in any format pandas recognizes into naive datetimes (NaT
+    where it cannot). Values with a UTC offset keep their wall-clock time;
+    if the offsets differ, or only some values have one, all are converted
+    to UTC instead.
+    """
+    try:
+        parsed = pd.to_datetime(values, errors="coerce", format="mixed")
+    except ValueError:
+        return pd.to_datetime(values, errors="coerce", format="mixed", utc=True).dt.tz_convert(None)
+    return parsed.dt.tz_localize(None) if parsed.dt.tz is not None else parsed
+
+
+def describe_import(result, on_duplicate="skip"):
+    """
+    Summarize an import_csv() result for the user.
+    Returns:
+        (success, message); success is False when nothing valid was found.
+    """
+    imported, skipped = result["imported"], result["skipped"]
+    duplicates, updated = result["duplicates"], result["updated"]
+    if not (imported or duplicates):
+        return False, f"No valid transactions found to import. {skipped} rows skipped."
+    message = f"Successfully imported {imported} transactions." if imported else "No new transactions to import."
+    if duplicates > 0:
+        message += f" {duplicates} already existed" + (f" ({updated} updated)." if on_duplicate == "update" else " and were skipped.")
+    if skipped > 0:
+        message += f" ({skipped} rows skipped due to errors)."
+    return True, message
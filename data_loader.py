@@ -0,0 +1,278 @@
+"""
+Shared transaction loader for the analytics tools (analysis.py and
+report_generator.py).
+
+The ledger is kept as a columnar snapshot under data/ledger_snapshot/:
+one raw NumPy file per column (int64 epoch-second dates, int32 year-month
+keys, float64 amounts, int32 category codes, int8 type codes) plus a
+meta.json that records the category/type labels and the ledger_version
+the files are current with.
+Snapshots are opened memory-mapped, so a fresh one loads without parsing
+the ledger or copying the date and amount columns.
+
+Each load checks the database's ledger_version row:
+- nothing changed: the frame cached in this process is returned;
+- only inserts since the snapshot: just the new rows are read and appended;
+- rows were updated or deleted: the snapshot is rebuilt from the table.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+import database
+
+# Columns of the raw ledger, as stored in the database
+COLUMNS = ["date", "category", "amount", "type"]
+
+SNAPSHOT_DIRNAME = "ledger_snapshot"
+# Bumped whenever the on-disk layout changes; older snapshots are rebuilt
+SNAPSHOT_FORMAT = 2
+# On-disk column files and their dtypes (little-endian, no header)
+SNAPSHOT_COLUMNS = {
+    "date": np.dtype("<i8"),       # epoch seconds, NaT as int64 min
+    "year_month": np.dtype("<i4"), # e.g. 202510, 0 for unparseable dates
+    "amount": np.dtype("<f8"),
+    "category": np.dtype("<i4"),   # codes into meta["categories"]
+    "type": np.dtype("<i1"),       # codes into meta["types"]
+}
+# Rows read from the database per chunk while (re)building a snapshot
+SNAPSHOT_CHUNK_SIZE = 100000
+# A refresh lock older than this is assumed to belong to a crashed process
+STALE_LOCK_SECONDS = 300
+
+_lock = threading.Lock()
+_cache = {
+    "key": None,          # (DB_NAME, generation) the frame is current with
+    "frame": None,
+}
+
+
+def snapshot_dir():
+    """Directory holding the columnar snapshot, next to the database file."""
+    return os.path.join(os.path.dirname(database.DB_NAME) or ".", SNAPSHOT_DIRNAME)
+
+
+def _read_meta(root):
+    """Return the snapshot's meta.json contents, or None if there is none."""
+    try:
+        with open(os.path.join(root, "meta.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(root, meta):
+    """Atomically replace meta.json; readers only trust rows it accounts for."""
+    tmp = os.path.join(root, f"meta.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(root, "meta.json"))
+
+
+def _acquire_refresh_lock(root):
+    """Take the cross-process refresh lock; returns False if someone else holds it."""
+    path = os.path.join(root, "refresh.lock")
+    try:
+        if time.time() - os.path.getmtime(path) > STALE_LOCK_SECONDS:
+            os.remove(path)
+    except OSError:
+        pass
+    try:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        return False
+
+
+def _release_refresh_lock(root):
+    try:
+        os.remove(os.path.join(root, "refresh.lock"))
+    except OSError:
+        pass
+
+
+def year_month_key(dates):
+    """
+    Compute int32 year-month keys (e.g. 202510) from a datetime64 array;
+    missing dates get 0.
+    """
+    dates = np.asarray(dates)
+    months = dates.astype("datetime64[M]").astype(np.int64)
+    keys = ((months // 12 + 1970) * 100 + months % 12 + 1).astype(np.int32)
+    keys[np.isnat(dates)] = 0
+    return keys
+
+
+def _encode(values, labels):
+    """Map label values to integer codes, extending labels with unseen ones."""
+    index = {label: code for code, label in enumerate(labels)}
+    for value in pd.unique(values):
+        if value not in index:
+            index[value] = len(labels)
+            labels.append(value)
+    return values.map(index)
+
+
+def _append_rows(conn, root, meta):
+    """
+    Append every transaction with id > meta["last_id"] to the column files,
+    chunk by chunk, and update meta in place (the caller writes it).
+    """
+    columns_dir = os.path.join(root, meta["columns_dir"])
+    files = {}
+    try:
+        for name, dtype in SNAPSHOT_COLUMNS.items():
+            f = open(os.path.join(columns_dir, f"{name}.bin"), "ab")
+            # Drop bytes from an append that never made it into meta.json
+            f.truncate(meta["rows"] * dtype.itemsize)
+            files[name] = f
+
+        chunks = pd.read_sql_query(
+            "SELECT id, date, category, amount, type FROM transactions WHERE id > ? ORDER BY id",
+            conn, params=(meta["last_id"],), chunksize=SNAPSHOT_CHUNK_SIZE,
+        )
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            dates = pd.to_datetime(chunk["date"], errors="coerce").to_numpy(dtype="datetime64[s]")
+            columns = {
+                "date": dates.view("<i8"),
+                "year_month": year_month_key(dates),
+                "amount": chunk["amount"].to_numpy(dtype="<f8"),
+                "category": _encode(chunk["category"], meta["categories"]).to_numpy(dtype="<i4"),
+                "type": _encode(chunk["type"], meta["types"]).to_numpy(dtype="<i1"),
+            }
+            for name, values in columns.items():
+                files[name].write(np.ascontiguousarray(values, dtype=SNAPSHOT_COLUMNS[name]).tobytes())
+            meta["rows"] += len(chunk)
+            meta["last_id"] = int(chunk["id"].iloc[-1])
+    finally:
+        for f in files.values():
+            f.close()
+
+
+def _usable(meta):
+    """Whether meta describes a snapshot of this database in the current format."""
+    return bool(meta) and meta.get("format") == SNAPSHOT_FORMAT and meta["db"] == database.DB_NAME
+
+
+def refresh_snapshot(conn, version):
+    """
+    Bring the on-disk snapshot up to date with ledger_version `version`
+    (a (generation, rewrite_generation) pair read in the same snapshot as conn).
+    Returns:
+        The current meta dict, or None if another process is refreshing it.
+    """
+    generation, rewrite_generation = version
+    root = snapshot_dir()
+    meta = _read_meta(root)
+    if _usable(meta) and meta["generation"] == generation:
+        return meta
+
+    os.makedirs(root, exist_ok=True)
+    if not _acquire_refresh_lock(root):
+        return None
+    try:
+        meta = _read_meta(root)
+        stale_dir = None
+        if not (_usable(meta) and meta["rewrite_generation"] == rewrite_generation):
+            # Rows were changed or removed (or no snapshot yet): rebuild into a new directory
+            stale_dir = meta and meta.get("columns_dir")
+            meta = {"format": SNAPSHOT_FORMAT, "db": database.DB_NAME,
+                    "columns_dir": f"columns-{uuid.uuid4().hex[:12]}",
+                    "rows": 0, "last_id": 0, "categories": [], "types": []}
+            os.makedirs(os.path.join(root, meta["columns_dir"]))
+
+        if meta.get("generation") != generation:
+            _append_rows(conn, root, meta)
+            meta.update(generation=generation, rewrite_generation=rewrite_generation)
+            _write_meta(root, meta)
+        if stale_dir:
+            for name in SNAPSHOT_COLUMNS:
+                try:
+                    os.remove(os.path.join(root, stale_dir, f"{name}.bin"))
+                except OSError:
+                    pass
+            try:
+                os.rmdir(os.path.join(root, stale_dir))
+            except OSError:
+                pass
+        return meta
+    finally:
+        _release_refresh_lock(root)
+
+
+def open_snapshot(meta):
+    """
+    Open a snapshot as a DataFrame backed by read-only memory maps.
+    Dates are viewed as datetime64[s] and amounts used as-is without copying;
+    categories/types become Categoricals over the stored codes (pandas may
+    narrow the codes to 1-2 bytes per row).
+    """
+    columns_dir = os.path.join(snapshot_dir(), meta["columns_dir"])
+    arrays = {}
+    for name, dtype in SNAPSHOT_COLUMNS.items():
+        if meta["rows"]:
+            arrays[name] = np.memmap(os.path.join(columns_dir, f"{name}.bin"), dtype=dtype,
+                                     mode="r", shape=(meta["rows"],))
+        else:
+            arrays[name] = np.empty(0, dtype=dtype)
+    return pd.DataFrame({
+        "date": arrays["date"].view("datetime64[s]"),
+        "category": pd.Categorical.from_codes(arrays["category"], categories=meta["categories"]),
+        "amount": arrays["amount"],
+        "type": pd.Categorical.from_codes(arrays["type"], categories=meta["types"]),
+        "year_month": arrays["year_month"],
+    }, copy=False)
+
+
+def _read_table(conn):
+    """Fallback when the snapshot is busy: read the whole table directly."""
+    df = pd.read_sql_query("SELECT date, category, amount, type FROM transactions ORDER BY id", conn)
+    df["date"] = pd.to_datetime(df["date"], errors="coerce").astype("datetime64[s]")
+    df["category"] = df["category"].astype("category")
+    df["type"] = df["type"].astype("category")
+    df["year_month"] = year_month_key(df["date"].to_numpy())
+    return df
+
+
+def load_data(minor_units=False):
+    """
+    Load all transactions into a compact pandas DataFrame via the cache and
+    columnar snapshot. Columns:
+        date (datetime64), category and type (Categorical), amount
+        (float64, or int64 cents when minor_units is True) and year_month
+        (int32 key such as 202510, for cheap month filtering and grouping).
+    Returns a shallow copy, so callers may add columns freely.
+    """
+    with _lock, database.get_connection() as conn:
+        # Read the version and the rows from one snapshot of the database
+        own_transaction = not conn.in_transaction
+        if own_transaction:
+            conn.execute("BEGIN")
+        try:
+            version = conn.execute("SELECT generation, rewrite_generation FROM ledger_version").fetchone()
+            key = (database.DB_NAME, version[0])
+            if _cache["key"] != key:
+                meta = refresh_snapshot(conn, version)
+                frame = open_snapshot(meta) if meta else _read_table(conn)
+                _cache.update(key=key, frame=frame)
+        finally:
+            if own_transaction:
+                conn.commit()
+
+        frame = _cache["frame"].copy(deep=False)
+    if minor_units:
+        frame["amount"] = np.rint(frame["amount"].to_numpy() * 100).astype(np.int64)
+    return frame
+
+
+def clear_cache():
+    """Drop the cached frame so the next load_data() reopens the snapshot."""
+    with _lock:
+        _cache.update(key=None, frame=None)
@@ -1,23 +1,636 @@
 import sqlite3
-from datetime import datetime
+import base64
+import hashlib
+import json
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 import os
+import queue
+import threading
+
+import metrics
 
 # Define the location of the database file
 DB_NAME = "data/finance.db"
 
+# Pragmas applied once to every pooled connection when it is opened
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",      # ~16 MB page cache
+    "PRAGMA mmap_size=268435456",    # 256 MB memory-mapped I/O
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
 
-def connect():
+# Per-thread connection pool: each thread holds one connection while it
+# lives; when it exits the connection goes back to an idle pool for the next
+# thread (servers start a thread per connection), or is closed if the idle
+# pool is full
+IDLE_LIMIT = 8
+_local = threading.local()
+_pool_lock = threading.Lock()
+_pool = set()      # every open pooled connection, held by a thread or idle
+_idle = queue.LifoQueue(maxsize=IDLE_LIMIT)  # (key, conn) of finished threads
+_prepared_dirs = set()
+_generation = 0  # bumped by close_connections() to retire every thread's connection
+
+
+def _open_connection():
+    """Open and configure a new connection to DB_NAME."""
+    folder = os.path.dirname(DB_NAME)
+    if folder and folder not in _prepared_dirs:
+        # Ensure the 'data' folder exists (only checked once per process)
+        os.makedirs(folder, exist_ok=True)
+        _prepared_dirs.add(folder)
+    # Timed connections feed the SQL statistics in metrics.py
+    conn = sqlite3.connect(DB_NAME, check_same_thread=False, factory=metrics.connection_factory())
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    conn.create_function("content_hash", 5, content_hash, deterministic=True)
+    return conn
+
+
+def content_hash(transaction_type, category, amount, date, external_ref=None):
     """
-    Connect to the SQLite database.
-    If the database file or folder doesn't exist, they will be created.
+    Identify an imported transaction by its content: date, type, category,
+    amount and an optional external reference (e.g. a bank statement line ID).
+    Also registered as the content_hash() SQL function on every connection.
     """
-    # Ensure the 'data' folder exists
-    os.makedirs("data", exist_ok=True)
-    # Connect to the database
-    conn = sqlite3.connect(DB_NAME)
+    key = "\x1f".join((date, transaction_type, category, repr(float(amount)), external_ref or ""))
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class _Lease:
+    """A thread's hold on a pooled connection, released when the thread ends and its locals are dropped."""
+
+    __slots__ = ("conn", "key")
+
+    def __init__(self, conn, key):
+        self.conn = conn
+        self.key = key
+
+    def __del__(self):
+        try:
+            _release(self.conn, self.key)
+        except Exception:
+            # Interpreter shutdown: the module may already be torn down
+            pass
+
+
+def _pool_key():
+    return (DB_NAME, os.getpid(), _generation)
+
+
+def _release(conn, key):
+    """Return a finished thread's connection to the idle pool, or close it."""
+    if key[1] != os.getpid():
+        # Inherited across a fork: the parent still owns it
+        return
+    if key != _pool_key():
+        _discard(conn)
+        return
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+        _idle.put_nowait((key, conn))
+    except (queue.Full, sqlite3.Error):
+        _discard(conn)
+
+
+def _checkout(key):
+    """An idle connection opened for key, or a new one."""
+    while True:
+        try:
+            idle_key, conn = _idle.get_nowait()
+        except queue.Empty:
+            break
+        if idle_key == key:
+            return conn
+        if idle_key[1] == os.getpid():
+            _discard(conn)
+    conn = _open_connection()
+    with _pool_lock:
+        _pool.add(conn)
     return conn
 
 
+def _pooled_connection():
+    """
+    Return the calling thread's pooled connection, checking one out on first use.
+    A new one is checked out if DB_NAME changed or the process was forked.
+    """
+    key = _pool_key()
+    lease = getattr(_local, "lease", None)
+    if lease is not None and lease.key == key:
+        return lease.conn
+    # Replacing the lease releases the stale connection
+    _local.lease = _Lease(_checkout(key), key)
+    return _local.lease.conn
+
+
+def _discard(conn):
+    """Close a pooled connection and forget it."""
+    with _pool_lock:
+        _pool.discard(conn)
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+
+@contextmanager
+def get_connection():
+    """
+    Borrow this thread's pooled connection for read-only work.
+    The connection stays open after the block; do not close it.
+    """
+    yield _pooled_connection()
+
+
+@contextmanager
+def transaction():
+    """
+    Borrow this thread's pooled connection for a write.
+    Commits when the block succeeds and rolls back if it raises.
+    """
+    conn = _pooled_connection()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def close_connections():
+    """Close every pooled connection (e.g. on shutdown or after changing DB_NAME)."""
+    global _generation
+    with _pool_lock:
+        _generation += 1
+        conns = list(_pool)
+        _pool.clear()
+    while True:
+        try:
+            _idle.get_nowait()
+        except queue.Empty:
+            break
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+def connect():
+    """
+    Open a standalone connection to the SQLite database.
+    Prefer get_connection()/transaction(), which reuse a pooled connection;
+    this is kept for scripts that manage their own connection lifetime.
+    """
+    return _open_connection()
+
+
+# Callbacks run after a write function commits, e.g. to push live updates
+_write_listeners = []
+
+
+def add_write_listener(callback):
+    """
+    Register callback(event, data), called after every committed write:
+    'transaction_added', 'transaction_updated' and 'transaction_deleted'
+    (data is the row as a dict), 'transactions_imported' (insert/update
+    counts), 'transactions_changed' (added/updated/deleted counts of a
+    batch) and 'budget_set' (month and amount).
+    """
+    if callback not in _write_listeners:
+        _write_listeners.append(callback)
+
+
+def remove_write_listener(callback):
+    if callback in _write_listeners:
+        _write_listeners.remove(callback)
+
+
+def notify_write(event, data):
+    """Tell the write listeners about a committed write; their errors never fail the write."""
+    for callback in list(_write_listeners):
+        try:
+            callback(event, data)
+        except Exception:
+            pass
+
+
+# Materialized rollups kept exact by triggers on every write to transactions:
+# table -> ((key column, expression over a transactions row), ...)
+ROLLUP_TABLES = {
+    "totals_by_type": (("type", "{row}.type"),),
+    "totals_by_category": (("type", "{row}.type"), ("category", "{row}.category")),
+    "monthly_totals": (("month", "{row}.day / 100"), ("type", "{row}.type"), ("category", "{row}.category")),
+    "daily_totals": (("day", "{row}.day"), ("type", "{row}.type")),
+}
+
+
+def _rollup_statements(tables, trigger_name="rollup"):
+    """Build the CREATE TABLE and trigger statements for the named ROLLUP_TABLES."""
+    statements = []
+    for table in tables:
+        keys = ROLLUP_TABLES[table]
+        columns = ", ".join(name for name, _ in keys)
+        statements.append(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                {", ".join(f"{name} {'INTEGER' if name in ('month', 'day') else 'TEXT'} NOT NULL" for name, _ in keys)},
+                total REAL NOT NULL DEFAULT 0,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY ({columns})
+            ) WITHOUT ROWID
+        """)
+
+    def apply(table, keys, row, sign):
+        columns = ", ".join(name for name, _ in keys)
+        values = ", ".join(expr.format(row=row) for _, expr in keys)
+        return (f"INSERT INTO {table} ({columns}, total, count) VALUES ({values}, {sign}{row}.amount, {sign}1) "
+                f"ON CONFLICT ({columns}) DO UPDATE SET total = total + excluded.total, count = count + excluded.count;")
+
+    def prune(table, keys, row):
+        match = " AND ".join(f"{name} = {expr.format(row=row)}" for name, expr in keys)
+        return f"DELETE FROM {table} WHERE {match} AND count = 0;"
+
+    inserts, deletes, updates = [], [], []
+    for table in tables:
+        keys = ROLLUP_TABLES[table]
+        inserts.append(apply(table, keys, "NEW", ""))
+        deletes += [apply(table, keys, "OLD", "-"), prune(table, keys, "OLD")]
+        updates += [apply(table, keys, "OLD", "-"), prune(table, keys, "OLD"), apply(table, keys, "NEW", "")]
+    statements += [
+        f"CREATE TRIGGER IF NOT EXISTS trg_transactions_{trigger_name}_insert AFTER INSERT ON transactions "
+        f"BEGIN {' '.join(inserts)} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_transactions_{trigger_name}_delete AFTER DELETE ON transactions "
+        f"BEGIN {' '.join(deletes)} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_transactions_{trigger_name}_update AFTER UPDATE OF type, category, amount, date "
+        f"ON transactions BEGIN {' '.join(updates)} END",
+    ]
+    return tuple(statements)
+
+
+def _rollup_rebuild_statements(tables=tuple(ROLLUP_TABLES)):
+    """Statements that recompute the named rollup tables from the transactions table."""
+    statements = []
+    for table in tables:
+        keys = ROLLUP_TABLES[table]
+        columns = ", ".join(name for name, _ in keys)
+        exprs = ", ".join(expr.format(row="transactions") for _, expr in keys)
+        statements.append(f"DELETE FROM {table}")
+        statements.append(f"""
+            INSERT INTO {table} ({columns}, total, count)
+            SELECT {exprs}, SUM(amount), COUNT(*) FROM transactions GROUP BY {exprs}
+        """)
+    return tuple(statements)
+
+
+def _backfill_content_hashes(conn):
+    """
+    Hash rows that have no hash yet. Only the first of any identical rows
+    gets one, and none if an existing row already holds it.
+    """
+    conn.execute("""
+        UPDATE transactions
+        SET content_hash = content_hash(type, category, amount, date, external_ref)
+        WHERE id IN (SELECT MIN(id) FROM transactions WHERE content_hash IS NULL
+                     GROUP BY type, category, amount, date, external_ref)
+          AND NOT EXISTS (SELECT 1 FROM transactions AS other
+                          WHERE other.content_hash = content_hash(transactions.type, transactions.category,
+                              transactions.amount, transactions.date, transactions.external_ref))
+    """)
+
+
+def _unowned_hash(args="?1, ?2, ?3, ?4, ?5"):
+    """SQL for the content hash of args (type, category, amount, date, external_ref), or NULL if a row holds it."""
+    return (f"CASE WHEN EXISTS (SELECT 1 FROM transactions WHERE content_hash = content_hash({args})) "
+            f"THEN NULL ELSE content_hash({args}) END")
+
+
+def _pass_on_hash(row):
+    """SQL giving {row}'s hash to the first identical row without one, once {row} no longer holds it."""
+    return f"""
+        UPDATE transactions SET content_hash = {row}.content_hash
+        WHERE id = (SELECT MIN(id) FROM transactions
+                    WHERE date = {row}.date AND type = {row}.type AND category = {row}.category
+                      AND amount = {row}.amount AND external_ref IS {row}.external_ref AND content_hash IS NULL)
+          AND NOT EXISTS (SELECT 1 FROM transactions WHERE content_hash = {row}.content_hash);
+    """
+
+
+# Versioned schema migrations: (version, statements), applied in order on top of
+# the base tables and recorded in PRAGMA user_version. A statement may also be
+# a callable taking the connection, for data backfills.
+SCHEMA_MIGRATIONS = [
+    (1, (
+        # Sortable integer date (YYYYMMDD) derived from the TEXT timestamp, so
+        # date filters become index range scans instead of LIKE/substr scans
+        """
+        ALTER TABLE transactions ADD COLUMN day INTEGER
+        GENERATED ALWAYS AS (
+            CAST(substr(date, 1, 4) || substr(date, 6, 2) || substr(date, 9, 2) AS INTEGER)
+        ) VIRTUAL
+        """,
+        # amount is carried in the index so SUMs never touch the table rows
+        "CREATE INDEX IF NOT EXISTS idx_transactions_type_day ON transactions (type, day, amount)",
+        "CREATE INDEX IF NOT EXISTS idx_transactions_type_category_day ON transactions (type, category, day, amount)",
+    )),
+    # Rollup tables for summary, category and monthly totals, seeded from existing rows
+    (2, _rollup_statements(("totals_by_type", "totals_by_category", "monthly_totals"))
+        + _rollup_rebuild_statements(("totals_by_type", "totals_by_category", "monthly_totals"))),
+    # Keyset pagination on (date, id), optionally narrowed by type
+    (3, (
+        "CREATE INDEX IF NOT EXISTS idx_transactions_date_id ON transactions (date, id)",
+        "CREATE INDEX IF NOT EXISTS idx_transactions_type_date_id ON transactions (type, date, id)",
+    )),
+    # Import deduplication: content hash over (date, type, category, amount,
+    # external_ref) with a unique index (see migration 10 for who holds it)
+    (4, (
+        "ALTER TABLE transactions ADD COLUMN external_ref TEXT",
+        "ALTER TABLE transactions ADD COLUMN content_hash TEXT",
+        _backfill_content_hashes,
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_content_hash
+        ON transactions (content_hash) WHERE content_hash IS NOT NULL
+        """,
+    )),
+    # Write generation for in-process caches: every write bumps 'generation';
+    # updates and deletes also move 'rewrite_generation', so a cache whose
+    # rewrite_generation still matches only has to load rows with newer ids
+    (5, (
+        """
+        CREATE TABLE IF NOT EXISTS ledger_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation INTEGER NOT NULL,
+            rewrite_generation INTEGER NOT NULL
+        )
+        """,
+        "INSERT OR IGNORE INTO ledger_version (id, generation, rewrite_generation) VALUES (1, 0, 0)",
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_version_insert AFTER INSERT ON transactions
+        BEGIN UPDATE ledger_version SET generation = generation + 1; END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_version_update AFTER UPDATE ON transactions
+        BEGIN UPDATE ledger_version SET generation = generation + 1, rewrite_generation = generation + 1; END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_version_delete AFTER DELETE ON transactions
+        BEGIN UPDATE ledger_version SET generation = generation + 1, rewrite_generation = generation + 1; END
+        """,
+    )),
+    # Daily ledger index: per-(day, type) rollup plus running totals per day.
+    # Writes only record the earliest day they touched in daily_balances_state;
+    # the running totals are recomputed from that day on by the next range query
+    (6, _rollup_statements(("daily_totals",), "daily") + _rollup_rebuild_statements(("daily_totals",)) + (
+        """
+        CREATE TABLE IF NOT EXISTS daily_balances (
+            day INTEGER PRIMARY KEY,
+            income REAL NOT NULL,
+            expense REAL NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS daily_balances_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            dirty_from INTEGER
+        )
+        """,
+        "INSERT OR IGNORE INTO daily_balances_state (id, dirty_from) VALUES (1, 0)",
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_balances_insert AFTER INSERT ON transactions
+        BEGIN UPDATE daily_balances_state SET dirty_from = MIN(IFNULL(dirty_from, NEW.day), NEW.day); END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_balances_delete AFTER DELETE ON transactions
+        BEGIN UPDATE daily_balances_state SET dirty_from = MIN(IFNULL(dirty_from, OLD.day), OLD.day); END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_balances_update AFTER UPDATE OF type, amount, date ON transactions
+        BEGIN UPDATE daily_balances_state SET dirty_from = MIN(IFNULL(dirty_from, OLD.day), OLD.day, NEW.day); END
+        """,
+    )),
+    # Response caching: budget writes get their own counter, and every write
+    # stamps modified_at (epoch seconds) for Last-Modified headers
+    (7, (
+        "ALTER TABLE ledger_version ADD COLUMN budget_generation INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE ledger_version ADD COLUMN modified_at INTEGER NOT NULL DEFAULT 0",
+        "UPDATE ledger_version SET modified_at = CAST(strftime('%s', 'now') AS INTEGER)",
+        "DROP TRIGGER IF EXISTS trg_transactions_version_insert",
+        "DROP TRIGGER IF EXISTS trg_transactions_version_update",
+        "DROP TRIGGER IF EXISTS trg_transactions_version_delete",
+        """
+        CREATE TRIGGER trg_transactions_version_insert AFTER INSERT ON transactions
+        BEGIN UPDATE ledger_version SET generation = generation + 1,
+            modified_at = CAST(strftime('%s', 'now') AS INTEGER); END
+        """,
+        """
+        CREATE TRIGGER trg_transactions_version_update AFTER UPDATE ON transactions
+        BEGIN UPDATE ledger_version SET generation = generation + 1, rewrite_generation = generation + 1,
+            modified_at = CAST(strftime('%s', 'now') AS INTEGER); END
+        """,
+        """
+        CREATE TRIGGER trg_transactions_version_delete AFTER DELETE ON transactions
+        BEGIN UPDATE ledger_version SET generation = generation + 1, rewrite_generation = generation + 1,
+            modified_at = CAST(strftime('%s', 'now') AS INTEGER); END
+        """,
+        # Migrations run before create_budget_table(), so make sure the table exists
+        """
+        CREATE TABLE IF NOT EXISTS budget (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            month TEXT UNIQUE NOT NULL,
+            amount REAL NOT NULL
+        )
+        """,
+    ) + tuple(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_budget_version_{event.lower()} AFTER {event} ON budget
+        BEGIN UPDATE ledger_version SET budget_generation = budget_generation + 1,
+            modified_at = CAST(strftime('%s', 'now') AS INTEGER); END
+        """ for event in ("INSERT", "UPDATE", "DELETE"))),
+    # Background job queue (see jobs.py): claimed atomically by workers,
+    # heartbeat_at lets other workers requeue jobs of a crashed worker
+    (8, (
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            params TEXT NOT NULL DEFAULT '{}',
+            progress REAL NOT NULL DEFAULT 0,
+            message TEXT,
+            result TEXT,
+            result_file TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            worker TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            heartbeat_at TEXT,
+            finished_at TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at)",
+    )),
+    # One row per external_ref, so an import in 'update' mode can correct a
+    # statement line by its reference. Rows repeating an earlier row's
+    # reference lose it (and the hash derived from it)
+    (9, (
+        """
+        UPDATE transactions SET external_ref = NULL, content_hash = NULL
+        WHERE external_ref IS NOT NULL
+          AND id NOT IN (SELECT MIN(id) FROM transactions WHERE external_ref IS NOT NULL GROUP BY external_ref)
+        """,
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_external_ref
+        ON transactions (external_ref) WHERE external_ref IS NOT NULL
+        """,
+    )),
+    # Every row carries its content hash, imported or entered by hand, except
+    # where an earlier identical row already holds it. Edits recompute the
+    # hash; an edited or deleted holder passes it on to the next identical
+    # row. The triggers call the content_hash() function, so writes to
+    # transactions need a connection from this module
+    (10, (
+        _backfill_content_hashes,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_hash_update
+        AFTER UPDATE OF type, category, amount, date, external_ref ON transactions
+        BEGIN
+            UPDATE transactions SET content_hash = CASE
+                WHEN EXISTS (SELECT 1 FROM transactions WHERE id <> NEW.id AND content_hash =
+                             content_hash(NEW.type, NEW.category, NEW.amount, NEW.date, NEW.external_ref))
+                THEN NULL ELSE content_hash(NEW.type, NEW.category, NEW.amount, NEW.date, NEW.external_ref) END
+            WHERE id = NEW.id;
+            {_pass_on_hash("OLD")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_hash_delete AFTER DELETE ON transactions
+        WHEN OLD.content_hash IS NOT NULL
+        BEGIN {_pass_on_hash("OLD")} END
+        """,
+    )),
+]
+
+# What an import does with a row already in the ledger: same content hash,
+# or, for 'update', same external_ref
+DUPLICATE_MODES = ("skip", "update", "fail")
+
+
+class DuplicateTransactionError(ValueError):
+    """Raised by inserts in 'fail' mode when a row is already in the ledger."""
+
+
+# Default and maximum page sizes for get_transactions_page
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Rows fetched per round trip when streaming exports
+EXPORT_BATCH_SIZE = 5000
+
+
+def get_schema_version(conn):
+    """Return the schema version recorded in the database file."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate_schema():
+    """
+    Apply any pending SCHEMA_MIGRATIONS.
+    Runs under an immediate write lock so concurrent processes apply each
+    migration exactly once.
+    """
+    with get_connection() as conn:
+        if get_schema_version(conn) >= SCHEMA_MIGRATIONS[-1][0]:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            current = get_schema_version(conn)
+            for version, statements in SCHEMA_MIGRATIONS:
+                if version <= current:
+                    continue
+                for statement in statements:
+                    # Statements are SQL strings or callables for data backfills
+                    if callable(statement):
+                        statement(conn)
+                    else:
+                        conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+
+def month_day_range(month):
+    """
+    Convert a 'YYYY-MM' month into a half-open [start, end) range over the
+    integer 'day' column, e.g. '2025-10' -> (20251000, 20251100).
+    """
+    year, mon = (int(part) for part in month.split("-"))
+    year, next_mon = (year + 1, 1) if mon == 12 else (year, mon + 1)
+    return (int(month.replace("-", "")) * 100, (year * 100 + next_mon) * 100)
+
+
+def rebuild_rollups():
+    """Recompute every rollup table from scratch in one transaction."""
+    with transaction() as conn:
+        for statement in _rollup_rebuild_statements():
+            conn.execute(statement)
+        # Running totals are derived from daily_totals: recompute all of them
+        conn.execute("UPDATE daily_balances_state SET dirty_from = 0")
+
+
+def verify_rollups(tolerance=1e-6):
+    """
+    Compare every rollup table against a fresh aggregation of transactions.
+    Returns:
+        List of (table, key, stored (total, count), expected (total, count))
+        for every mismatch; an empty list means the rollups are exact.
+    """
+    mismatches = []
+    with get_connection() as conn:
+        for table, keys in ROLLUP_TABLES.items():
+            columns = ", ".join(name for name, _ in keys)
+            exprs = ", ".join(expr.format(row="transactions") for _, expr in keys)
+            stored = {row[:-2]: row[-2:] for row in conn.execute(f"SELECT {columns}, total, count FROM {table}")}
+            expected = {row[:-2]: row[-2:] for row in conn.execute(
+                f"SELECT {exprs}, SUM(amount), COUNT(*) FROM transactions GROUP BY {exprs}")}
+            for key in stored.keys() | expected.keys():
+                have, want = stored.get(key, (0, 0)), expected.get(key, (0, 0))
+                if have[1] != want[1] or abs(have[0] - want[0]) > tolerance:
+                    mismatches.append((table, key, have, want))
+    return mismatches
+
+
+def get_ledger_version():
+    """
+    Return (generation, rewrite_generation) for the transactions table.
+    generation changes on every write; rewrite_generation only changes when
+    existing rows are updated or deleted.
+    """
+    with get_connection() as conn:
+        return conn.execute("SELECT generation, rewrite_generation FROM ledger_version").fetchone()
+
+
+def get_data_version():
+    """
+    Return (generation, budget_generation, modified_at): a token that changes
+    on every write to transactions or budget, plus the epoch second of the
+    last such write. Read by the web app to validate cached responses.
+    """
+    with get_connection() as conn:
+        return conn.execute("SELECT generation, budget_generation, modified_at FROM ledger_version").fetchone()
+
+
+def month_key(month):
+    """Convert a 'YYYY-MM' month into the integer key used by monthly_totals, e.g. 202510."""
+    return int(month.replace("-", ""))
+
+
 def create_table():
     """
     Create a table named 'transactions' if it doesn't already exist.
@@ -27,21 +640,17 @@ def create_table():
     - amount: numeric value
     - date: timestamp of when it was added
     """
-    conn = connect()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS transactions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            type TEXT NOT NULL,
-            category TEXT NOT NULL,
-            amount REAL NOT NULL,
-            date TEXT NOT NULL
-        )
-    """)
-
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS transactions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                type TEXT NOT NULL,
+                category TEXT NOT NULL,
+                amount REAL NOT NULL,
+                date TEXT NOT NULL
+            )
+        """)
+    migrate_schema()
 
 def create_budget_table():
     """
@@ -50,17 +659,35 @@ def create_budget_table():
     - month: The month in 'YYYY-MM' format
     - amount: The budgeted amount for that month
     """
-    conn = connect()
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS budget (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            month TEXT UNIQUE NOT NULL,
-            amount REAL NOT NULL
-        )
-    """)
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS budget (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                month TEXT UNIQUE NOT NULL,
+                amount REAL NOT NULL
+            )
+        """)
+
+
+# Databases whose schema this process has already brought up to date
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+def initialize_schema():
+    """
+    Create the tables and apply pending migrations, once per process.
+    Safe to call from several worker processes at the same time: table
+    creation is idempotent and migrate_schema() applies each migration under
+    an immediate write lock, so later callers only read PRAGMA user_version.
+    """
+    with _schema_lock:
+        if DB_NAME in _schema_ready:
+            return
+        create_table()
+        create_budget_table()
+        _schema_ready.add(DB_NAME)
+
 
 def add_transaction(transaction_type, category, amount):
     """
@@ -70,37 +697,171 @@ def add_transaction(transaction_type, category, amount):
         category (str): Category name (e.g., 'Food', 'Salary')
         amount (float): Transaction amount
     """
-    conn = connect()
-    cursor = conn.cursor()
-
     # Get current date and time
     date_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    cursor.execute("""
-        INSERT INTO transactions (type, category, amount, date)
-        VALUES (?, ?, ?, ?)
-    """, (transaction_type, category, amount, date_str))
-
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        cursor = conn.execute(f"""
+            INSERT INTO transactions (type, category, amount, date, external_ref, content_hash)
+            VALUES (?1, ?2, ?3, ?4, ?5, {_unowned_hash()})
+        """, (transaction_type, category, amount, date_str, None))
+    notify_write("transaction_added", {"id": cursor.lastrowid, "date": date_str, "category": category,
+                                       "amount": amount, "type": transaction_type})
 
-def add_bulk_transactions(transactions):
+def add_bulk_transactions(transactions, on_duplicate="skip"):
     """
     Insert multiple transactions into the database using executemany.
+    Rows already in the ledger (same content hash) are handled per on_duplicate.
     Parameters:
         transactions (list): A list of tuples, where each tuple is
-                             (type, category, amount, date).
+                             (type, category, amount, date) or
+                             (type, category, amount, date, external_ref).
+        on_duplicate (str): 'skip', 'update' or 'fail' (see insert_transactions)
+    Returns:
+        A dictionary with 'inserted', 'updated' and 'duplicates' counts.
+    """
+    with transaction() as conn:
+        counts = insert_transactions(conn, transactions, on_duplicate)
+    if counts["inserted"] or counts["updated"]:
+        notify_write("transactions_imported", counts)
+    return counts
+
+
+# Triggers doing per-row work on every insert. Large batches drop them for
+# the duration of the executemany and apply the same changes once per batch
+INSERT_TRIGGERS = ("trg_transactions_rollup_insert", "trg_transactions_daily_insert",
+                   "trg_transactions_version_insert", "trg_transactions_balances_insert")
+# Rows from which a batch is worth the DDL (and the re-prepare it causes)
+BULK_INSERT_MIN_ROWS = 100
+
+
+def _insert_delta_statements():
+    """Statements adding every row with id > ? to the rollup tables, as the insert triggers would."""
+    statements = []
+    for table, keys in ROLLUP_TABLES.items():
+        columns = ", ".join(name for name, _ in keys)
+        exprs = ", ".join(expr.format(row="transactions") for _, expr in keys)
+        statements.append(f"""
+            INSERT INTO {table} ({columns}, total, count)
+            SELECT {exprs}, SUM(amount), COUNT(*) FROM transactions WHERE id > ? GROUP BY {exprs}
+            ON CONFLICT ({columns}) DO UPDATE SET total = total + excluded.total, count = count + excluded.count
+        """)
+    return tuple(statements)
+
+
+INSERT_DELTA_STATEMENTS = _insert_delta_statements()
+
+
+def _insert_batch(conn, sql, rows):
+    """
+    executemany an INSERT into transactions. For a large batch the per-row
+    insert triggers are dropped while it runs, and their rollup, version and
+    daily-balance changes are applied once for all new rows; the DDL is part
+    of the caller's transaction, so a rollback restores the triggers too.
+    Must run inside a write transaction: the new rows are those above the
+    previous MAX(id).
+    Returns:
+        (cursor, last_id): the executemany cursor and the previous MAX(id).
+    """
+    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()[0]
+    if len(rows) < BULK_INSERT_MIN_ROWS:
+        return conn.executemany(sql, rows), last_id
+
+    triggers = conn.execute(f"""
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'trigger' AND name IN ({", ".join("?" * len(INSERT_TRIGGERS))})
+    """, INSERT_TRIGGERS).fetchall()
+    for name, _ in triggers:
+        conn.execute(f"DROP TRIGGER {name}")
+    try:
+        cursor = conn.executemany(sql, rows)
+    finally:
+        for _, create in triggers:
+            conn.execute(create)
+
+    first_day = conn.execute("SELECT MIN(day) FROM transactions WHERE id > ?", (last_id,)).fetchone()[0]
+    if first_day is not None:
+        for statement in INSERT_DELTA_STATEMENTS:
+            conn.execute(statement, (last_id,))
+        conn.execute("UPDATE daily_balances_state SET dirty_from = MIN(IFNULL(dirty_from, ?1), ?1)", (first_day,))
+        conn.execute("""UPDATE ledger_version SET generation = generation + 1,
+                        modified_at = CAST(strftime('%s', 'now') AS INTEGER)""")
+    return cursor, last_id
+
+
+def insert_transactions(conn, transactions, on_duplicate="skip"):
+    """
+    Insert a batch of transactions on an open connection, deduplicating
+    inside SQLite with INSERT ... ON CONFLICT. A row is already in the
+    ledger if it has the content hash of an existing row or the
+    external_ref of one.
+    Parameters:
+        conn: Connection inside a transaction; the caller commits
+        transactions (list): Tuples as for add_bulk_transactions
+        on_duplicate (str): 'skip' leaves existing rows alone; 'update'
+            rewrites the type, category, amount and date of the row with
+            the same external_ref (rows without a reference are skipped);
+            'fail' raises DuplicateTransactionError
+    Returns:
+        A dictionary with 'inserted', 'updated' and 'duplicates' counts;
+        'updated' only counts rows whose values actually changed.
     """
-    conn = connect()
-    cursor = conn.cursor()
+    if on_duplicate not in DUPLICATE_MODES:
+        raise ValueError(f"on_duplicate must be one of: {', '.join(DUPLICATE_MODES)}")
+    rows = [row if len(row) == 5 else (*row, None) for row in transactions]
+    conflict = {
+        "skip": "ON CONFLICT DO NOTHING",
+        "update": """ON CONFLICT (external_ref) WHERE external_ref IS NOT NULL DO UPDATE SET
+                         type = excluded.type, category = excluded.category, amount = excluded.amount,
+                         date = excluded.date
+                     WHERE type IS NOT excluded.type OR category IS NOT excluded.category
+                         OR amount IS NOT excluded.amount OR date IS NOT excluded.date
+                     ON CONFLICT DO NOTHING""",
+        "fail": "",
+    }[on_duplicate]
 
-    cursor.executemany("""
-        INSERT INTO transactions (type, category, amount, date)
-        VALUES (?, ?, ?, ?)
-    """, transactions)
+    if not conn.in_transaction:
+        # Take the write lock first so no other writer can commit between
+        # reading MAX(id) and inserting, which would skew the counts
+        conn.execute("BEGIN IMMEDIATE")
+    try:
+        cursor, last_id = _insert_batch(conn, f"""
+            INSERT INTO transactions (type, category, amount, date, external_ref, content_hash)
+            VALUES (?1, ?2, ?3, ?4, ?5, content_hash(?1, ?2, ?3, ?4, ?5))
+            {conflict}
+        """, rows)
+    except sqlite3.IntegrityError as e:
+        raise DuplicateTransactionError("Transaction already exists in the ledger") from e
 
-    conn.commit()
-    conn.close()
+    # New rows get ids above the previous maximum; anything else touched was an update
+    inserted = conn.execute("SELECT COUNT(*) FROM transactions WHERE id > ?", (last_id,)).fetchone()[0]
+    updated = cursor.rowcount - inserted if on_duplicate == "update" else 0
+    return {"inserted": inserted, "updated": updated, "duplicates": len(rows) - inserted}
+
+
+def insert_transactions_returning_ids(conn, transactions):
+    """
+    Insert transactions one by one on an open connection, returning each
+    row's new id. Rows with an external_ref are deduplicated on it and
+    on their content hash (a retried notification is not recorded twice); rows
+    without one are always inserted, like add_transaction.
+    Parameters:
+        conn: Connection inside a transaction; the caller commits
+        transactions (list): Tuples of (type, category, amount, date, external_ref)
+    Returns:
+        A list with the new id of each row, or None for a duplicate.
+    """
+    ids = []
+    for row in transactions:
+        inserted = conn.execute(f"""
+            INSERT INTO transactions (type, category, amount, date, external_ref, content_hash)
+            VALUES (?1, ?2, ?3, ?4, ?5, CASE WHEN ?5 IS NULL THEN {_unowned_hash()}
+                                        ELSE content_hash(?1, ?2, ?3, ?4, ?5) END)
+            ON CONFLICT DO NOTHING
+            RETURNING id
+        """, row).fetchone()
+        ids.append(inserted[0] if inserted else None)
+    return ids
 
 
 def get_summary():
@@ -109,21 +870,18 @@ def get_summary():
     Returns:
         (income, expense, balance)
     """
-    conn = connect()
-    cursor = conn.cursor()
+    with get_connection() as conn:
+        income, expense = conn.execute("""
+            SELECT SUM(CASE WHEN type='income' THEN total END),
+                   SUM(CASE WHEN type='expense' THEN total END)
+            FROM totals_by_type
+        """).fetchone()
 
-    # Total income
-    cursor.execute("SELECT SUM(amount) FROM transactions WHERE type='income'")
-    income = cursor.fetchone()[0] or 0  # Default to 0 if None
-
-    # Total expenses
-    cursor.execute("SELECT SUM(amount) FROM transactions WHERE type='expense'")
-    expense = cursor.fetchone()[0] or 0
+    income = income or 0  # Default to 0 if None
+    expense = expense or 0
 
     # Remaining balance
     balance = income - expense
-
-    conn.close()
     return income, expense, balance
 
 
@@ -133,20 +891,12 @@ def get_expenses_by_category():
     Returns:
         List of tuples [(category, total_spent), ...]
     """
-    conn = connect()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT category, SUM(amount)
-        FROM transactions
-        WHERE type='expense'
-        GROUP BY category
-    """)
-
-    results = cursor.fetchall()
-    conn.close()
-
-    return results
+    with get_connection() as conn:
+        return conn.execute("""
+            SELECT category, total
+            FROM totals_by_category
+            WHERE type='expense'
+        """).fetchall()
 
 def get_all_transactions():
     """
@@ -154,52 +904,319 @@ def get_all_transactions():
     Returns:
         List of tuples [(id, date, category, amount, type), ...]
     """
-    conn = connect()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id, date, category, amount, type
+    with get_connection() as conn:
+        return conn.execute("""
+            SELECT id, date, category, amount, type
+            FROM transactions
+            ORDER BY date DESC, id DESC
+        """).fetchall()
+
+def encode_cursor(date, transaction_id):
+    """Encode a (date, id) keyset position as an opaque URL-safe cursor."""
+    raw = json.dumps([date, transaction_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor.
+    Raises:
+        ValueError: if the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        date, transaction_id = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(date, str) or not isinstance(transaction_id, int):
+        raise ValueError("Invalid cursor")
+    return date, transaction_id
+
+
+def _transaction_filters(transaction_type=None, category=None, start_date=None, end_date=None):
+    """
+    Build WHERE clauses and parameters for the common transaction filters.
+    Dates are 'YYYY-MM-DD' strings and end_date is inclusive.
+    Raises:
+        ValueError: for a malformed date.
+    """
+    clauses, params = [], []
+    if transaction_type:
+        clauses.append("type = ?")
+        params.append(transaction_type)
+    if category:
+        clauses.append("category = ?")
+        params.append(category)
+    if start_date:
+        clauses.append("date >= ?")
+        params.append(datetime.strptime(start_date, "%Y-%m-%d").strftime("%Y-%m-%d"))
+    if end_date:
+        clauses.append("date < ?")
+        params.append((datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d"))
+    return clauses, params
+
+
+def get_transactions_page(limit=PAGE_SIZE, after=None, transaction_type=None, category=None,
+                          start_date=None, end_date=None):
+    """
+    Fetch one page of transactions, newest first, using keyset pagination
+    on (date, id) so every page costs the same regardless of its position.
+    Parameters:
+        limit (int): Page size, capped at MAX_PAGE_SIZE
+        after (str): Cursor returned with the previous page, or None for the first page
+        transaction_type (str): Only 'income' or 'expense' rows
+        category (str): Only rows in this category
+        start_date (str): Only rows on or after this 'YYYY-MM-DD' date
+        end_date (str): Only rows on or before this 'YYYY-MM-DD' date
+    Returns:
+        (rows, next_cursor) where rows is [(id, date, category, amount, type), ...]
+        and next_cursor is None on the last page.
+    Raises:
+        ValueError: for a malformed cursor or date.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    clauses, params = _transaction_filters(transaction_type, category, start_date, end_date)
+    if after:
+        clauses.insert(0, "(date, id) < (?, ?)")
+        params[:0] = decode_cursor(after)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    with get_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT id, date, category, amount, type
+            FROM transactions
+            {where}
+            ORDER BY date DESC, id DESC
+            LIMIT ?
+        """, (*params, limit + 1)).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+    return rows, next_cursor
+
+def count_transactions(transaction_type=None, category=None, start_date=None, end_date=None):
+    """
+    Count the transactions matching the common filters.
+    Raises:
+        ValueError: for a malformed date.
+    """
+    clauses, params = _transaction_filters(transaction_type, category, start_date, end_date)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    with get_connection() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM transactions {where}", params).fetchone()[0]
+
+
+def iter_transactions(batch_size=EXPORT_BATCH_SIZE, columns=("id", "date", "category", "amount", "type"),
+                      transaction_type=None, category=None, start_date=None, end_date=None):
+    """
+    Stream transactions newest first in batches pulled with fetchmany, so
+    memory use stays constant however large the ledger is.
+    Parameters:
+        batch_size (int): Rows per yielded batch
+        columns (tuple): Columns to select, in order
+        transaction_type, category, start_date, end_date: Optional filters,
+            as for get_transactions_page
+    Yields:
+        Lists of row tuples, at most batch_size long.
+    Raises:
+        ValueError: for a malformed date (raised before anything is yielded).
+    """
+    clauses, params = _transaction_filters(transaction_type, category, start_date, end_date)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    query = f"""
+        SELECT {", ".join(columns)}
         FROM transactions
-        ORDER BY date DESC
-    """)
-    results = cursor.fetchall()
-    conn.close()
-    return results
+        {where}
+        ORDER BY date DESC, id DESC
+    """
+    return _iter_batches(query, params, batch_size)
+
+
+def _iter_batches(query, params, batch_size):
+    """Run query on a dedicated cursor and yield its rows batch by batch."""
+    with get_connection() as conn:
+        cursor = conn.execute(query, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+
+def day_key(date):
+    """
+    Convert a 'YYYY-MM-DD' date into the integer 'day' key, e.g. 20251017.
+    Raises:
+        ValueError: for a malformed date.
+    """
+    return int(datetime.strptime(date, "%Y-%m-%d").strftime("%Y%m%d"))
+
+
+def format_day(day):
+    """Convert an integer 'day' key back into 'YYYY-MM-DD'."""
+    return f"{day // 10000:04d}-{day // 100 % 100:02d}-{day % 100:02d}"
+
+
+def refresh_daily_balances():
+    """
+    Bring the running totals in daily_balances up to date.
+    Only days from the earliest one written since the last refresh are
+    recomputed (one window-function pass over daily_totals), so appending
+    today's transactions costs a few rows while a backdated import costs
+    one pass over the days after its oldest row.
+    """
+    with get_connection() as conn:
+        if conn.execute("SELECT dirty_from FROM daily_balances_state").fetchone()[0] is None:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Re-read under the write lock: another writer may have refreshed already
+            dirty_from = conn.execute("SELECT dirty_from FROM daily_balances_state").fetchone()[0]
+            if dirty_from is not None:
+                base_income, base_expense = _running_totals(conn, dirty_from - 1)
+                conn.execute("DELETE FROM daily_balances WHERE day >= ?", (dirty_from,))
+                conn.execute("""
+                    INSERT INTO daily_balances (day, income, expense)
+                    SELECT day, ? + SUM(income) OVER running, ? + SUM(expense) OVER running
+                    FROM (
+                        SELECT day,
+                               SUM(CASE WHEN type='income' THEN total ELSE 0 END) AS income,
+                               SUM(CASE WHEN type='expense' THEN total ELSE 0 END) AS expense
+                        FROM daily_totals
+                        WHERE day >= ?
+                        GROUP BY day
+                    )
+                    WINDOW running AS (ORDER BY day ROWS UNBOUNDED PRECEDING)
+                """, (base_income, base_expense, dirty_from))
+                conn.execute("UPDATE daily_balances_state SET dirty_from = NULL")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+
+def _running_totals(conn, day):
+    """Cumulative (income, expense) through the given day: one index seek."""
+    row = conn.execute(
+        "SELECT income, expense FROM daily_balances WHERE day <= ? ORDER BY day DESC LIMIT 1", (day,)
+    ).fetchone()
+    return row if row else (0.0, 0.0)
+
+
+def balance_at(date):
+    """
+    Return the running balance at the end of a day.
+    Parameters:
+        date (str): 'YYYY-MM-DD'
+    Returns:
+        A dictionary with the date and the cumulative income, expense and
+        balance of every transaction up to and including that day.
+    """
+    day = day_key(date)
+    refresh_daily_balances()
+    with get_connection() as conn:
+        income, expense = _running_totals(conn, day)
+    return {"date": format_day(day), "income": income, "expense": expense, "balance": income - expense}
+
+
+def totals_between(start_date, end_date):
+    """
+    Return income and expense totals for an inclusive range of days,
+    computed as the difference of two running totals.
+    Parameters:
+        start_date, end_date (str): 'YYYY-MM-DD'
+    Returns:
+        A dictionary with start, end, income, expense, net and the
+        opening_balance (before start) and closing_balance (after end).
+    Raises:
+        ValueError: for a malformed date or a start after the end.
+    """
+    start, end = day_key(start_date), day_key(end_date)
+    if start > end:
+        raise ValueError("start date must not be after end date")
+    refresh_daily_balances()
+    with get_connection() as conn:
+        opening = _running_totals(conn, start - 1)
+        closing = _running_totals(conn, end)
+    income, expense = closing[0] - opening[0], closing[1] - opening[1]
+    return {
+        "start": format_day(start),
+        "end": format_day(end),
+        "income": income,
+        "expense": expense,
+        "net": income - expense,
+        "opening_balance": opening[0] - opening[1],
+        "closing_balance": closing[0] - closing[1],
+    }
+
+
+def get_balance_history(start_date, end_date):
+    """
+    Return the day-by-day running balance between two dates (inclusive).
+    Only days with transactions are listed.
+    Returns:
+        A list of dictionaries with date, income and expense for that day
+        and the balance at the end of it.
+    Raises:
+        ValueError: for a malformed date.
+    """
+    start, end = day_key(start_date), day_key(end_date)
+    refresh_daily_balances()
+    with get_connection() as conn:
+        previous_income, previous_expense = _running_totals(conn, start - 1)
+        rows = conn.execute(
+            "SELECT day, income, expense FROM daily_balances WHERE day BETWEEN ? AND ? ORDER BY day",
+            (start, end),
+        ).fetchall()
+
+    history = []
+    for day, income, expense in rows:
+        history.append({
+            "date": format_day(day),
+            "income": income - previous_income,
+            "expense": expense - previous_expense,
+            "balance": income - expense,
+        })
+        previous_income, previous_expense = income, expense
+    return history
 
 def set_monthly_budget(month, amount):
     """
     Set or update the budget for a given month ('YYYY-MM').
     """
-    conn = connect()
-    cursor = conn.cursor()
-    # Use INSERT OR REPLACE to handle both new and existing budget months
-    cursor.execute("""
-        INSERT OR REPLACE INTO budget (month, amount)
-        VALUES (?, ?)
-    """, (month, amount))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        # Use INSERT OR REPLACE to handle both new and existing budget months
+        conn.execute("""
+            INSERT OR REPLACE INTO budget (month, amount)
+            VALUES (?, ?)
+        """, (month, amount))
+    notify_write("budget_set", {"month": month, "amount": amount})
 
-def check_monthly_budget():
+def check_monthly_budget(month=None):
     """
-    Check current month's spending against its budget.
+    Check a month's spending against its budget.
+    Parameters:
+        month (str): 'YYYY-MM' (default: the current month)
     Returns:
         A dictionary with budget status or None if no budget is set.
     """
-    month = datetime.now().strftime("%Y-%m")
-    conn = connect()
-    cursor = conn.cursor()
+    month = month or datetime.now().strftime("%Y-%m")
+    with get_connection() as conn:
+        budget_row = conn.execute("SELECT amount FROM budget WHERE month=?", (month,)).fetchone()
+        if not budget_row:
+            return None  # No budget set for this month
 
-    cursor.execute("SELECT amount FROM budget WHERE month=?", (month,))
-    budget_row = cursor.fetchone()
-    if not budget_row:
-        conn.close()
-        return None  # No budget set for this month
-
-    budget = budget_row[0]
+        budget = budget_row[0]
 
-    cursor.execute("SELECT SUM(amount) FROM transactions WHERE type='expense' AND date LIKE ?", (f"{month}%",))
-    total_expense = cursor.fetchone()[0] or 0.0
-    conn.close()
+        total_expense = conn.execute(
+            "SELECT SUM(total) FROM monthly_totals WHERE month = ? AND type = 'expense'",
+            (month_key(month),)
+        ).fetchone()[0] or 0.0
 
     percent_used = (total_expense / budget) * 100 if budget > 0 else 0
     return {
@@ -216,33 +1233,129 @@ def get_transaction_by_id(transaction_id):
     Returns:
         A tuple with transaction data or None if not found.
     """
-    conn = connect()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM transactions WHERE id = ?", (transaction_id,))
-    result = cursor.fetchone()
-    conn.close()
-    return result
+    with get_connection() as conn:
+        return conn.execute("SELECT id FROM transactions WHERE id = ?", (transaction_id,)).fetchone()
 
 def delete_transaction_by_id(transaction_id):
     """
     Delete a transaction from the database using its ID.
+    Returns:
+        True if it existed and was deleted, False if there was no such transaction.
     """
-    conn = connect()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM transactions WHERE id = ?", (transaction_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        deleted = conn.execute("DELETE FROM transactions WHERE id = ?", (transaction_id,)).rowcount
+    if deleted:
+        notify_write("transaction_deleted", {"id": transaction_id})
+    return bool(deleted)
 
 def update_transaction_by_id(transaction_id, new_type, new_category, new_amount):
     """
     Update the details of a specific transaction by its ID.
+    Returns:
+        True if it was updated, False if there was no such transaction.
     """
-    conn = connect()
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE transactions
-        SET type = ?, category = ?, amount = ?
-        WHERE id = ?
-    """, (new_type, new_category, new_amount, transaction_id))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        row = conn.execute("""
+            UPDATE transactions
+            SET type = ?, category = ?, amount = ?
+            WHERE id = ?
+            RETURNING id, date, category, amount, type
+        """, (new_type, new_category, new_amount, transaction_id)).fetchone()
+    if row:
+        notify_write("transaction_updated", dict(zip(("id", "date", "category", "amount", "type"), row)))
+    return row is not None
+
+
+# Operations accepted by apply_transaction_batch, and the statement each
+# runs (one executemany per run of consecutive operations of a kind)
+BATCH_STATEMENTS = {
+    "add": f"""INSERT INTO transactions (type, category, amount, date, content_hash)
+               VALUES (?1, ?2, ?3, ?4, {_unowned_hash("?1, ?2, ?3, ?4, NULL")})""",
+    # Fields given as None keep their current value
+    "update": """UPDATE transactions
+                 SET type = COALESCE(?2, type), category = COALESCE(?3, category), amount = COALESCE(?4, amount)
+                 WHERE id = ?1""",
+    "delete": "DELETE FROM transactions WHERE id = ?",
+}
+
+
+def _apply_run(conn, kind, params):
+    """
+    Apply one run of same-kind operations; returns each one's (status, id).
+    The run goes through a single executemany. Only if its rowcount shows
+    that some target rows are missing is it redone statement by statement,
+    to find out which.
+    """
+    if kind == "add":
+        _, last_id = _insert_batch(conn, BATCH_STATEMENTS["add"], params)
+        # Inside the write lock, the new rows are exactly those above the old maximum
+        ids = [row[0] for row in conn.execute("SELECT id FROM transactions WHERE id > ? ORDER BY id", (last_id,))]
+        return [("ok", id_) for id_ in ids]
+
+    conn.execute("SAVEPOINT batch_run")
+    if conn.executemany(BATCH_STATEMENTS[kind], params).rowcount == len(params):
+        conn.execute("RELEASE batch_run")
+        return [("ok", row[0]) for row in params]
+    conn.execute("ROLLBACK TO batch_run")
+    conn.execute("RELEASE batch_run")
+    return [("ok" if conn.execute(BATCH_STATEMENTS[kind], row).rowcount else "not_found", row[0])
+            for row in params]
+
+
+def apply_transaction_batch(operations, atomic=True):
+    """
+    Apply many adds, updates and deletes in one database transaction.
+    Parameters:
+        operations (list): (kind, params) pairs, in order, where params is
+            - add: (type, category, amount, date)
+            - update: (id, type, category, amount); None keeps a field as is
+            - delete: (id,)
+        atomic (bool): If True, nothing is applied unless every operation
+            finds its transaction; if False, missing ones are skipped
+    Returns:
+        A dictionary with 'applied' (whether the changes were committed),
+        'results' (a {'status': 'ok' | 'not_found', 'id': ...} dictionary
+        per operation; if nothing was applied, 'ok' marks the operations
+        that would have succeeded) and 'added', 'updated', 'deleted' and
+        'not_found' counts.
+    """
+    for kind, _ in operations:
+        if kind not in BATCH_STATEMENTS:
+            raise ValueError(f"operation must be one of: {', '.join(BATCH_STATEMENTS)}")
+
+    results = []
+    with transaction() as conn:
+        if not conn.in_transaction:
+            # Take the write lock up front; add runs rely on it to learn their new ids
+            conn.execute("BEGIN IMMEDIATE")
+        start = 0
+        while start < len(operations):
+            kind = operations[start][0]
+            end = start
+            while end < len(operations) and operations[end][0] == kind:
+                end += 1
+            params = [params for _, params in operations[start:end]]
+            results.extend((kind, status, id_) for status, id_ in _apply_run(conn, kind, params))
+            start = end
+
+        missing = sum(1 for _, status, _ in results if status == "not_found")
+        applied = not (atomic and missing)
+        if not applied:
+            conn.rollback()
+
+    counts = {"added": 0, "updated": 0, "deleted": 0}
+    if applied:
+        for kind, status, _ in results:
+            if status == "ok":
+                counts[{"add": "added", "update": "updated", "delete": "deleted"}[kind]] += 1
+        if any(counts.values()):
+            notify_write("transactions_changed", counts)
+    else:
+        # Rolled back: the ids handed to new rows were never committed
+        results = [(kind, status, None if kind == "add" else id_) for kind, status, id_ in results]
+    return {
+        "applied": applied,
+        "results": [{"status": status, "id": id_} for _, status, id_ in results],
+        "not_found": missing,
+        **counts,
+    }
@@ -0,0 +1,105 @@
+"""
+Bounded executors and concurrency limits for the web app's database work.
+
+Database calls made by the API run on one of two lanes, each a fixed-size
+thread pool with a bounded queue (and so a fixed number of pooled SQLite
+connections):
+- interactive: the cheap JSON endpoints (summaries, pages, charts);
+- bulk: CSV imports and other long-running jobs.
+A full lane rejects new work with Busy instead of queueing without bound,
+so a burst of imports can never take the threads the dashboard polls need.
+
+EndpointLimit caps how many requests one endpoint serves at a time (per
+process); callers over the limit wait briefly, then get Busy as well.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+# name -> (worker threads, extra calls allowed to queue)
+LANE_SIZES = {
+    "interactive": (8, 64),
+    "bulk": (2, 2),
+}
+
+
+class Busy(Exception):
+    """Raised when a lane or endpoint is at capacity; retry_after is a hint in seconds."""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Lane:
+    """A fixed-size thread pool that refuses work once its queue is full."""
+
+    def __init__(self, name, workers, queue_size):
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"db-{name}")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule fn(*args, **kwargs); raises Busy if the lane is full."""
+        if not self._slots.acquire(blocking=False):
+            raise Busy(f"The server is busy ({self.name} work queue is full). Please retry shortly.",
+                       retry_after=5 if self.name == "bulk" else 1)
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        """Run fn on the lane and wait for its result (exceptions propagate)."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+_lanes = {}
+_lanes_lock = threading.Lock()
+
+
+def lane(name):
+    """Return the named lane, creating its pool on first use."""
+    with _lanes_lock:
+        if name not in _lanes:
+            workers, queue_size = LANE_SIZES[name]
+            _lanes[name] = Lane(name, workers, queue_size)
+        return _lanes[name]
+
+
+def shutdown_lanes():
+    """Let queued work finish and stop every lane's threads."""
+    with _lanes_lock:
+        lanes = list(_lanes.values())
+        _lanes.clear()
+    for pool in lanes:
+        pool.shutdown()
+
+
+class EndpointLimit:
+    """At most `limit` concurrent requests; others wait up to `wait` seconds."""
+
+    def __init__(self, name, limit, wait=0.0, retry_after=1):
+        self.name = name
+        self.limit = limit
+        self.wait = wait
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(limit)
+
+    def acquire(self):
+        """Take a slot, waiting up to self.wait seconds; raises Busy if none frees up."""
+        if self.wait:
+            acquired = self._slots.acquire(timeout=self.wait)
+        else:
+            acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            raise Busy(f"Too many concurrent {self.name} requests. Please retry shortly.",
+                       retry_after=self.retry_after)
+
+    def release(self):
+        self._slots.release()
@@ -1,9 +1,22 @@
+"""
+Unified finance tracker CLI.
+
+Run without arguments for the interactive menu, or with a subcommand for
+scripted use; each subcommand imports only what it needs:
+
+    python finance_tracker.py add expense Food 250
+    python finance_tracker.py summary
+    python finance_tracker.py import statement.csv --mode update
+    python finance_tracker.py report --from 2025-01 --to 2025-12
+    python finance_tracker.py --profile summary    # also save a cProfile of the command
+"""
+import argparse
 from datetime import datetime
-import pandas as pd
 import os
+import sys
 from database import (
-    create_table,
-    create_budget_table,
+    DUPLICATE_MODES,
+    initialize_schema,
     add_transaction as db_add_transaction,
     get_summary,
     get_expenses_by_category,
@@ -13,8 +26,8 @@ from database import (
     get_transaction_by_id,
     delete_transaction_by_id,
     update_transaction_by_id,
-    add_bulk_transactions,
 )
+import profiling
 
 def main():
     """
@@ -206,54 +219,94 @@ def import_from_csv():
     print("\n--- Import Transactions from CSV ---")
     print("Your CSV file should have the columns: 'date', 'type', 'category', 'amount'")
     filepath = input("Enter the full path to your CSV file: ").strip()
+    import_file(filepath)
+
+def import_file(filepath, on_duplicate="skip"):
+    """Import a CSV file and print the outcome; returns True on success."""
+    from csv_io import import_csv  # pulls in pandas only when importing
 
     if not os.path.exists(filepath):
         print(f"❌ Error: File not found at '{filepath}'")
-        return
+        return False
 
     try:
-        df = pd.read_csv(filepath)
+        result = import_csv(filepath, on_duplicate=on_duplicate)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return False
     except Exception as e:
         print(f"❌ Error reading CSV file: {e}")
-        return
-
-    required_columns = {'type', 'category', 'amount'}
-    if not required_columns.issubset(df.columns):
-        print(f"❌ CSV must contain the following columns: {', '.join(required_columns)}")
-        return
-
-    transactions_to_add = []
-    for index, row in df.iterrows():
-        trans_type = row['type'].lower()
-        category = row['category']
-        amount = row['amount']
-
-        # Use date from CSV if available, otherwise use current date
-        if 'date' in df.columns and pd.notna(row['date']):
-            try:
-                # Attempt to parse date, fallback to now if format is wrong
-                date_str = pd.to_datetime(row['date']).strftime("%Y-%m-%d %H:%M:%S")
-            except ValueError:
-                date_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        else:
-            date_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        # Basic validation
-        if trans_type not in ['income', 'expense'] or not isinstance(amount, (int, float)):
-            print(f"⚠️  Skipping invalid row {index + 1}: type='{trans_type}', amount='{amount}'")
-            continue
-
-        transactions_to_add.append((trans_type, category, amount, date_str))
-
-    if transactions_to_add:
-        add_bulk_transactions(transactions_to_add)
-        print(f"\n✅ Successfully imported {len(transactions_to_add)} transactions!")
-    else:
+        return False
+
+    for line, reason in result['rejects']:
+        print(f"⚠️  Skipping invalid row {line}: {reason}")
+    if result['skipped'] > len(result['rejects']):
+        print(f"⚠️  ... and {result['skipped'] - len(result['rejects'])} more invalid rows")
+
+    if result['duplicates'] > result['updated']:
+        print(f"ℹ️  {result['duplicates'] - result['updated']} transactions were already in the ledger and were skipped.")
+    if result['updated']:
+        print(f"ℹ️  {result['updated']} existing transactions were updated.")
+    if result['imported']:
+        print(f"\n✅ Successfully imported {result['imported']} transactions!")
+    elif not result['duplicates'] and not result['updated']:
         print("⚠️ No valid transactions found to import.")
+    return True
+
+def run_command(args):
+    """Run one non-interactive subcommand; returns the exit status."""
+    if args.command == "add":
+        if args.amount <= 0:
+            print("❌ Amount must be greater than zero.")
+            return 1
+        db_add_transaction(args.type, args.category, args.amount)
+        print(f"✅ {args.type.capitalize()} added successfully!")
+    elif args.command == "summary":
+        view_summary()
+    elif args.command == "import":
+        return 0 if import_file(args.file, args.mode) else 1
+    elif args.command == "report":
+        import report_generator  # reportlab/matplotlib load only for reports
+
+        report_generator.main(args.report_args)
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Track income, expenses and budgets. Run without a command for the interactive menu.")
+    # Before the command: `finance_tracker.py --profile import statement.csv`
+    profiling.add_profile_arguments(parser)
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    add = commands.add_parser("add", help="record a transaction")
+    add.add_argument("type", choices=("income", "expense"))
+    add.add_argument("category")
+    add.add_argument("amount", type=float)
+
+    commands.add_parser("summary", help="show totals and this month's budget status")
+
+    importer = commands.add_parser("import", help="import transactions from a CSV file")
+    importer.add_argument("file")
+    importer.add_argument("--mode", choices=DUPLICATE_MODES, default="skip",
+                          help="what to do with rows already in the ledger (default: skip)")
+
+    # Options after `report` are passed through to report_generator.py
+    commands.add_parser("report", add_help=False,
+                        help="generate PDF reports (options as for report_generator.py)")
+    return parser
+
+def parse_args(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if extra and args.command != "report":
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    args.report_args = extra
+    return args
 
 # Entry point of the program
 if __name__ == "__main__":
+    args = parse_args()
     # Ensure all tables exist on startup
-    create_table()
-    create_budget_table()
-    main()
+    initialize_schema()
+    with profiling.profile_command(args, args.command or "menu"):
+        status = main() if args.command is None else run_command(args)
+    sys.exit(status)
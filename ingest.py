@@ -0,0 +1,237 @@
+"""
+Group-commit write path for high-frequency transaction ingestion.
+
+Committing one row per request makes every request pay for its own
+commit (an fsync) and makes concurrent writers queue on SQLite's write
+lock. Instead, requests hand their rows to a single writer thread per
+process through a bounded queue. The writer collects whatever arrives
+within MAX_LATENCY seconds of the first waiting request (up to MAX_BATCH
+rows), inserts it all in one transaction and commits once; each request
+is acknowledged only after that commit.
+
+The writer uses its own connection with synchronous=FULL, so an
+acknowledged row survives a power failure, not just a crash; the fsync
+that costs is shared by the whole micro-batch. A full queue rejects new
+work with executor.Busy rather than buffering without bound.
+
+Tunable per process with FINANCE_INGEST_LATENCY_MS, FINANCE_INGEST_BATCH
+and FINANCE_INGEST_QUEUE.
+"""
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from datetime import datetime
+import os
+import queue
+import threading
+import time
+
+import database
+from executor import Busy
+
+# Seconds the writer waits for more requests before committing a batch
+MAX_LATENCY = float(os.environ.get("FINANCE_INGEST_LATENCY_MS", 2)) / 1000
+# Rows committed together at most
+MAX_BATCH = int(os.environ.get("FINANCE_INGEST_BATCH", 2000))
+# Requests waiting for the writer before new ones are refused
+QUEUE_SIZE = int(os.environ.get("FINANCE_INGEST_QUEUE", 10000))
+# Rows accepted in one /api/ingest request
+MAX_REQUEST_ROWS = 5000
+# Seconds a request waits for its commit before giving up
+COMMIT_TIMEOUT = 30
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def parse_row(data):
+    """
+    Validate one incoming transaction.
+    Parameters:
+        data (dict): type, category, amount, and optionally date
+            ('YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS', default: now) and
+            reference (e.g. the mobile-money transaction code)
+    Returns:
+        A (type, category, amount, date, external_ref) tuple.
+    Raises:
+        ValueError: with a message fit for the client.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("each transaction must be an object")
+    trans_type = str(data.get('type') or '').lower().strip()
+    if trans_type not in ('income', 'expense'):
+        raise ValueError("type must be 'income' or 'expense'")
+    category = str(data.get('category') or '').strip()
+    if not category:
+        raise ValueError("category is required")
+    try:
+        amount = float(data.get('amount'))
+    except (TypeError, ValueError):
+        raise ValueError("amount must be a number")
+    if not amount > 0:
+        raise ValueError("amount must be greater than 0")
+
+    date = data.get('date')
+    if date:
+        date = str(date).strip()
+        for fmt in (DATE_FORMAT, "%Y-%m-%d"):
+            try:
+                date = datetime.strptime(date, fmt).strftime(DATE_FORMAT)
+                break
+            except ValueError:
+                continue
+        else:
+            raise ValueError("date must be YYYY-MM-DD or YYYY-MM-DD HH:MM:SS")
+    else:
+        date = datetime.now().strftime(DATE_FORMAT)
+    reference = str(data.get('reference') or '').strip() or None
+    return trans_type, category, amount, date, reference
+
+
+class _Request:
+    __slots__ = ("rows", "future")
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.future = Future()
+
+
+class GroupCommitWriter:
+    """A single writer thread committing queued rows in micro-batches."""
+
+    def __init__(self, max_latency=MAX_LATENCY, max_batch=MAX_BATCH, queue_size=QUEUE_SIZE):
+        self.max_latency = max_latency
+        self.max_batch = max_batch
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_started(self):
+        with self._lock:
+            # A forked worker does not inherit the parent's thread; a crashed one is replaced
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, rows):
+        """Queue rows (tuples from parse_row); returns a Future of their ids."""
+        self._ensure_started()
+        request = _Request(list(rows))
+        try:
+            self._queue.put_nowait(request)
+        except queue.Full:
+            raise Busy("Too many transactions are waiting to be written. Please retry shortly.", retry_after=1)
+        # The writer may have died between the check and the put
+        self._ensure_started()
+        return request.future
+
+    def write(self, rows, timeout=COMMIT_TIMEOUT):
+        """
+        Write rows and wait until they are committed.
+        Returns:
+            A list with each row's new id, or None for a duplicate reference.
+        Raises:
+            Busy: if the queue is full or the commit takes longer than timeout.
+        """
+        try:
+            return self.submit(rows).result(timeout)
+        except FutureTimeout:
+            raise Busy("The write is taking longer than expected; retry with the same references "
+                       "to avoid duplicates.", retry_after=5)
+
+    def stop(self, timeout=None):
+        """Commit everything already queued, then stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None or self._pid != os.getpid() or not thread.is_alive():
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+
+    def _run(self):
+        batch = []
+        try:
+            conn = database.connect()
+            # Acknowledged rows must survive a power loss; the fsync is shared by the batch
+            conn.execute("PRAGMA synchronous=FULL")
+        except Exception as e:
+            self._fail_pending(batch, e)
+            return
+        try:
+            stopping = False
+            while not stopping:
+                first = self._queue.get()
+                if first is None:
+                    break
+                batch, rows = [first], len(first.rows)
+                deadline = time.monotonic() + self.max_latency
+                while rows < self.max_batch:
+                    try:
+                        request = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        break
+                    if request is None:
+                        stopping = True
+                        break
+                    batch.append(request)
+                    rows += len(request.rows)
+                self._commit(conn, batch)
+                batch = []
+        except BaseException as e:
+            # Don't leave callers waiting out COMMIT_TIMEOUT on a dead writer;
+            # the next submit starts a new one
+            self._fail_pending(batch, e)
+            raise
+        finally:
+            conn.close()
+
+    def _fail_pending(self, batch, error):
+        """Fail the batch in hand and every queued request with error."""
+        requests = list(batch)
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                requests.append(request)
+        for request in requests:
+            if not request.future.done():
+                request.future.set_exception(error)
+
+    def _commit(self, conn, batch):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            results = [database.insert_transactions_returning_ids(conn, request.rows) for request in batch]
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            if len(batch) == 1:
+                batch[0].future.set_exception(e)
+            else:
+                # Commit the requests one at a time so one bad request fails alone
+                for request in batch:
+                    self._commit(conn, [request])
+            return
+
+        for request, ids in zip(batch, results):
+            request.future.set_result(ids)
+        self._notify(batch, results)
+
+    def _notify(self, batch, results):
+        imported = duplicates = 0
+        for request, ids in zip(batch, results):
+            if len(request.rows) == 1:
+                if ids[0] is not None:
+                    trans_type, category, amount, date, _ = request.rows[0]
+                    database.notify_write("transaction_added", {"id": ids[0], "date": date, "category": category,
+                                                                "amount": amount, "type": trans_type})
+            else:
+                inserted = sum(1 for id_ in ids if id_ is not None)
+                imported += inserted
+                duplicates += len(ids) - inserted
+        if imported:
+            database.notify_write("transactions_imported",
+                                  {"inserted": imported, "updated": 0, "duplicates": duplicates})
+
+
+writer = GroupCommitWriter()
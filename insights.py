@@ -0,0 +1,99 @@
+"""
+Monthly insight engine shared by analysis.py (CLI insights) and
+report_generator.py (PDF report).
+
+Rows are located by year_month through a sorted index built once per
+loaded frame, so computing a month's insights only touches that month's
+rows (plus the previous month's for the comparison), however long the
+history is.
+"""
+from datetime import datetime
+import threading
+
+import numpy as np
+
+# Sorted year_month index of the last frame seen. Holding a reference to the
+# key array keeps its memory alive, so a matching address means the same data.
+_index_lock = threading.Lock()
+_index_cache = {"keys": None, "order": None, "sorted_keys": None}
+
+
+def _month_index(df):
+    """Return (order, sorted_keys) such that df rows order[i] have sorted year_month keys."""
+    keys = df['year_month'].to_numpy()
+    with _index_lock:
+        cached = _index_cache["keys"]
+        if (cached is not None and len(cached) == len(keys) and cached.dtype == keys.dtype
+                and cached.__array_interface__['data'][0] == keys.__array_interface__['data'][0]):
+            return _index_cache["order"], _index_cache["sorted_keys"]
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        _index_cache.update(keys=keys, order=order, sorted_keys=sorted_keys)
+        return order, sorted_keys
+
+
+def month_rows(df, year, month):
+    """Return the rows of df dated in the given year and month."""
+    order, sorted_keys = _month_index(df)
+    key = year * 100 + month
+    start, end = np.searchsorted(sorted_keys, [key, key + 1])
+    # A stable sort keeps each month's rows in their original order
+    return df.take(order[start:end])
+
+
+def _totals(rows):
+    """Single grouped pass: amount per (type, category) and per type."""
+    by_category = rows.groupby(['type', 'category'], observed=True)['amount'].sum()
+    by_type = by_category.groupby(level='type', observed=True).sum()
+    return by_category, float(by_type.get('income', 0)), float(by_type.get('expense', 0))
+
+
+def month_insights(df, year=None, month=None, top_n=3):
+    """
+    Compute the insights for one month (default: the current month).
+    Parameters:
+        df: Frame from data_loader.load_data() (needs a year_month column)
+        year, month (int): The month to summarize
+        top_n (int): Number of top spending categories to return
+    Returns:
+        A dictionary with year, month, label ('October 2025'), rows (the
+        month's transactions), total_income, total_expense, balance,
+        avg_daily_expense, top_categories (Series of category -> amount),
+        previous (the prior month's income/expense/balance, or None) and
+        savings_change (% change in balance vs. the prior month, or None).
+    """
+    now = datetime.now()
+    year = year or now.year
+    month = month or now.month
+    rows = month_rows(df, year, month)
+    by_category, income, expense = _totals(rows)
+    balance = income - expense
+
+    days_with_activity = len(np.unique(rows['date'].dt.day.to_numpy())) if len(rows) else 0
+    if 'expense' in by_category.index.get_level_values('type'):
+        top_categories = by_category.loc['expense'].sort_values(ascending=False).head(top_n)
+    else:
+        top_categories = by_category.iloc[:0].droplevel('type')
+
+    prev_year, prev_month = (year - 1, 12) if month == 1 else (year, month - 1)
+    prev_rows = month_rows(df, prev_year, prev_month)
+    previous, savings_change = None, None
+    if len(prev_rows):
+        _, prev_income, prev_expense = _totals(prev_rows)
+        prev_balance = prev_income - prev_expense
+        previous = {"total_income": prev_income, "total_expense": prev_expense, "balance": prev_balance}
+        savings_change = ((balance - prev_balance) / max(1, prev_balance)) * 100
+
+    return {
+        "year": year,
+        "month": month,
+        "label": datetime(year, month, 1).strftime("%B %Y"),
+        "rows": rows,
+        "total_income": income,
+        "total_expense": expense,
+        "balance": balance,
+        "avg_daily_expense": expense / max(1, days_with_activity),
+        "top_categories": top_categories,
+        "previous": previous,
+        "savings_change": savings_change,
+    }
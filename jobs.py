@@ -0,0 +1,411 @@
+"""
+Background jobs for PDF reports, CSV exports and large CSV imports.
+
+Jobs are rows in the 'jobs' table. Any process can submit them, and any
+process running a worker pool can execute them: a worker claims the oldest
+queued job with a single UPDATE ... RETURNING, so each job runs exactly
+once. Running jobs send a heartbeat; jobs whose worker stopped beating
+(crash, kill -9) are put back in the queue, up to MAX_ATTEMPTS times. A
+run that resumes after its job was requeued cannot commit an import or
+record an outcome: both check that the job's attempt is still its own.
+
+Each job gets its own directory, data/jobs/<job id>/, holding its input
+(uploaded CSV) and its result file (PDF or CSV).
+
+The web app runs a small pool in each worker process; on a dedicated box
+run one standalone:
+
+    python jobs.py --workers 2
+    python jobs.py --list
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import sys
+import threading
+import time
+import traceback
+import uuid
+import zipfile
+from datetime import datetime, timedelta
+
+import database
+
+JOB_KINDS = ("report", "export", "import")
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Seconds between heartbeats (with progress) of a running job, and without
+# one before it is requeued. Heartbeats cannot be written while an import
+# holds the write lock, so imports also beat inside each transaction they
+# commit (see JobContext.confirm_claim)
+HEARTBEAT_INTERVAL = 1
+STALE_AFTER = 300
+# Runs of a job before it is marked failed for good
+MAX_ATTEMPTS = 3
+# Seconds an idle worker waits before checking the queue again
+POLL_INTERVAL = 1.0
+# Finished jobs (and their files) older than this are purged
+RETENTION_DAYS = 7
+
+
+class JobError(Exception):
+    """A job failed for a reason worth showing to the user as-is."""
+
+
+def _now():
+    return datetime.now().strftime(DATE_FORMAT)
+
+
+def jobs_dir():
+    """Directory holding one subdirectory per job, next to the database file."""
+    return os.path.join(os.path.dirname(database.DB_NAME) or ".", "jobs")
+
+
+def job_dir(job_id):
+    return os.path.join(jobs_dir(), job_id)
+
+
+def _row_to_job(row):
+    if row is None:
+        return None
+    job = dict(zip(("id", "kind", "status", "params", "progress", "message", "result", "result_file",
+                    "error", "attempts", "created_at", "started_at", "finished_at"), row))
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+_JOB_COLUMNS = ("id, kind, status, params, progress, message, result, result_file, "
+                "error, attempts, created_at, started_at, finished_at")
+
+
+def submit_job(kind, params=None, upload=None):
+    """
+    Queue a job.
+    Parameters:
+        kind (str): 'report', 'export' or 'import'
+        params (dict): JSON-serializable job parameters
+        upload: Optional binary stream saved as the job's input file
+            (upload.csv) before the job becomes visible to workers
+    Returns:
+        The new job's ID.
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job_id = uuid.uuid4().hex
+    if upload is not None:
+        os.makedirs(job_dir(job_id))
+        with open(os.path.join(job_dir(job_id), "upload.csv"), "wb") as f:
+            shutil.copyfileobj(upload, f)
+    with database.transaction() as conn:
+        conn.execute("INSERT INTO jobs (id, kind, params, created_at) VALUES (?, ?, ?, ?)",
+                     (job_id, kind, json.dumps(params or {}), _now()))
+    pool.wake()
+    return job_id
+
+
+def get_job(job_id):
+    """Return a job as a dictionary, or None if there is no such job."""
+    with database.get_connection() as conn:
+        return _row_to_job(conn.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+
+def list_jobs(limit=20):
+    """Return the most recent jobs, newest first."""
+    with database.get_connection() as conn:
+        rows = conn.execute(f"SELECT {_JOB_COLUMNS} FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+    return [_row_to_job(row) for row in rows]
+
+
+def claim_job(worker_id):
+    """Atomically take the oldest queued job; returns it or None."""
+    now = _now()
+    with database.transaction() as conn:
+        row = conn.execute(f"""
+            UPDATE jobs
+            SET status = 'running', worker = ?, started_at = ?, heartbeat_at = ?,
+                attempts = attempts + 1, progress = 0, message = NULL
+            WHERE id = (SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1)
+            RETURNING {_JOB_COLUMNS}
+        """, (worker_id, now, now)).fetchone()
+    return _row_to_job(row)
+
+
+def requeue_stale_jobs():
+    """Requeue running jobs whose worker stopped sending heartbeats."""
+    cutoff = (datetime.now() - timedelta(seconds=STALE_AFTER)).strftime(DATE_FORMAT)
+    with database.transaction() as conn:
+        conn.execute("""
+            UPDATE jobs SET status = 'failed', finished_at = ?, error = 'Worker stopped responding too many times'
+            WHERE status = 'running' AND heartbeat_at < ? AND attempts >= ?
+        """, (_now(), cutoff, MAX_ATTEMPTS))
+        return conn.execute("""
+            UPDATE jobs SET status = 'queued', worker = NULL
+            WHERE status = 'running' AND heartbeat_at < ?
+        """, (cutoff,)).rowcount
+
+
+def purge_jobs(retention_days=RETENTION_DAYS):
+    """Delete finished jobs older than retention_days, with their files."""
+    cutoff = (datetime.now() - timedelta(days=retention_days)).strftime(DATE_FORMAT)
+    with database.transaction() as conn:
+        ids = [row[0] for row in conn.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ? RETURNING id", (cutoff,))]
+    for job_id in ids:
+        shutil.rmtree(job_dir(job_id), ignore_errors=True)
+    return len(ids)
+
+
+class JobContext:
+    """
+    Handed to a job handler: its parameters, directory and progress reporting.
+    Progress is only recorded in memory here; the job's heartbeat thread
+    writes it out on its own connection, so handlers may report progress
+    while they hold a transaction open.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.params = job["params"]
+        self.directory = job_dir(job["id"])
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._progress = (0.0, None)
+
+    def progress(self, fraction, message=None):
+        """Record progress (0..1) and a short status message."""
+        with self._lock:
+            self._progress = (max(0.0, min(1.0, fraction)), message)
+
+    def _beat(self, conn):
+        with self._lock:
+            fraction, message = self._progress
+        return conn.execute("""
+            UPDATE jobs SET progress = ?, message = ?, heartbeat_at = ?
+            WHERE id = ? AND status = 'running' AND attempts = ?
+        """, (fraction, message, _now(), self.job["id"], self.job["attempts"])).rowcount
+
+    def flush(self):
+        """Write the latest progress and a heartbeat to the jobs table."""
+        with database.transaction() as conn:
+            self._beat(conn)
+
+    def confirm_claim(self, conn):
+        """
+        Beat inside a transaction of the job's own, just before it commits:
+        the write lock it holds may have kept flush() out for a long time.
+        Raises JobError if the job was requeued meanwhile, so work that
+        another run is redoing is rolled back instead of applied twice.
+        """
+        if not self._beat(conn):
+            raise JobError("The job stopped sending heartbeats and was requeued.")
+
+
+def _run_report(ctx):
+    """
+    Monthly PDF reports; params: month ('YYYY-MM', default: current month),
+    or start and end ('YYYY-MM') for one report per month, zipped together.
+    """
+    from report_generator import build_report, build_reports, month_range  # pulls in matplotlib/reportlab only when needed
+
+    if ctx.params.get("start"):
+        start, end = ctx.params["start"], ctx.params.get("end") or ctx.params["start"]
+        months = month_range(start, end)
+        ctx.progress(0.0, f"Building {len(months)} reports")
+        # The worker pool is forked from a multi-threaded process, so start its processes fresh
+        paths = build_reports(
+            months, output_dir=ctx.directory, start_method="spawn",
+            on_done=lambda done, total: ctx.progress(done / total, f"{done} of {total} reports built"),
+        )
+        if not paths:
+            raise JobError("No data available for the report.")
+        archive = os.path.join(ctx.directory, "reports.zip")
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            for path in paths.values():
+                zf.write(path, os.path.basename(path))
+        return {"start": start, "end": end, "reports": len(paths)}, archive
+
+    month = ctx.params.get("month")
+    year, mon = (int(part) for part in month.split("-")) if month else (None, None)
+    ctx.progress(0.1, "Building report")
+    path = build_report(year, mon, output_dir=ctx.directory)
+    if path is None:
+        raise JobError("No data available for the report.")
+    return {"month": month}, path
+
+
+def _run_export(ctx):
+    """CSV export; params: type, category, start, end filters and gzip."""
+    from csv_io import write_transactions_csv
+
+    filters = {
+        "transaction_type": ctx.params.get("type"),
+        "category": ctx.params.get("category"),
+        "start_date": ctx.params.get("start"),
+        "end_date": ctx.params.get("end"),
+    }
+    compress = bool(ctx.params.get("gzip"))
+    total = database.count_transactions(**filters)
+    path = os.path.join(ctx.directory, "transactions.csv" + (".gz" if compress else ""))
+    ctx.progress(0.0, f"Exporting {total} transactions")
+    size = write_transactions_csv(
+        path, compress=compress,
+        progress=lambda rows: ctx.progress(rows / total if total else 1.0, f"{rows} of {total} rows written"),
+        **filters,
+    )
+    return {"rows": total, "bytes": size}, path
+
+
+def _run_import(ctx):
+    """CSV import of the job's upload.csv; params: mode ('skip', 'update' or 'fail')."""
+    from csv_io import import_csv, describe_import
+
+    mode = ctx.params.get("mode", "skip")
+    path = os.path.join(ctx.directory, "upload.csv")
+    size = os.path.getsize(path) or 1
+    with open(path, "rb") as f:
+        try:
+            result = import_csv(
+                f, on_duplicate=mode,
+                progress=lambda rows: ctx.progress(f.tell() / size, f"{rows} rows processed"),
+                before_commit=ctx.confirm_claim,
+            )
+        except database.DuplicateTransactionError:
+            raise JobError("Import cancelled: the file contains transactions that were already imported.")
+        except ValueError as e:
+            raise JobError(str(e))
+    success, message = describe_import(result, mode)
+    if not success:
+        raise JobError(message)
+    result["rejects"] = [{"line": line, "reason": reason} for line, reason in result["rejects"]]
+    result["message"] = message
+    os.remove(path)
+    return result, None
+
+
+HANDLERS = {"report": _run_report, "export": _run_export, "import": _run_import}
+
+
+def run_job(job):
+    """Execute a claimed job and record its outcome."""
+    ctx = JobContext(job)
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                ctx.flush()
+            except Exception:
+                # e.g. the database is locked by the job's own import; try again next beat
+                pass
+
+    beater = threading.Thread(target=beat, name=f"job-heartbeat-{job['id'][:8]}", daemon=True)
+    beater.start()
+    try:
+        result, path = HANDLERS[job["kind"]](ctx)
+        status, error = "done", None
+    except JobError as e:
+        result, path, status, error = None, None, "failed", str(e)
+    except Exception as e:
+        traceback.print_exc()
+        result, path, status, error = None, None, "failed", f"{type(e).__name__}: {e}"
+    finally:
+        stop.set()
+        beater.join()
+
+    # A requeued job belongs to its newer run, which records its own outcome
+    with database.transaction() as conn:
+        conn.execute("""
+            UPDATE jobs SET status = ?, progress = CASE WHEN ? = 'done' THEN 1 ELSE progress END,
+                result = ?, result_file = ?, error = ?, finished_at = ?, message = NULL
+            WHERE id = ? AND attempts = ?
+        """, (status, status, json.dumps(result) if result is not None else None,
+              os.path.basename(path) if path else None, error, _now(), job["id"], job["attempts"]))
+    return status
+
+
+class WorkerPool:
+    """Threads that claim and run queued jobs until stopped."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._threads = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def start(self, workers):
+        """Start the pool with `workers` threads (no-op if it is already running)."""
+        with self._lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            worker_base = f"{socket.gethostname()}:{os.getpid()}"
+            for i in range(workers):
+                thread = threading.Thread(target=self._work, args=(f"{worker_base}:{i}", i == 0),
+                                          name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def wake(self):
+        """Tell idle workers a job was queued."""
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        """Stop taking jobs and wait for running ones to finish (up to timeout seconds)."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        self._stop.set()
+        self._wake.set()
+        for thread in threads:
+            thread.join(timeout)
+
+    def _work(self, worker_id, housekeeper):
+        last_housekeeping = 0.0
+        while not self._stop.is_set():
+            try:
+                if housekeeper and time.monotonic() - last_housekeeping > STALE_AFTER:
+                    last_housekeeping = time.monotonic()
+                    requeue_stale_jobs()
+                    purge_jobs()
+                job = claim_job(worker_id)
+            except Exception:
+                traceback.print_exc()
+                job = None
+            if job:
+                run_job(job)
+                continue
+            self._wake.wait(POLL_INTERVAL)
+            self._wake.clear()
+
+
+pool = WorkerPool()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run background job workers.")
+    parser.add_argument("--workers", type=int, default=2, help="worker threads (default: 2)")
+    parser.add_argument("--list", action="store_true", help="list recent jobs and exit")
+    args = parser.parse_args(argv)
+
+    database.initialize_schema()
+    if args.list:
+        for job in list_jobs():
+            print(f"{job['id']}  {job['kind']:<7} {job['status']:<8} {job['progress'] * 100:5.1f}%  "
+                  f"{job['created_at']}  {job['error'] or job['message'] or ''}")
+        return 0
+
+    pool.start(args.workers)
+    print(f"🛠️ Job workers running ({args.workers} threads). Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("⏳ Finishing running jobs...")
+        pool.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Live dashboard updates pushed to browsers over Server-Sent Events.
+
+database.py calls its write listeners after every commit; the hub turns
+those calls into compact delta events and fans them out to every open
+/api/events stream:
+- transaction: {"action": "added" | "updated" | "deleted", "transaction": {...}}
+- import:      {"inserted": n, "updated": n, "duplicates": n}
+- summary:     the /api/summary payload (totals and budget status)
+- refresh:     {} when the ledger was changed by another process or by a
+               batch of edits (clients reload their data)
+
+One dispatcher thread per process does the work, so the summary is
+computed once per burst of writes no matter how many dashboards are open.
+It also checks the database's data version every WATCH_INTERVAL seconds
+to catch writes made by other processes (CLI imports, other workers).
+"""
+import json
+import queue
+import threading
+
+import database
+
+# Seconds between data-version checks for writes from other processes
+WATCH_INTERVAL = 2.0
+# Seconds between keep-alive comments on an idle stream
+KEEPALIVE_INTERVAL = 15.0
+# Events buffered per client before it is told to resynchronize
+CLIENT_QUEUE_SIZE = 100
+
+_EVENT_NAMES = {
+    "transaction_added": ("transaction", "added"),
+    "transaction_updated": ("transaction", "updated"),
+    "transaction_deleted": ("transaction", "deleted"),
+}
+
+
+def format_event(event, data):
+    """Encode one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def summary_payload():
+    """The same totals and budget status /api/summary returns."""
+    total_income, total_expense, balance = database.get_summary()
+    return {
+        'total_income': total_income,
+        'total_expense': total_expense,
+        'balance': balance,
+        'budget_status': database.check_monthly_budget(),
+    }
+
+
+class EventHub:
+    """Fan committed writes out to subscribed SSE clients."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = set()
+        self._writes = queue.Queue()
+        self._thread = None
+        self._version = None
+        self._closed = False
+
+    def subscribe(self):
+        """Register a client; returns the queue its stream reads events from."""
+        client = queue.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        with self._lock:
+            if self._closed:
+                client.put_nowait(None)
+                return client
+            self._clients.add(client)
+            if self._thread is None:
+                database.add_write_listener(self.on_write)
+                self._version = database.get_data_version()[:2]
+                self._thread = threading.Thread(target=self._dispatch, name="live-updates", daemon=True)
+                self._thread.start()
+        return client
+
+    def unsubscribe(self, client):
+        with self._lock:
+            self._clients.discard(client)
+
+    def close(self):
+        """End every open stream (used for graceful shutdown); new streams end at once."""
+        with self._lock:
+            self._closed = True
+            clients = list(self._clients)
+        for client in clients:
+            try:
+                client.put_nowait(None)
+            except queue.Full:
+                client.get_nowait()
+                client.put_nowait(None)
+
+    def on_write(self, event, data):
+        """database write listener: hand the write to the dispatcher thread."""
+        self._writes.put((event, data))
+
+    def publish(self, event, data):
+        message = format_event(event, data)
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            try:
+                client.put_nowait(message)
+            except queue.Full:
+                # A stalled client: drop its backlog and have it reload its data
+                while not client.empty():
+                    try:
+                        client.get_nowait()
+                    except queue.Empty:
+                        break
+                client.put_nowait(format_event("refresh", {}))
+
+    def _dispatch(self):
+        while True:
+            try:
+                writes = [self._writes.get(timeout=WATCH_INTERVAL)]
+            except queue.Empty:
+                writes = []
+            # Coalesce a burst of writes into one summary
+            while True:
+                try:
+                    writes.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            with self._lock:
+                if not self._clients:
+                    continue
+            try:
+                self._publish_writes(writes)
+            except Exception:
+                # The database may be briefly unavailable; retry on the next round
+                pass
+
+    def _publish_writes(self, writes):
+        version = database.get_data_version()[:2]
+        if not writes and version == self._version:
+            return
+        for event, data in writes:
+            if event in _EVENT_NAMES:
+                name, action = _EVENT_NAMES[event]
+                self.publish(name, {"action": action, "transaction": data})
+            elif event == "transactions_imported":
+                self.publish("import", data)
+            elif event == "transactions_changed":
+                # A batch may touch any rows: have clients reload their tables
+                self.publish("refresh", {})
+        if not writes:
+            self.publish("refresh", {})
+        self._version = version
+        self.publish("summary", summary_payload())
+
+
+hub = EventHub()
+
+
+def event_stream(client):
+    """Yield SSE messages for one subscribed client until it disconnects."""
+    try:
+        # Reconnect after 5 s if the connection drops
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                message = client.get(timeout=KEEPALIVE_INTERVAL)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if message is None:
+                return
+            yield message
+    finally:
+        hub.unsubscribe(client)
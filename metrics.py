@@ -0,0 +1,402 @@
+"""
+Performance instrumentation: request latency, SQL timing and a slow-query log.
+
+- Requests: app.py records every request's latency in a histogram per
+  (method, route template) and counts responses per status code. The
+  latency covers the view function; a streamed body (CSV export, live
+  updates) keeps sending after it is measured.
+- SQL: pooled connections are opened with TimedConnection, whose cursors
+  time each statement (execute plus the fetches that read its rows) and
+  count the rows it returned or changed. Statements are grouped by
+  fingerprint: the SQL with literals replaced by ? and whitespace
+  collapsed. Rows read by iterating a cursor directly are timed but not
+  counted.
+- Slow queries: statements taking at least SLOW_QUERY_MS are logged to the
+  'finance.slow_query' logger and kept in a short in-memory list. The
+  logger is silent unless the application configures logging or calls
+  log_slow_queries(), as serve.py and the development server do, so the
+  CLI tools don't print warnings to stderr.
+- Server errors: the message of recent 5xx responses, which the routes
+  otherwise only hand back to the client.
+
+Everything is in memory and per process: with several serve.py workers
+each one reports its own numbers. /metrics renders them in the Prometheus
+text format and /debug/perf as JSON. Both expose SQL text and error
+messages, so they answer only requests carrying FINANCE_METRICS_TOKEN
+(as a bearer token or ?token=), or, if no token is set, only in debug
+mode.
+
+Recording costs a few microseconds per statement and request. Set
+FINANCE_METRICS=0 to turn it off, FINANCE_SLOW_QUERY_MS to move the
+slow-query threshold.
+"""
+from collections import deque
+from functools import lru_cache
+import hmac
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+ENABLED = os.environ.get("FINANCE_METRICS", "1") != "0"
+# Token /metrics and /debug/perf require, if set
+TOKEN = os.environ.get("FINANCE_METRICS_TOKEN") or None
+# Statements at least this slow are logged
+SLOW_QUERY_MS = float(os.environ.get("FINANCE_SLOW_QUERY_MS", 100))
+# Slow queries and server errors kept for /debug/perf
+RECENT_LIMIT = 100
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+slow_query_log = logging.getLogger("finance.slow_query")
+slow_query_log.addHandler(logging.NullHandler())
+
+
+def log_slow_queries(stream=None):
+    """Write slow-query warnings to stream (default: stderr). Calling it again has no effect."""
+    if not any(isinstance(h, logging.StreamHandler) for h in slow_query_log.handlers):
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        slow_query_log.addHandler(handler)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram (thread-safe)."""
+
+    __slots__ = ("counts", "count", "sum", "max", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)  # the last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = 0
+        while index < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[index]:
+            index += 1
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.count, self.sum, self.max
+
+    def quantile(self, q):
+        """Estimate the q-quantile in seconds by interpolating inside its bucket."""
+        counts, count, _, maximum = self.snapshot()
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            if bucket_count and seen + bucket_count >= rank:
+                low = LATENCY_BUCKETS[index - 1] if index else 0.0
+                high = LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else maximum
+                return min(low + (high - low) * (rank - seen) / bucket_count, maximum)
+            seen += bucket_count
+        return maximum
+
+
+class QueryStats:
+    __slots__ = ("calls", "seconds", "rows", "max", "slow")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.max = 0.0
+        self.slow = 0
+
+
+class Registry:
+    """All metrics of this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests = {}        # (method, route) -> Histogram
+        self.responses = {}       # (method, route, status) -> count
+        self.queries = {}         # fingerprint -> QueryStats
+        self.query_latency = Histogram()
+        self.slow_queries = deque(maxlen=RECENT_LIMIT)
+        self.errors = deque(maxlen=RECENT_LIMIT)
+
+    def observe_request(self, method, route, status, seconds, error=None):
+        key = (method, route)
+        histogram = self.requests.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self.requests.setdefault(key, Histogram())
+        histogram.observe(seconds)
+        with self._lock:
+            self.responses[(method, route, status)] = self.responses.get((method, route, status), 0) + 1
+            if status >= 500:
+                self.errors.append({"time": time.time(), "method": method, "route": route, "status": status,
+                                    "error": error})
+
+    def observe_query(self, sql, seconds, rows):
+        fingerprint = sql_fingerprint(sql)
+        self.query_latency.observe(seconds)
+        slow = seconds * 1000 >= SLOW_QUERY_MS
+        with self._lock:
+            stats = self.queries.get(fingerprint)
+            if stats is None:
+                stats = self.queries[fingerprint] = QueryStats()
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.rows += rows
+            if seconds > stats.max:
+                stats.max = seconds
+            if slow:
+                stats.slow += 1
+                self.slow_queries.append({"time": time.time(), "statement": fingerprint,
+                                          "ms": round(seconds * 1000, 3), "rows": rows})
+        if slow:
+            slow_query_log.warning("slow query (%.1f ms, %d rows): %s", seconds * 1000, rows, fingerprint)
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+            self.responses.clear()
+            self.queries.clear()
+            self.query_latency = Histogram()
+            self.slow_queries.clear()
+            self.errors.clear()
+
+
+registry = Registry()
+
+
+# Quoted strings and numbers, but not the digits of ?1-style parameters or of identifiers
+_LITERALS = re.compile(r"'(?:[^']|'')*'|(?<![\w?$:@.])\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def sql_fingerprint(sql):
+    """Normalize a statement for grouping: literals become ?, lists of ? collapse, whitespace is single."""
+    sql = _LITERALS.sub("?", sql)
+    sql = _IN_LISTS.sub("(?, ...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor reporting each statement's time and row count to the registry."""
+
+    def _begin(self, sql):
+        self._finish()
+        self._sql = sql
+        self._seconds = 0.0
+        self._rows = 0
+
+    def _finish(self):
+        sql = getattr(self, "_sql", None)
+        if sql is not None:
+            self._sql = None
+            rows = self._rows if self._rows else max(self.rowcount, 0)
+            registry.observe_query(sql, self._seconds, rows)
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._seconds += time.perf_counter() - start
+            if self.description is None:
+                # No result rows to read: the statement is complete
+                self._finish()
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._seconds += time.perf_counter() - start
+            self._finish()
+
+    def executescript(self, sql_script):
+        self._begin(sql_script)
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            self._seconds += time.perf_counter() - start
+            self._finish()
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._seconds += time.perf_counter() - start
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._seconds += time.perf_counter() - start
+        self._rows += len(rows)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._seconds += time.perf_counter() - start
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # Statements whose cursor is dropped before its rows run out
+        self._finish()
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose cursors (including the execute shortcuts') are TimedCursors."""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def authorized(token, debug=False):
+    """
+    Whether a request may read the metrics endpoints.
+    Without FINANCE_METRICS_TOKEN, only when debug is true.
+    """
+    if TOKEN is None:
+        return debug
+    return bool(token) and hmac.compare_digest(token.encode(), TOKEN.encode())
+
+
+def connection_factory():
+    """The sqlite3.connect factory for new connections: timed when metrics are on."""
+    return TimedConnection if ENABLED else sqlite3.Connection
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _histogram_lines(name, histogram, **labels):
+    counts, count, total, _ = histogram.snapshot()
+    lines, cumulative = [], 0
+    for bound, bucket_count in zip(LATENCY_BUCKETS + ("+Inf",), counts):
+        cumulative += bucket_count
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+    lines.append(f"{name}_sum{_labels(**labels) if labels else ''} {total:.6f}")
+    lines.append(f"{name}_count{_labels(**labels) if labels else ''} {count}")
+    return lines
+
+
+def render_prometheus():
+    """This process's metrics in the Prometheus text exposition format."""
+    with registry._lock:
+        requests = list(registry.requests.items())
+        responses = list(registry.responses.items())
+        queries = [(fp, stats.calls, stats.seconds, stats.rows, stats.slow) for fp, stats in registry.queries.items()]
+    lines = [
+        "# HELP finance_process_start_time_seconds Start time of the process since the Unix epoch.",
+        "# TYPE finance_process_start_time_seconds gauge",
+        f"finance_process_start_time_seconds {registry.started:.3f}",
+        "# HELP finance_http_request_duration_seconds Time spent handling requests.",
+        "# TYPE finance_http_request_duration_seconds histogram",
+    ]
+    for (method, route), histogram in sorted(requests):
+        lines += _histogram_lines("finance_http_request_duration_seconds", histogram, method=method, route=route)
+    lines += ["# HELP finance_http_responses_total Responses sent, by status code.",
+              "# TYPE finance_http_responses_total counter"]
+    for (method, route, status), count in sorted(responses):
+        lines.append(f"finance_http_responses_total{_labels(method=method, route=route, status=status)} {count}")
+    lines += ["# HELP finance_sql_query_duration_seconds Time spent on SQL statements.",
+              "# TYPE finance_sql_query_duration_seconds histogram"]
+    lines += _histogram_lines("finance_sql_query_duration_seconds", registry.query_latency)
+    for name, kind, help_text, index in (
+        ("finance_sql_statements_total", "counter", "Statements executed, by fingerprint.", 1),
+        ("finance_sql_statement_seconds_total", "counter", "Time spent per statement fingerprint.", 2),
+        ("finance_sql_rows_total", "counter", "Rows returned or changed per statement fingerprint.", 3),
+        ("finance_sql_slow_statements_total", "counter",
+         f"Statements taking at least {SLOW_QUERY_MS:g} ms, by fingerprint.", 4),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for query in sorted(queries):
+            value = query[index]
+            lines.append(f"{name}{_labels(statement=query[0])} {value:.6f}" if isinstance(value, float)
+                         else f"{name}{_labels(statement=query[0])} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def perf_summary(top=20):
+    """A JSON-friendly overview: slowest routes, costliest statements, recent slow queries and errors."""
+    with registry._lock:
+        requests = list(registry.requests.items())
+        queries = [(fp, stats.calls, stats.seconds, stats.rows, stats.max, stats.slow)
+                   for fp, stats in registry.queries.items()]
+        slow_queries = list(registry.slow_queries)
+        errors = list(registry.errors)
+        responses = dict(registry.responses)
+
+    routes = []
+    for (method, route), histogram in requests:
+        _, count, total, maximum = histogram.snapshot()
+        routes.append({
+            "method": method, "route": route, "count": count,
+            "errors": sum(n for (m, r, status), n in responses.items() if m == method and r == route and status >= 500),
+            "mean_ms": round(total / count * 1000, 3) if count else 0.0,
+            "p50_ms": round(histogram.quantile(0.5) * 1000, 3),
+            "p95_ms": round(histogram.quantile(0.95) * 1000, 3),
+            "p99_ms": round(histogram.quantile(0.99) * 1000, 3),
+            "max_ms": round(maximum * 1000, 3),
+            "total_ms": round(total * 1000, 3),
+        })
+    routes.sort(key=lambda r: r["total_ms"], reverse=True)
+
+    statements = [{
+        "statement": fp, "calls": calls, "rows": rows, "slow": slow,
+        "total_ms": round(seconds * 1000, 3),
+        "mean_ms": round(seconds / calls * 1000, 3) if calls else 0.0,
+        "max_ms": round(maximum * 1000, 3),
+    } for fp, calls, seconds, rows, maximum, slow in queries]
+    statements.sort(key=lambda s: s["total_ms"], reverse=True)
+
+    return {
+        "pid": os.getpid(),
+        "enabled": ENABLED,
+        "uptime_seconds": round(time.time() - registry.started, 1),
+        "slow_query_ms": SLOW_QUERY_MS,
+        "routes": routes[:top],
+        "statements": statements[:top],
+        "slow_queries": slow_queries[::-1],
+        "errors": errors[::-1],
+    }
@@ -0,0 +1,184 @@
+"""
+Opt-in cProfile hooks for the command-line tools and the web app.
+
+Each profile is written to the profile directory as two files sharing a
+name: <name>.prof, a pstats dump for `python -m pstats`, snakeviz and the
+like, and <name>.txt, a flat summary of the TOP_N functions by cumulative
+and by own time.
+
+- CLI tools take --profile [DIR] (see add_profile_arguments) and profile
+  the whole command.
+- The web app profiles a request when it carries an X-Profile header or a
+  ?profile= query parameter, and a random SAMPLE_RATE share of all
+  requests. Triggers are honored when their value is
+  FINANCE_PROFILE_TOKEN, or, if no token is set, only in debug mode.
+  Only the view function is profiled, not the streaming of a response
+  body. cProfile only sees the thread that enabled it, so work the view
+  would hand to an executor lane runs inline on the request thread; rows
+  written through the group-commit writer are still not included.
+
+Only one profile is collected at a time per process (cProfile cannot
+nest); a request arriving while another is profiled just runs normally.
+The directory keeps the newest PROFILE_LIMIT profiles.
+
+Configured with FINANCE_PROFILE_DIR (default: data/profiles next to the
+database), FINANCE_PROFILE_SAMPLE (0-1, default 0), FINANCE_PROFILE_TOKEN
+and FINANCE_PROFILE_TOP.
+"""
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+PROFILE_DIRNAME = "profiles"
+# Share of web requests profiled without a trigger
+SAMPLE_RATE = float(os.environ.get("FINANCE_PROFILE_SAMPLE", 0))
+# Value a trigger must carry, if set
+TOKEN = os.environ.get("FINANCE_PROFILE_TOKEN") or None
+# Functions listed in each summary
+TOP_N = int(os.environ.get("FINANCE_PROFILE_TOP", 30))
+# Profiles kept before the oldest are removed
+PROFILE_LIMIT = 200
+
+_active = threading.Lock()
+
+
+def profile_dir():
+    """Directory profiles are written to: FINANCE_PROFILE_DIR, or profiles/ next to the database."""
+    configured = os.environ.get("FINANCE_PROFILE_DIR")
+    if configured:
+        return configured
+    import database
+
+    return os.path.join(os.path.dirname(database.DB_NAME) or ".", PROFILE_DIRNAME)
+
+
+def summarize(stats, top=TOP_N):
+    """Flat text summary of a pstats.Stats: the top functions by cumulative and by own time."""
+    out = io.StringIO()
+    stats.stream = out
+    for order, title in (("cumulative", "cumulative time"), ("tottime", "own time")):
+        out.write(f"=== Top {top} by {title} ===\n")
+        stats.sort_stats(order).print_stats(top)
+    return out.getvalue()
+
+
+def _prune(directory):
+    profiles = []
+    for name in os.listdir(directory):
+        if name.endswith(".prof"):
+            path = os.path.join(directory, name)
+            try:
+                profiles.append((os.stat(path).st_mtime, path))
+            except OSError:
+                continue
+    profiles.sort()
+    for _, path in profiles[:max(len(profiles) - PROFILE_LIMIT, 0)]:
+        for file in (path, path[:-len(".prof")] + ".txt"):
+            try:
+                os.remove(file)
+            except OSError:
+                pass
+
+
+def save_profile(profiler, name, directory=None, top=TOP_N):
+    """
+    Write a finished profile and its summary.
+    Parameters:
+        profiler (cProfile.Profile): A disabled profiler
+        name (str): What was profiled, e.g. 'report' or 'GET /api/summary'
+        directory (str): Target directory (default: profile_dir())
+        top (int): Functions listed in the summary
+    Returns:
+        A dictionary with the 'profile' and 'summary' file paths.
+    """
+    directory = directory or profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_") or "profile"
+    # pid and a clock tick keep names from concurrent workers and quick repeats apart
+    stamp = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{time.perf_counter_ns() % 10**6:06d}"
+    stem = os.path.join(directory, f"{stamp}-{slug}")
+    stats = pstats.Stats(profiler)
+    stats.dump_stats(stem + ".prof")
+    with open(stem + ".txt", "w") as f:
+        f.write(f"{name}\n")
+        f.write(summarize(stats, top))
+    _prune(directory)
+    return {"profile": stem + ".prof", "summary": stem + ".txt"}
+
+
+def start():
+    """A running profiler, or None if another profile is being collected in this process."""
+    if not _active.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except Exception:
+        _active.release()
+        return None
+    return profiler
+
+
+def stop(profiler):
+    """Stop a profiler returned by start()."""
+    profiler.disable()
+    _active.release()
+
+
+@contextmanager
+def profiled(name, directory=None, top=TOP_N, enabled=True):
+    """
+    Profile the body of the with block and save the result.
+    Yields a dictionary that holds the file paths after the block ends
+    (empty if profiling was disabled or another profile was running).
+    """
+    files = {}
+    profiler = start() if enabled else None
+    try:
+        yield files
+    finally:
+        if profiler is not None:
+            stop(profiler)
+            files.update(save_profile(profiler, name, directory, top))
+
+
+def requested(value, debug=False):
+    """
+    Whether a request trigger (header or query parameter value) asks for a profile.
+    Without FINANCE_PROFILE_TOKEN, triggers only work when debug is true.
+    """
+    if not value:
+        return False
+    if TOKEN is not None:
+        return hmac.compare_digest(value.encode(), TOKEN.encode())
+    return debug and value.lower() not in ("0", "false", "no", "off")
+
+
+def sampled():
+    """Whether to profile a request without a trigger."""
+    return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+
+def add_profile_arguments(parser):
+    """Add --profile [DIR] and --profile-top to a CLI parser."""
+    parser.add_argument("--profile", nargs="?", const="", metavar="DIR",
+                        help="profile the command with cProfile and save the stats to DIR "
+                             "(default: FINANCE_PROFILE_DIR or data/profiles)")
+    parser.add_argument("--profile-top", type=int, default=TOP_N, metavar="N",
+                        help=f"functions listed in the profile summary (default: {TOP_N})")
+
+
+@contextmanager
+def profile_command(args, name):
+    """Profile a CLI command if args (from add_profile_arguments) ask for it, and say where the files are."""
+    with profiled(name, args.profile or None, args.profile_top, enabled=args.profile is not None) as files:
+        yield
+    if files:
+        print(f"⏱️ Profile saved to {files['profile']} (summary: {files['summary']})")
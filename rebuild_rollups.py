@@ -0,0 +1,45 @@
+"""
+Rebuild or verify the rollup tables (totals_by_type, totals_by_category,
+monthly_totals, daily_totals) that back the dashboard summaries and the
+daily running balances.
+
+Usage:
+    python rebuild_rollups.py            # verify, then rebuild if anything is off
+    python rebuild_rollups.py --verify   # only report mismatches
+    python rebuild_rollups.py --force    # always rebuild
+"""
+import argparse
+import sys
+
+from database import create_table, create_budget_table, rebuild_rollups, verify_rollups
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild or verify the transaction rollup tables.")
+    parser.add_argument("--verify", action="store_true", help="only report mismatches, do not rebuild")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the rollups are exact")
+    args = parser.parse_args(argv)
+
+    # Make sure the schema (and its rollup migration) is in place
+    create_table()
+    create_budget_table()
+
+    mismatches = verify_rollups()
+    for table, key, stored, expected in mismatches:
+        print(f"❌ {table} {key}: stored total={stored[0]:,.2f} count={stored[1]}, "
+              f"expected total={expected[0]:,.2f} count={expected[1]}")
+
+    if args.verify:
+        print("✅ Rollups are exact." if not mismatches else f"⚠️ {len(mismatches)} rollup rows are out of date.")
+        return 1 if mismatches else 0
+
+    if mismatches or args.force:
+        rebuild_rollups()
+        print("✅ Rollup tables rebuilt.")
+    else:
+        print("✅ Rollups are exact. Nothing to rebuild.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,84 +8,95 @@
 # - Top 3 Expense Categories
 # - Monthly Spending Chart
 # ---------------------------------------------------------------
-import pandas as pd
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+import argparse
+import multiprocessing
 import os
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-import matplotlib.pyplot as plt
-from database import connect, check_monthly_budget
+from database import create_table, create_budget_table, check_monthly_budget
+import profiling
+# reportlab, insights/data_loader (numpy, pandas) and charts (matplotlib) are
+# imported when a report is built, so `--help` and importing this module stay fast
 
 # --- Configuration ---
 EXPORT_DIR = "data"
 LOGO_PATH = "assets/logo.png"  # Place your logo here
-os.makedirs(EXPORT_DIR, exist_ok=True)
-os.makedirs("assets", exist_ok=True)
 
 # --- Color Theme ---
 THEME = {
-    "primary": colors.HexColor("#1E3A8A"),      # Deep Blue
-    "secondary": colors.HexColor("#EFF6FF"),    # Very Light Blue
-    "text": colors.HexColor("#1F2937"),         # Dark Gray
-    "accent_good": colors.HexColor("#10B981"),  # Green
-    "accent_bad": colors.HexColor("#EF4444"),    # Red
-    "grid": colors.HexColor("#D1D5DB"),         # Light Gray for grids
+    "primary": "#1E3A8A",      # Deep Blue
+    "secondary": "#EFF6FF",    # Very Light Blue
+    "text": "#1F2937",         # Dark Gray
+    "accent_good": "#10B981",  # Green
+    "accent_bad": "#EF4444",    # Red
+    "grid": "#D1D5DB",         # Light Gray for grids
 }
 
-def load_data():
-    """Load all transactions from the SQLite database into a pandas DataFrame."""
-    conn = connect()
-    query = "SELECT date, category, amount, type FROM transactions"
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    return df
-
-def generate_monthly_summary(df):
-    """Generate summary statistics for the current month."""
-    now = datetime.now()
-    this_month = df[df['date'].dt.month == now.month]
-
-    total_income = this_month.loc[this_month['type'] == 'income', 'amount'].sum()
-    total_expense = this_month.loc[this_month['type'] == 'expense', 'amount'].sum()
-    balance = total_income - total_expense
-
-    top_categories = (
-        this_month[this_month['type'] == 'expense']
-        .groupby('category')['amount']
-        .sum()
-        .sort_values(ascending=False)
-        .head(3)
-    )
+@lru_cache(maxsize=None)
+def theme_colors():
+    """THEME as ReportLab colors."""
+    from reportlab.lib import colors
+
+    return {name: colors.HexColor(value) for name, value in THEME.items()}
+
+@lru_cache(maxsize=None)
+def report_styles():
+    """
+    Period-independent ReportLab styles, built once per process and shared
+    by every report: the sample style sheet and the table styles.
+    """
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import TableStyle
+
+    theme = theme_colors()
+    return {
+        "sheet": getSampleStyleSheet(),
+        "summary_table": TableStyle([
+            ("BACKGROUND", (0, 0), (0, -1), theme["secondary"]),
+            ("TEXTCOLOR", (0, 0), (-1, -1), theme["text"]),
+            ("ALIGN", (0, 0), (-1, -1), "LEFT"),
+            ("FONTNAME", (0, 0), (-1, -1), "Helvetica-Bold"),
+            ("GRID", (0, 0), (-1, -1), 1, theme["grid"]),
+        ]),
+        "detail_table": TableStyle([
+            ("GRID", (0, 0), (-1, -1), 1, theme["grid"]),
+            ("BACKGROUND", (0, 0), (0, -1), theme["secondary"]),
+            ("ALIGN", (0, 0), (-1, -1), "LEFT"),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ]),
+        "category_table": TableStyle([
+            ("GRID", (0, 0), (-1, -1), 1, theme["grid"]),
+            ("BACKGROUND", (0, 0), (0, -1), theme["secondary"]),
+        ]),
+    }
 
+def generate_monthly_summary(df, year=None, month=None):
+    """Generate summary statistics for a month (default: the current month)."""
+    from insights import month_insights
+
+    insight = month_insights(df, year, month)
     summary = {
-        "month": now.strftime("%B %Y"),
-        "total_income": total_income,
-        "total_expense": total_expense,
-        "balance": balance,
-        "top_categories": top_categories
+        "month": insight["label"],
+        "total_income": insight["total_income"],
+        "total_expense": insight["total_expense"],
+        "balance": insight["balance"],
+        "top_categories": insight["top_categories"]
     }
-    return summary, this_month
-
-def plot_monthly_chart(df, filename):
-    """Plot income vs expense chart for the month."""
-    df['day'] = df['date'].dt.day
-    daily_summary = df.groupby(['day', 'type'])['amount'].sum().unstack(fill_value=0)
-
-    plt.figure(figsize=(8, 4))
-    daily_summary.plot(kind='bar', stacked=True, color=[THEME["accent_good"], THEME["accent_bad"]])
-    plt.title("Daily Income vs Expense")
-    plt.xlabel("Day of Month")
-    plt.ylabel("Amount (Ksh)")
-    plt.legend(title="Type", facecolor=THEME["secondary"])
-    plt.grid(axis='y', linestyle='--', alpha=0.6)
-    plt.tight_layout()
-    chart_path = os.path.join(EXPORT_DIR, filename)
-    plt.savefig(chart_path)
-    plt.close()
-    return chart_path
+    return summary, insight["rows"]
+
+def plot_monthly_chart(df):
+    """Income vs expense chart for the month as an in-memory PNG; returns None if df is empty."""
+    import matplotlib
+    # Reports are always rendered headless, whatever the environment's default backend
+    matplotlib.use("Agg")
+    from charts import daily_chart_png
+
+    return daily_chart_png(
+        df,
+        colors=(THEME["accent_good"], THEME["accent_bad"]),
+        legend_color=THEME["secondary"],
+    )
 
 def calculate_financial_health_score(summary, budget_status):
     """Calculate a financial health score out of 100."""
@@ -114,21 +125,28 @@ def calculate_financial_health_score(summary, budget_status):
 
     score = max(0, min(100, int(score))) # Ensure score is between 0 and 100
 
+    from reportlab.lib import colors
+
     if score >= 80:
-        rating = ("Excellent", THEME["accent_good"])
+        rating = ("Excellent", theme_colors()["accent_good"])
     elif score >= 60:
         rating = ("Good", colors.orange) # Keep orange for 'Good' as it stands out
     else:
-        rating = ("Needs Improvement", THEME["accent_bad"])
+        rating = ("Needs Improvement", theme_colors()["accent_bad"])
     return score, rating
 
-def generate_pdf_report(summary, budget_status, health_score, chart_path):
-    """Create the PDF report with all details."""
+def generate_pdf_report(summary, budget_status, health_score, chart, output_dir=EXPORT_DIR):
+    """Create the PDF report with all details and return its path; chart is a PNG path or buffer (or None)."""
     filename = f"Finance_Report_{summary['month'].replace(' ', '_')}.pdf"
-    filepath = os.path.join(EXPORT_DIR, filename)
+    filepath = os.path.join(output_dir, filename)
 
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Image
+
+    theme = theme_colors()
     doc = SimpleDocTemplate(filepath, pagesize=A4)
-    styles = getSampleStyleSheet()
+    shared = report_styles()
+    styles = shared["sheet"]
     elements = []
 
     # --- Header with Logo ---
@@ -159,32 +177,21 @@ def generate_pdf_report(summary, budget_status, health_score, chart_path):
         ["Balance (Ksh)", f"{summary['balance']:,.2f}"]
     ]
     table = Table(data, hAlign="LEFT")
-    table.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (0, -1), THEME["secondary"]),
-        ("TEXTCOLOR", (0, 0), (-1, -1), THEME["text"]),
-        ("ALIGN", (0, 0), (-1, -1), "LEFT"),
-        ("FONTNAME", (0, 0), (-1, -1), "Helvetica-Bold"),
-        ("GRID", (0, 0), (-1, -1), 1, THEME["grid"]),
-    ]))
+    table.setStyle(shared["summary_table"])
     elements.append(table)
     elements.append(Spacer(1, 20))
 
     # Budget Status
     elements.append(Paragraph("<b>Budget Status</b>", styles["Heading3"]))
     if budget_status:
-        remaining_color = THEME["accent_bad"] if budget_status['is_exceeded'] else THEME["accent_good"]
+        remaining_color = theme["accent_bad"] if budget_status['is_exceeded'] else theme["accent_good"]
         budget_data = [
             ["Monthly Budget (Ksh)", f"{budget_status['budget']:,.2f}"],
             ["Total Spent (Ksh)", f"{budget_status['spent']:,.2f}"],
             ["Remaining (Ksh)", Paragraph(f"<font color='{remaining_color}'>{budget_status['remaining']:,.2f}</font>", styles["Normal"])]
         ]
         budget_table = Table(budget_data, hAlign="LEFT")
-        budget_table.setStyle(TableStyle([
-            ("GRID", (0, 0), (-1, -1), 1, THEME["grid"]),
-            ("BACKGROUND", (0, 0), (0, -1), THEME["secondary"]),
-            ("ALIGN", (0, 0), (-1, -1), "LEFT"),
-            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-        ]))
+        budget_table.setStyle(shared["detail_table"])
         elements.append(budget_table)
         if budget_status['is_exceeded']:
             elements.append(Spacer(1, 6))
@@ -202,12 +209,7 @@ def generate_pdf_report(summary, budget_status, health_score, chart_path):
         ["Rating", Paragraph(f"<font color='{rating_color}'>{rating_text}</font>", styles["Normal"])]
     ]
     score_table = Table(score_data, hAlign="LEFT")
-    score_table.setStyle(TableStyle([
-        ("GRID", (0, 0), (-1, -1), 1, THEME["grid"]),
-        ("BACKGROUND", (0, 0), (0, -1), THEME["secondary"]),
-        ("ALIGN", (0, 0), (-1, -1), "LEFT"),
-        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-    ]))
+    score_table.setStyle(shared["detail_table"])
     elements.append(score_table)
 
     elements.append(Spacer(1, 20))
@@ -219,34 +221,163 @@ def generate_pdf_report(summary, budget_status, health_score, chart_path):
     else:
         cat_data = [[cat, f"Ksh {amt:,.2f}"] for cat, amt in summary['top_categories'].items()]
         cat_table = Table(cat_data, hAlign="LEFT")
-        cat_table.setStyle(TableStyle([
-            ("GRID", (0, 0), (-1, -1), 1, THEME["grid"]),
-            ("BACKGROUND", (0, 0), (0, -1), THEME["secondary"]),
-        ]))
+        cat_table.setStyle(shared["category_table"])
         elements.append(cat_table)
 
     elements.append(Spacer(1, 20))
 
     # Add chart
     elements.append(Paragraph("<b>Daily Income vs Expense Chart</b>", styles["Heading3"]))
-    elements.append(Image(chart_path, width=400, height=200))
+    if chart:
+        elements.append(Image(chart, width=400, height=200))
+    else:
+        elements.append(Paragraph("No transactions this month.", styles["Normal"]))
 
     # Build PDF
     doc.build(elements)
     print(f"✅ PDF report generated successfully: {filepath}")
+    return filepath
 
-def main():
-    df = load_data()
+def _render_report(df, year, month, budget_status, output_dir):
+    """Summarize, plot and build the PDF for one month of an already loaded ledger."""
+    summary, month_data = generate_monthly_summary(df, year, month)
+    health_score = calculate_financial_health_score(summary, budget_status)
+    chart = plot_monthly_chart(month_data)
+    return generate_pdf_report(summary, budget_status, health_score, chart, output_dir)
+
+def build_report(year=None, month=None, output_dir=EXPORT_DIR):
+    """
+    Generate the PDF report for one month (default: the current month).
+    Parameters:
+        year, month (int): The month to report on
+        output_dir (str): Directory for the PDF
+    Returns:
+        The path of the PDF, or None if there are no transactions at all.
+    """
+    from data_loader import load_data
 
+    df = load_data()
     if df.empty:
-        print("⚠️ No data available. Please add transactions using tracker.py.")
-        return
+        return None
+    os.makedirs(output_dir, exist_ok=True)
+    now = datetime.now()
+    year, month = year or now.year, month or now.month
+    budget_status = check_monthly_budget(f"{year:04d}-{month:02d}")
+    return _render_report(df, year, month, budget_status, output_dir)
 
-    summary, month_data = generate_monthly_summary(df)
-    budget_status = check_monthly_budget()
-    health_score = calculate_financial_health_score(summary, budget_status)
-    chart_path = plot_monthly_chart(month_data, "temp_chart.png")
-    generate_pdf_report(summary, budget_status, health_score, chart_path)
+def month_range(start, end):
+    """
+    List the (year, month) pairs from start to end inclusive.
+    Parameters:
+        start, end (str): 'YYYY-MM'
+    Raises:
+        ValueError: for a malformed month or a start after the end.
+    """
+    first = datetime.strptime(start, "%Y-%m")
+    last = datetime.strptime(end, "%Y-%m")
+    if first > last:
+        raise ValueError("start month must not be after end month")
+    months = []
+    year, month = first.year, first.month
+    while (year, month) <= (last.year, last.month):
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+# Ledger shared with batch report workers. Set in the parent before the pool
+# starts, so forked workers inherit it without copying; spawned workers open
+# the memory-mapped snapshot instead, which shares pages through the OS cache.
+_shared_ledger = None
+
+def _init_batch_worker():
+    global _shared_ledger
+    if _shared_ledger is None:
+        from data_loader import load_data
+        _shared_ledger = load_data()
+    report_styles()
+
+def _batch_report(year, month, budget_status, output_dir):
+    return _render_report(_shared_ledger, year, month, budget_status, output_dir)
+
+def build_reports(months, output_dir=EXPORT_DIR, processes=None, start_method=None, on_done=None):
+    """
+    Generate one PDF per month in parallel across a process pool.
+    The ledger is loaded once and shared read-only with the workers.
+    Parameters:
+        months (list): (year, month) pairs, e.g. from month_range()
+        output_dir (str): Directory for the PDFs
+        processes (int): Pool size (default: one per CPU, at most one per month)
+        start_method (str): multiprocessing start method; use 'spawn' from
+            multi-threaded processes such as the web app
+        on_done (callable): Optional; called with (done, total) after each report
+    Returns:
+        A dictionary mapping 'YYYY-MM' to the PDF path, in month order, or
+        an empty dictionary if there are no transactions at all.
+    """
+    global _shared_ledger
+    from data_loader import load_data
+
+    ledger = load_data()
+    if ledger.empty or not months:
+        return {}
+    os.makedirs(output_dir, exist_ok=True)
+    # Budget statuses come from the database, read once here rather than per worker
+    budgets = {key: check_monthly_budget(key) for key in (f"{y:04d}-{m:02d}" for y, m in months)}
+    processes = max(1, min(processes or os.cpu_count() or 1, len(months)))
+
+    _shared_ledger = ledger
+    try:
+        context = multiprocessing.get_context(start_method)
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                                 initializer=_init_batch_worker) as pool:
+            futures = {pool.submit(_batch_report, y, m, budgets[f"{y:04d}-{m:02d}"], output_dir): f"{y:04d}-{m:02d}"
+                       for y, m in months}
+            paths = {}
+            for done, future in enumerate(as_completed(futures), 1):
+                paths[futures[future]] = future.result()
+                if on_done:
+                    on_done(done, len(futures))
+    finally:
+        _shared_ledger = None
+    return {key: paths[key] for key in sorted(paths)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate monthly PDF finance reports.")
+    parser.add_argument("--month", help="report on one month, YYYY-MM (default: the current month)")
+    parser.add_argument("--from", dest="start", help="first month of a batch, YYYY-MM")
+    parser.add_argument("--to", dest="end", help="last month of a batch, YYYY-MM (default: --from)")
+    parser.add_argument("--processes", type=int, help="worker processes for a batch (default: one per CPU)")
+    parser.add_argument("--output", default=EXPORT_DIR, help=f"output directory (default: {EXPORT_DIR})")
+    # Batch workers run in their own processes; a profile covers only the parent's share
+    profiling.add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with profiling.profile_command(args, "report"):
+        run_reports(args, parser)
+
+def run_reports(args, parser):
+    """Generate the reports asked for by the parsed command line."""
+    try:
+        if args.start:
+            months = month_range(args.start, args.end or args.start)
+            paths = build_reports(months, args.output, args.processes)
+            if not paths:
+                print("⚠️ No data available. Please add transactions using tracker.py.")
+            else:
+                print(f"✅ {len(paths)} reports generated in {args.output}")
+            return
+        year = month = None
+        if args.month:
+            period = datetime.strptime(args.month, "%Y-%m")
+            year, month = period.year, period.month
+    except ValueError as e:
+        parser.error(str(e))
+
+    if build_report(year, month, args.output) is None:
+        print("⚠️ No data available. Please add transactions using tracker.py.")
 
 if __name__ == "__main__":
+    # Ensure all tables (and schema migrations) exist on startup
+    create_table()
+    create_budget_table()
     main()
@@ -0,0 +1,258 @@
+"""
+Production entry point for the Finance Tracker web app.
+
+    python serve.py                          # one worker per CPU, port 8000
+    python serve.py --workers 4 --threads 16 --port 5000
+    python serve.py --server builtin         # force the pure-Python server
+
+Servers, in the order --server auto picks them:
+- gunicorn (POSIX): pre-forked workers with a thread pool each (gthread)
+- waitress: one multi-threaded process (works on Windows)
+- builtin: the standard library's wsgiref server, threaded, pre-forked
+  into --workers processes where os.fork is available
+
+The schema is created/migrated once in the parent before any worker
+starts. Each worker then warms up (pooled connection, templates, response
+cache) before serving. On SIGTERM/SIGINT workers stop accepting
+connections, close open live-update streams and finish in-flight requests
+for up to --graceful-timeout seconds.
+
+Every open dashboard holds one live-update (/api/events) connection, and
+with gunicorn or waitress each one occupies a worker thread. A worker
+keeps at most LIVE_UPDATE_CLIENTS (app.py) streams open, so keep --threads
+above it; dashboards beyond that get a 503 and poll instead.
+"""
+import argparse
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler
+
+import database
+from app import app, warmup
+from live_updates import hub
+from executor import shutdown_lanes
+import ingest
+import jobs
+import metrics
+
+SERVERS = ("auto", "gunicorn", "waitress", "builtin")
+
+
+def stop_worker():
+    """Release a worker's resources: end live-update streams, flush pending writes, drain executor lanes, close connections."""
+    hub.close()
+    ingest.writer.stop()
+    jobs.pool.stop()
+    shutdown_lanes()
+    database.close_connections()
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    """wsgiref server handling each connection in its own thread."""
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._active = 0
+        self._idle = threading.Condition()
+
+    def process_request_thread(self, request, client_address):
+        with self._idle:
+            self._active += 1
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            with self._idle:
+                self._active -= 1
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout):
+        """Wait for in-flight requests to finish; returns False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._active == 0, timeout)
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Request handler that only logs when access logging is on."""
+    access_log = False
+
+    def log_request(self, code="-", size="-"):
+        if self.access_log:
+            super().log_request(code, size)
+
+
+def _serve_worker(server, graceful_timeout):
+    """Run one builtin-server worker until SIGTERM/SIGINT, then drain it."""
+    def request_stop(signum, frame):
+        # shutdown() blocks until serve_forever() returns, so call it off the serving thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    warmup()
+    try:
+        server.serve_forever(poll_interval=0.5)
+    finally:
+        hub.close()
+        if not server.wait_idle(graceful_timeout):
+            print(f"⚠️ Worker {os.getpid()}: requests still running after {graceful_timeout}s, exiting anyway.")
+        server.server_close()
+        ingest.writer.stop(graceful_timeout)
+        jobs.pool.stop(graceful_timeout)
+        shutdown_lanes()
+        database.close_connections()
+
+
+def serve_builtin(args):
+    """Pure-Python fallback: threaded wsgiref server, pre-forked on POSIX."""
+    QuietRequestHandler.access_log = args.access_log
+    server = ThreadingWSGIServer((args.host, args.port), QuietRequestHandler)
+    server.set_app(app)
+    workers = args.workers if hasattr(os, "fork") else 1
+    print(f"🚀 Serving on http://{args.host}:{args.port} (builtin server, {workers} worker(s))")
+    if workers == 1:
+        _serve_worker(server, args.graceful_timeout)
+        return
+
+    # Workers must not inherit the parent's SQLite connections
+    database.close_connections()
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _serve_worker(server, args.graceful_timeout)
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        children.add(pid)
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    for _ in range(workers):
+        spawn()
+
+    deadline = None
+    while children:
+        if stopping and deadline is None:
+            deadline = time.monotonic() + args.graceful_timeout + 5
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            if deadline is not None and time.monotonic() > deadline:
+                for pid in children:
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                    except OSError:
+                        pass
+                deadline = float("inf")
+            time.sleep(0.2)
+            continue
+        children.discard(pid)
+        if not stopping:
+            # Keep the pool at full size if a worker dies
+            print(f"⚠️ Worker {pid} exited unexpectedly (status {status}); starting a new one.")
+            spawn()
+    server.server_close()
+    print("👋 Server stopped.")
+
+
+def serve_gunicorn(args):
+    """Pre-forked gunicorn workers with a thread pool each."""
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            for key, value in {
+                "bind": f"{args.host}:{args.port}",
+                "workers": args.workers,
+                "threads": args.threads,
+                "worker_class": "gthread",
+                "graceful_timeout": args.graceful_timeout,
+                "accesslog": "-" if args.access_log else None,
+                "post_fork": lambda server, worker: warmup(),
+                "worker_exit": lambda server, worker: stop_worker(),
+            }.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    database.close_connections()
+    Application().run()
+
+
+def serve_waitress(args):
+    """Single multi-threaded waitress process (no fork needed, so it runs on Windows)."""
+    from waitress import serve
+
+    warmup()
+    print(f"🚀 Serving on http://{args.host}:{args.port} (waitress, {args.threads} threads)")
+    try:
+        serve(app, host=args.host, port=args.port, threads=args.threads)
+    finally:
+        stop_worker()
+
+
+def pick_server(name):
+    """Resolve --server auto to the best server that is installed."""
+    if name != "auto":
+        return name
+    candidates = (("gunicorn", "gunicorn"),) if os.name == "posix" else ()
+    for server, module in candidates + (("waitress", "waitress"),):
+        try:
+            __import__(module)
+            return server
+        except ImportError:
+            continue
+    return "builtin"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the Finance Tracker web app.")
+    parser.add_argument("--host", default=os.environ.get("FINANCE_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("FINANCE_PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("FINANCE_WORKERS", os.cpu_count() or 1)),
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("FINANCE_THREADS", 8)),
+                        help="threads per worker for gunicorn/waitress (the builtin server uses one per connection)")
+    parser.add_argument("--server", choices=SERVERS, default="auto")
+    parser.add_argument("--graceful-timeout", type=float, default=30,
+                        help="seconds to let in-flight requests finish on shutdown")
+    parser.add_argument("--access-log", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+    if args.workers < 1 or args.threads < 1:
+        parser.error("--workers and --threads must be at least 1")
+
+    metrics.log_slow_queries()
+    # One-time schema setup, before any worker exists
+    database.initialize_schema()
+
+    server = pick_server(args.server)
+    {"gunicorn": serve_gunicorn, "waitress": serve_waitress, "builtin": serve_builtin}[server](args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
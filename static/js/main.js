@@ -33,26 +33,53 @@ async function loadSummary() {
     try {
         const response = await fetch('/api/summary');
         const data = await response.json();
-        
-        // Update summary cards if they exist
-        const incomeCard = document.querySelector('.card-primary .amount');
-        const expenseCard = document.querySelector('.card-danger .amount');
-        const balanceCard = document.querySelector('.card-success .amount');
-        
-        if (incomeCard) {
-            incomeCard.textContent = formatCurrency(data.total_income);
-        }
-        if (expenseCard) {
-            expenseCard.textContent = formatCurrency(data.total_expense);
-        }
-        if (balanceCard) {
-            balanceCard.textContent = formatCurrency(data.balance);
-        }
+        renderSummary(data);
     } catch (error) {
         console.error('Error loading summary:', error);
     }
 }
 
+// Update the summary cards and budget status from an /api/summary payload
+function renderSummary(data) {
+    const incomeCard = document.querySelector('.card-primary .amount');
+    const expenseCard = document.querySelector('.card-danger .amount');
+    const balanceCard = document.querySelector('.card-success .amount');
+
+    if (incomeCard) {
+        incomeCard.textContent = formatCurrency(data.total_income);
+    }
+    if (expenseCard) {
+        expenseCard.textContent = formatCurrency(data.total_expense);
+    }
+    if (balanceCard) {
+        balanceCard.textContent = formatCurrency(data.balance);
+    }
+    renderBudgetStatus(data.budget_status);
+}
+
+// Patch the budget blocks (dashboard and budget page) in place
+function renderBudgetStatus(status) {
+    document.querySelectorAll('[data-budget-status]').forEach(el => { el.hidden = !status; });
+    document.querySelectorAll('[data-budget-empty]').forEach(el => { el.hidden = !!status; });
+    if (!status) return;
+
+    const setText = (field, text) => document.querySelectorAll(`[data-budget-field="${field}"]`)
+        .forEach(el => { el.textContent = text; });
+    setText('budget', formatCurrency(status.budget));
+    setText('spent', formatCurrency(status.spent));
+    setText('remaining', formatCurrency(status.remaining));
+    setText('overrun', formatCurrency(Math.abs(status.remaining)));
+    setText('percent', status.percent_used.toFixed(1));
+    document.querySelectorAll('[data-budget-field="remaining"]').forEach(el => {
+        el.classList.toggle('exceeded', status.is_exceeded);
+        el.classList.toggle('available', !status.is_exceeded);
+    });
+    document.querySelectorAll('[data-budget-field="progress"]').forEach(el => {
+        el.style.width = `${Math.min(status.percent_used, 100)}%`;
+    });
+    document.querySelectorAll('[data-budget-exceeded]').forEach(el => { el.hidden = !status.is_exceeded; });
+}
+
 // Charts
 let monthlyChartInstance = null;
 let categoryChartInstance = null;
@@ -112,18 +139,20 @@ async function loadCategoryChart() {
     }
 }
 
-// Load transactions dynamically
-async function loadTransactions() {
+// Load one page of transactions dynamically (pass the previous page's next_cursor to continue)
+async function loadTransactions(after = null, limit = 50) {
     try {
-        const response = await fetch('/api/transactions');
-        const transactions = await response.json();
+        const params = new URLSearchParams({ limit: limit });
+        if (after) params.set('after', after);
+        const response = await fetch(`/api/transactions?${params}`);
+        const page = await response.json();
         
         // This would be used to populate a dynamic table
-        console.log('Transactions loaded:', transactions);
-        return transactions;
+        console.log('Transactions loaded:', page.transactions);
+        return page;
     } catch (error) {
         console.error('Error loading transactions:', error);
-        return [];
+        return { transactions: [], next_cursor: null };
     }
 }
 
@@ -133,7 +162,22 @@ async function loadExpensesByCategory() {
         const response = await fetch('/api/expenses-by-category');
         const expenses = await response.json();
         
-        console.log('Expenses by category:', expenses);
+        const list = document.querySelector('[data-live="expenses-by-category"]');
+        if (list && Array.isArray(expenses)) {
+            list.replaceChildren(...expenses.map(e => {
+                const item = document.createElement('div');
+                item.className = 'category-item';
+                const name = document.createElement('span');
+                name.className = 'category-name';
+                name.textContent = e.category;
+                const amount = document.createElement('span');
+                amount.className = 'category-amount';
+                amount.textContent = 'Ksh ' + Number(e.amount).toFixed(2);
+                item.append(name, amount);
+                return item;
+            }));
+            list.closest('[data-live-section]')?.toggleAttribute('hidden', expenses.length === 0);
+        }
         return expenses;
     } catch (error) {
         console.error('Error loading expenses:', error);
@@ -141,13 +185,136 @@ async function loadExpensesByCategory() {
     }
 }
 
+// Live updates -------------------------------------------------------------
+
+// Build a transaction table row; full rows (transactions page) carry the ID and actions
+function renderTransactionRow(t, full) {
+    const row = document.createElement('tr');
+    row.dataset.id = t.id;
+    const cells = [];
+    if (full) cells.push(['id', t.id]);
+    cells.push(['date', t.date.split(' ')[0]], ['category', t.category], ['type', null],
+               ['amount', 'Ksh ' + Number(t.amount).toFixed(2)]);
+    cells.forEach(([field, text]) => {
+        const cell = row.insertCell();
+        cell.dataset.field = field;
+        if (field === 'type') {
+            const label = t.type.charAt(0).toUpperCase() + t.type.slice(1);
+            if (full) {
+                const badge = document.createElement('span');
+                badge.className = 'type-badge';
+                badge.textContent = label;
+                cell.appendChild(badge);
+            } else {
+                cell.textContent = label;
+            }
+        } else {
+            cell.textContent = text;
+        }
+    });
+    if (full) {
+        const actions = row.insertCell();
+        actions.className = 'actions';
+        actions.innerHTML = `<button onclick="editTransaction(${Number(t.id)})" class="btn-small btn-edit">✏️ Edit</button>
+                        <button onclick="deleteTransaction(${Number(t.id)})" class="btn-small btn-delete">🗑️ Delete</button>`;
+    }
+    row.className = t.type === 'income' ? 'income-row' : 'expense-row';
+    return row;
+}
+
+// Apply a transaction delta to every table on the page
+function applyTransactionEvent(event) {
+    const t = event.transaction;
+    document.querySelectorAll(`tr[data-id="${Number(t.id)}"]`).forEach(row => {
+        if (event.action === 'deleted') {
+            row.remove();
+        } else if (event.action === 'updated') {
+            const full = row.closest('[data-live-table]')?.dataset.liveTable === 'transactions'
+                || row.querySelector('[data-field="id"]') !== null;
+            row.replaceWith(renderTransactionRow(t, full));
+        }
+    });
+    if (event.action !== 'added') return;
+    document.querySelectorAll('tbody[data-live-table]').forEach(tbody => {
+        if (tbody.querySelector(`tr[data-id="${Number(t.id)}"]`)) return;
+        tbody.prepend(renderTransactionRow(t, tbody.dataset.liveTable === 'transactions'));
+        const limit = Number(tbody.dataset.liveLimit || 0);
+        while (limit && tbody.rows.length > limit) tbody.deleteRow(-1);
+        tbody.closest('[data-live-section]')?.removeAttribute('hidden');
+        document.querySelectorAll('[data-live-empty]').forEach(el => el.setAttribute('hidden', ''));
+    });
+}
+
+// Reload the newest rows of live tables after imports or outside changes
+async function refreshLiveTables() {
+    for (const tbody of document.querySelectorAll('tbody[data-live-table]')) {
+        const page = await loadTransactions(null, Number(tbody.dataset.liveLimit || 50));
+        const full = tbody.dataset.liveTable === 'transactions';
+        tbody.replaceChildren(...page.transactions.map(t => renderTransactionRow(t, full)));
+        tbody.closest('[data-live-section]')?.toggleAttribute('hidden', page.transactions.length === 0);
+        document.querySelectorAll('[data-live-empty]').forEach(el => el.toggleAttribute('hidden', page.transactions.length > 0));
+    }
+}
+
+// Charts and category totals are ETag-cached, so refetching them is cheap
+let dashboardRefreshTimer = null;
+function scheduleDashboardRefresh() {
+    if (!document.getElementById('monthlyChart')) return;
+    clearTimeout(dashboardRefreshTimer);
+    dashboardRefreshTimer = setTimeout(() => {
+        loadMonthlyChart();
+        loadCategoryChart();
+        loadExpensesByCategory();
+    }, 500);
+}
+
+// Poll for changes while live updates are unavailable
+let livePollTimer = null;
+function pollLiveUpdates() {
+    if (livePollTimer) return;
+    livePollTimer = setInterval(() => {
+        if (document.querySelector('.summary-cards')) loadSummary();
+        refreshLiveTables();
+        scheduleDashboardRefresh();
+    }, 30000);
+}
+
+// Subscribe to /api/events; falls back to polling where EventSource is
+// missing or the server turns the stream away (503 when it is at capacity)
+function connectLiveUpdates() {
+    if (!window.EventSource) {
+        pollLiveUpdates();
+        return;
+    }
+    const source = new EventSource('/api/events');
+    source.addEventListener('open', () => {
+        clearInterval(livePollTimer);
+        livePollTimer = null;
+    });
+    source.addEventListener('error', () => {
+        // A dropped stream reconnects on its own; a refused one is closed for good
+        if (source.readyState !== EventSource.CLOSED) return;
+        pollLiveUpdates();
+        setTimeout(connectLiveUpdates, 60000);
+    });
+    source.addEventListener('summary', e => {
+        renderSummary(JSON.parse(e.data));
+        scheduleDashboardRefresh();
+    });
+    source.addEventListener('transaction', e => applyTransactionEvent(JSON.parse(e.data)));
+    source.addEventListener('import', () => refreshLiveTables());
+    source.addEventListener('refresh', () => {
+        loadSummary();
+        refreshLiveTables();
+        scheduleDashboardRefresh();
+    });
+}
+
 // Initialize on page load
 document.addEventListener('DOMContentLoaded', function() {
     // Load summary on dashboard
     if (document.querySelector('.summary-cards')) {
         loadSummary();
-        // Refresh summary every 30 seconds
-        setInterval(loadSummary, 30000);
         // Load charts if on dashboard
         if (document.getElementById('monthlyChart')) {
             loadMonthlyChart();
@@ -155,6 +322,9 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
+    // Totals, budget status and transaction rows are pushed by the server
+    connectLiveUpdates();
+
     // Add smooth scrolling for all links
     document.querySelectorAll('a[href^="#"]').forEach(anchor => {
         anchor.addEventListener('click', function (e) {
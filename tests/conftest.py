@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root, which is not a package on sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    """A fresh, migrated database for the test."""
+    monkeypatch.setattr(database, "DB_NAME", str(tmp_path / "finance.db"))
+    database.close_connections()
+    database.initialize_schema()
+    yield
+    database.close_connections()
+
+
+@pytest.fixture
+def client(ledger, monkeypatch):
+    """A Flask test client on a fresh ledger, without job workers or cached responses."""
+    from app import app, response_cache
+
+    monkeypatch.setitem(app.config, "JOB_WORKERS", 0)
+    response_cache.clear()
+    with app.test_client() as client:
+        yield client
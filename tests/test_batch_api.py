@@ -0,0 +1,80 @@
+import pytest
+
+import database
+
+
+def seed(count=3):
+    database.add_bulk_transactions([("expense", "Food", float(i + 1), f"2025-01-0{i + 1} 10:00:00")
+                                    for i in range(count)])
+    with database.get_connection() as conn:
+        return [row[0] for row in conn.execute("SELECT id FROM transactions ORDER BY id")]
+
+
+def ledger_state():
+    with database.get_connection() as conn:
+        return conn.execute("SELECT id, category, amount FROM transactions ORDER BY id").fetchall()
+
+
+def post(client, operations, **options):
+    return client.post("/api/transactions/batch", json={"operations": operations, **options})
+
+
+def mixed_batch(ids, missing):
+    return [
+        {"op": "add", "type": "income", "category": "Salary", "amount": 900, "date": "2025-01-09 09:00:00"},
+        {"op": "update", "id": ids[0], "category": "Groceries"},
+        {"op": "update", "id": missing, "amount": 5},
+        {"op": "delete", "id": ids[1]},
+        {"op": "delete", "id": missing},
+    ]
+
+
+def test_atomic_batch_with_a_missing_row_is_a_409(client):
+    ids = seed()
+    before = ledger_state()
+    response = post(client, mixed_batch(ids, missing=ids[-1] + 100))
+    assert response.status_code == 409
+    body = response.get_json()
+    assert body["applied"] is False and body["not_found"] == 2
+    assert [r["status"] for r in body["results"]] == ["ok", "ok", "not_found", "ok", "not_found"]
+    # Nothing was committed, so the add reports no id
+    assert body["results"][0]["id"] is None
+    assert ledger_state() == before
+    assert database.verify_rollups() == []
+
+
+def test_non_atomic_batch_reports_each_operation(client):
+    ids = seed()
+    response = post(client, mixed_batch(ids, missing=ids[-1] + 100), atomic=False)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["applied"] is True
+    assert (body["added"], body["updated"], body["deleted"], body["not_found"]) == (1, 1, 1, 2)
+    assert [r["status"] for r in body["results"]] == ["ok", "ok", "not_found", "ok", "not_found"]
+    new_id = body["results"][0]["id"]
+    assert ledger_state() == [(ids[0], "Groceries", 1.0), (ids[2], "Food", 3.0), (new_id, "Salary", 900.0)]
+    assert database.verify_rollups() == []
+
+
+def test_atomic_batch_applies_when_every_row_exists(client):
+    ids = seed()
+    response = post(client, [{"op": "update", "id": i, "amount": 10} for i in ids] + [{"op": "delete", "id": ids[0]}])
+    assert response.status_code == 200
+    assert response.get_json()["updated"] == 3
+    assert [row[2] for row in ledger_state()] == [10.0, 10.0]
+
+
+@pytest.mark.parametrize("invalid", [
+    {"op": "rename", "id": 1},
+    {"op": "update", "id": 1},
+    {"op": "delete", "id": "1"},
+    {"op": "add", "type": "income", "category": "Salary", "amount": -1},
+])
+def test_an_invalid_operation_applies_nothing(client, invalid):
+    ids = seed()
+    before = ledger_state()
+    response = post(client, [{"op": "delete", "id": ids[0]}, invalid])
+    assert response.status_code == 400
+    assert response.get_json()["errors"][0]["index"] == 1
+    assert response.get_json()["success"] is False
+    assert ledger_state() == before
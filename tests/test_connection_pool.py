@@ -0,0 +1,59 @@
+import threading
+
+import database
+
+
+def run_threads(count, target, concurrent):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    if concurrent:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    else:
+        for thread in threads:
+            thread.start()
+            thread.join()
+
+
+def query():
+    with database.get_connection() as conn:
+        conn.execute("SELECT COUNT(*) FROM transactions").fetchone()
+
+
+def test_short_lived_threads_reuse_connections(ledger):
+    run_threads(200, query, concurrent=False)
+    # One thread at a time: each picks up the previous thread's connection
+    assert len(database._pool) <= 2
+
+
+def test_pool_stays_bounded_with_concurrent_threads(ledger):
+    barrier = threading.Barrier(20)
+
+    def query_together():
+        with database.get_connection() as conn:
+            barrier.wait()
+            conn.execute("SELECT COUNT(*) FROM transactions").fetchone()
+
+    for _ in range(10):
+        run_threads(20, query_together, concurrent=True)
+    assert len(database._pool) <= database.IDLE_LIMIT + 1
+
+
+def test_open_transaction_is_rolled_back_when_thread_exits(ledger):
+    def abandon():
+        conn = database._pooled_connection()
+        conn.execute("INSERT INTO transactions (type, category, amount, date) "
+                     "VALUES ('expense', 'Food', 1, '2025-01-01 00:00:00')")
+
+    run_threads(1, abandon, concurrent=False)
+    with database.get_connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == 0
+
+
+def test_close_connections_closes_idle_connections(ledger):
+    run_threads(5, query, concurrent=True)
+    database.close_connections()
+    assert not database._pool
+    assert database._idle.empty()
@@ -0,0 +1,125 @@
+import io
+
+import pandas as pd
+import pytest
+
+import csv_io
+import database
+
+
+def prepare(lines):
+    chunk = pd.read_csv(io.StringIO("date,type,category,amount\n" + "\n".join(lines)), dtype=str,
+                        keep_default_na=False)
+    return csv_io._prepare_chunk(pd, chunk)
+
+
+def test_fallback_formats_keep_wall_clock_time():
+    rows, rejects = prepare([
+        "2025-01-02 10:00:00,expense,Food,100",
+        "2025-01-03T10:00:00+03:00,expense,Food,200",
+        "2025-01-04T23:30:00+03:00,income,Salary,300",
+        "not a date,expense,Food,400",
+    ])
+    assert [row[3] for row in rows] == ["2025-01-02 10:00:00", "2025-01-03 10:00:00", "2025-01-04 23:30:00"]
+    assert rejects == [(5, "invalid date")]
+
+
+def test_mixed_offsets_are_converted_to_utc():
+    rows, rejects = prepare([
+        "2025-01-03T10:00:00+03:00,expense,Food,200",
+        "2025-01-03T10:00:00Z,expense,Food,300",
+        "Jan 4 2025 07:30,expense,Food,400",
+        "31/02/2025,expense,Food,500",
+    ])
+    assert [row[3] for row in rows] == ["2025-01-03 07:00:00", "2025-01-03 10:00:00", "2025-01-04 07:30:00"]
+    assert rejects == [(5, "invalid date")]
+
+
+STATEMENT = """date,type,category,amount,reference
+2025-03-01 09:00:00,income,Salary,50000,TX-1
+2025-03-02 12:00:00,expense,Food,1200,TX-2
+2025-03-03 08:00:00,expense,Rent,15000,
+"""
+
+
+def upload(text, mode):
+    return csv_io.import_csv(io.BytesIO(text.encode()), on_duplicate=mode)
+
+
+def ledger_rows():
+    with database.get_connection() as conn:
+        return conn.execute("SELECT type, category, amount, date, external_ref FROM transactions ORDER BY id").fetchall()
+
+
+def test_skip_mode_counts(ledger):
+    assert upload(STATEMENT, "skip")["imported"] == 3
+    result = upload(STATEMENT + "2025-03-04 10:00:00,expense,Fuel,900,TX-3\n", "skip")
+    assert (result["imported"], result["updated"], result["duplicates"]) == (1, 0, 3)
+    assert len(ledger_rows()) == 4
+
+
+def test_update_mode_corrects_rows_by_reference(ledger):
+    upload(STATEMENT, "skip")
+    corrected = STATEMENT.replace("Food,1200,TX-2", "Groceries,1250,TX-2")
+    result = upload(corrected, "update")
+    assert (result["imported"], result["updated"], result["duplicates"]) == (0, 1, 3)
+    assert ledger_rows()[1] == ("expense", "Groceries", 1250.0, "2025-03-02 12:00:00", "TX-2")
+    assert database.verify_rollups() == []
+
+    # Unchanged rows are not rewritten
+    result = upload(corrected, "update")
+    assert (result["imported"], result["updated"], result["duplicates"]) == (0, 0, 3)
+
+    # The same correction in skip mode leaves the ledger alone
+    result = upload(STATEMENT, "skip")
+    assert (result["imported"], result["updated"], result["duplicates"]) == (0, 0, 3)
+    assert ledger_rows()[1][1:3] == ("Groceries", 1250.0)
+
+
+def test_fail_mode_keeps_nothing_on_a_duplicate(ledger):
+    upload(STATEMENT, "skip")
+    with pytest.raises(database.DuplicateTransactionError):
+        upload("date,type,category,amount,reference\n"
+               "2025-03-05 10:00:00,expense,Fuel,900,TX-4\n"
+               "2025-03-06 10:00:00,expense,Food,300,TX-1\n", "fail")
+    assert len(ledger_rows()) == 3
+    result = upload("date,type,category,amount\n2025-03-05 10:00:00,expense,Fuel,900\n", "fail")
+    assert (result["imported"], result["updated"], result["duplicates"]) == (1, 0, 0)
+
+
+def hashes():
+    with database.get_connection() as conn:
+        return conn.execute("SELECT id, content_hash FROM transactions ORDER BY id").fetchall()
+
+
+def test_manual_rows_are_hashed_like_imported_ones(ledger):
+    database.add_transaction("expense", "Food", 300)
+    (_, date, category, amount, trans_type), = database.get_all_transactions()
+    assert hashes()[0][1] == database.content_hash(trans_type, category, amount, date)
+
+    result = upload(f"date,type,category,amount\n{date},expense,Food,300\n", "skip")
+    assert (result["imported"], result["duplicates"]) == (0, 1)
+
+
+def test_edits_recompute_the_hash(ledger):
+    upload(STATEMENT, "skip")
+    transaction_id = hashes()[1][0]
+    database.update_transaction_by_id(transaction_id, "expense", "Groceries", 1250)
+    assert hashes()[1][1] == database.content_hash("expense", "Groceries", 1250.0, "2025-03-02 12:00:00", "TX-2")
+
+    database.apply_transaction_batch([("update", (transaction_id, None, None, 1300))])
+    assert hashes()[1][1] == database.content_hash("expense", "Groceries", 1300.0, "2025-03-02 12:00:00", "TX-2")
+
+
+def test_first_identical_row_holds_the_hash(ledger):
+    row = ("expense", "Food", 300.0, "2025-03-01 12:00:00")
+    database.apply_transaction_batch([("add", row), ("add", row), ("add", row)])
+    (first, held), (second, none), (third, _) = hashes()
+    assert held == database.content_hash(*row) and none is None
+
+    # The hash moves on to the next identical row when its holder changes or goes
+    database.update_transaction_by_id(first, "expense", "Fuel", 300.0)
+    assert hashes()[1] == (second, held)
+    database.delete_transaction_by_id(second)
+    assert hashes()[1] == (third, held)
+    assert upload("date,type,category,amount\n2025-03-01 12:00:00,expense,Food,300\n", "skip")["duplicates"] == 1
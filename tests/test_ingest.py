@@ -0,0 +1,37 @@
+import sqlite3
+
+import pytest
+
+import database
+import ingest
+
+ROW = ("expense", "Food", 12.5, "2025-01-01 08:00:00", None)
+
+
+def test_writer_commits_rows(ledger):
+    writer = ingest.GroupCommitWriter()
+    try:
+        ids = writer.write([ROW, ROW[:4] + ("REF1",)], timeout=5)
+        assert len(ids) == 2 and all(ids)
+        assert writer.write([ROW[:4] + ("REF1",)], timeout=5) == [None]
+    finally:
+        writer.stop(timeout=5)
+
+
+def test_dead_writer_fails_requests_and_is_restarted(ledger, monkeypatch):
+    connect = database.connect
+
+    def broken_connect():
+        raise sqlite3.OperationalError("unable to open database file")
+
+    monkeypatch.setattr(database, "connect", broken_connect)
+    writer = ingest.GroupCommitWriter()
+    with pytest.raises(sqlite3.OperationalError):
+        # Fails at once instead of waiting out the timeout
+        writer.submit([ROW]).result(timeout=5)
+
+    monkeypatch.setattr(database, "connect", connect)
+    try:
+        assert all(writer.write([ROW], timeout=5))
+    finally:
+        writer.stop(timeout=5)
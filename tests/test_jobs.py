@@ -0,0 +1,48 @@
+import io
+
+import pytest
+
+import database
+import jobs
+
+CSV = b"date,type,category,amount\n2025-03-01 09:00:00,income,Salary,50000\n2025-03-02 12:00:00,expense,Food,1200\n"
+
+
+def transaction_count():
+    with database.get_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+
+
+def requeue(job_id):
+    # What requeue_stale_jobs does once the heartbeat is STALE_AFTER old
+    with database.transaction() as conn:
+        conn.execute("UPDATE jobs SET status = 'queued', worker = NULL WHERE id = ?", (job_id,))
+
+
+@pytest.mark.parametrize("mode", ["skip", "fail"])
+def test_requeued_import_does_not_commit_twice(ledger, mode):
+    job_id = jobs.submit_job("import", {"mode": mode}, upload=io.BytesIO(CSV))
+    stale = jobs.claim_job("worker-1")
+    requeue(job_id)
+    current = jobs.claim_job("worker-2")
+
+    # The first run resumes after losing its claim: nothing is imported or recorded
+    assert jobs.run_job(stale) == "failed"
+    assert transaction_count() == 0
+    assert jobs.get_job(job_id)["status"] == "running"
+
+    assert jobs.run_job(current) == "done"
+    assert transaction_count() == 2
+    job = jobs.get_job(job_id)
+    assert (job["status"], job["attempts"], job["result"]["imported"]) == ("done", 2, 2)
+
+
+def test_import_commit_refreshes_the_heartbeat(ledger):
+    # No background beats: the import's own commit must keep the job from looking stale
+    job_id = jobs.submit_job("import", {"mode": "fail"}, upload=io.BytesIO(CSV))
+    job = jobs.claim_job("worker-1")
+    with database.transaction() as conn:
+        conn.execute("UPDATE jobs SET heartbeat_at = '2000-01-01 00:00:00' WHERE id = ?", (job_id,))
+    jobs._run_import(jobs.JobContext(job))
+    assert transaction_count() == 2
+    assert jobs.requeue_stale_jobs() == 0
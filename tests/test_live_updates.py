@@ -0,0 +1,55 @@
+import threading
+
+from app import app
+
+
+class Stream(threading.Thread):
+    """An /api/events client on its own thread, as on a real server, held open until close()."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.opened = threading.Event()
+        self.done = threading.Event()
+        self.status = None
+
+    def run(self):
+        response = app.test_client().get("/api/events", buffered=False)
+        self.status = response.status_code
+        self.opened.set()
+        self.done.wait(10)
+        response.close()
+
+    def close(self):
+        self.done.set()
+        self.join(10)
+
+
+def open_stream():
+    stream = Stream()
+    stream.start()
+    stream.opened.wait(10)
+    return stream
+
+
+def test_event_streams_are_capped(client):
+    streams = [open_stream() for _ in range(app.config['LIVE_UPDATE_CLIENTS'])]
+    try:
+        assert [s.status for s in streams] == [200] * len(streams)
+
+        refused = client.get("/api/events")
+        assert refused.status_code == 503
+        assert refused.headers["Retry-After"] == "60"
+
+        # A disconnecting client frees its slot
+        streams.pop().close()
+        streams.append(open_stream())
+        assert streams[-1].status == 200
+    finally:
+        for stream in streams:
+            stream.close()
+
+
+def test_empty_transaction_list_renders_a_live_table(client):
+    page = client.get("/transactions").get_data(as_text=True)
+    assert 'data-live-table="transactions"' in page
+    assert "data-live-empty" in page
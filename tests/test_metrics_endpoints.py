@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import metrics
+from app import app
+
+
+@pytest.mark.parametrize("path", ["/metrics", "/debug/perf"])
+def test_hidden_without_token_outside_debug(client, monkeypatch, path):
+    monkeypatch.setattr(metrics, "TOKEN", None)
+    assert client.get(path).status_code == 404
+
+
+@pytest.mark.parametrize("path", ["/metrics", "/debug/perf"])
+def test_token_required_when_set(client, monkeypatch, path):
+    monkeypatch.setattr(metrics, "TOKEN", "s3cret")
+    assert client.get(path, headers={"Authorization": "Bearer wrong"}).status_code == 404
+    assert client.get(path, headers={"Authorization": "Bearer s3cret"}).status_code == 200
+    assert client.get(path + "?token=s3cret").status_code == 200
+
+
+def test_debug_mode_allows_access_without_token(client, monkeypatch):
+    monkeypatch.setattr(metrics, "TOKEN", None)
+    monkeypatch.setattr(app, "testing", True)
+    client.get("/api/summary")
+    perf = client.get("/debug/perf").get_json()
+    assert any(route["route"] == "/api/summary" for route in perf["routes"])
+
+
+def test_cli_tools_do_not_print_slow_queries(tmp_path):
+    # A subprocess, since pytest's own log capture would hide a stray warning
+    script = (f"import database, metrics; database.DB_NAME = {str(tmp_path / 'finance.db')!r}; "
+              "metrics.SLOW_QUERY_MS = 0; database.initialize_schema(); database.get_all_transactions()")
+    result = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.dirname(__file__)),
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stderr == ""
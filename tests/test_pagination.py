@@ -0,0 +1,66 @@
+import pytest
+
+import database
+
+# Several rows share a timestamp, so pages must break ties on id
+ROWS = [("expense" if i % 3 else "income", f"Category {i % 2}", float(i + 1), f"2025-01-{i // 4 + 1:02d} 10:00:00")
+        for i in range(10)]
+
+
+@pytest.fixture
+def rows(ledger):
+    database.add_bulk_transactions(ROWS)
+    with database.get_connection() as conn:
+        return conn.execute("SELECT id, date, category, amount, type FROM transactions "
+                            "ORDER BY date DESC, id DESC").fetchall()
+
+
+def walk(limit, **filters):
+    pages, after = [], None
+    while True:
+        page, after = database.get_transactions_page(limit=limit, after=after, **filters)
+        pages.append(page)
+        if after is None:
+            return pages
+
+
+@pytest.mark.parametrize("limit", [1, 3, 4, 5, 10, 11])
+def test_pages_cover_every_row_once(rows, limit):
+    pages = walk(limit)
+    assert [row for page in pages for row in page] == rows
+    assert all(len(page) == limit for page in pages[:-1])
+    # A last page is never empty, even when the rows divide evenly into pages
+    assert 0 < len(pages[-1]) <= limit
+
+
+def test_cursor_keeps_filters(rows):
+    pages = walk(2, transaction_type="expense", category="Category 1", start_date="2025-01-02")
+    expected = [row for row in rows if row[4] == "expense" and row[2] == "Category 1" and row[1] >= "2025-01-02"]
+    assert [row for page in pages for row in page] == expected
+
+
+def test_limit_is_clamped(rows, monkeypatch):
+    monkeypatch.setattr(database, "MAX_PAGE_SIZE", 4)
+    assert len(database.get_transactions_page(limit=0)[0]) == 1
+    assert len(database.get_transactions_page(limit=1000)[0]) == 4
+
+
+def test_rows_added_between_pages_do_not_shift_the_next_page(rows):
+    first, after = database.get_transactions_page(limit=3)
+    database.add_transaction("income", "Salary", 100)
+    second, _ = database.get_transactions_page(limit=3, after=after)
+    assert second == rows[3:6]
+
+
+def test_api_follows_next_cursor(client, rows):
+    first = client.get("/api/transactions?limit=4").get_json()
+    second = client.get(f"/api/transactions?limit=4&after={first['next_cursor']}").get_json()
+    assert [t["id"] for t in first["transactions"] + second["transactions"]] == [row[0] for row in rows[:8]]
+
+
+@pytest.mark.parametrize("cursor", ["garbage", "W10", database.encode_cursor("2025-01-01", 1)[:-3], "WyJ4IiwieSJd"])
+def test_bad_cursor_is_a_400(client, cursor):
+    response = client.get(f"/api/transactions?after={cursor}")
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Invalid cursor"
+    assert client.get(f"/transactions?after={cursor}").status_code == 400
@@ -0,0 +1,38 @@
+import io
+import os
+import pstats
+
+import pytest
+
+import profiling
+
+
+@pytest.fixture(autouse=True)
+def profile_settings(tmp_path, monkeypatch):
+    monkeypatch.setenv("FINANCE_PROFILE_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setattr(profiling, "TOKEN", "s3cret")
+
+
+def profiled_functions(tmp_path, response):
+    name = response.headers["X-Profile-File"]
+    stats = pstats.Stats(os.path.join(tmp_path, "profiles", name))
+    return {function for _, _, function in stats.stats}
+
+
+def test_profile_includes_work_run_on_a_lane(client, tmp_path):
+    response = client.get("/api/summary", headers={"X-Profile": "s3cret"})
+    assert response.status_code == 200
+    functions = profiled_functions(tmp_path, response)
+    assert {"api_summary", "get_summary", "check_monthly_budget"} <= functions
+
+
+def test_profile_includes_csv_import(client, tmp_path):
+    csv = b"date,type,category,amount\n2025-01-02,expense,Food,100\n"
+    response = client.post("/api/import-csv?profile=s3cret",
+                           data={"file": (io.BytesIO(csv), "statement.csv")})
+    assert response.status_code == 200
+    assert "import_csv" in profiled_functions(tmp_path, response)
+
+
+def test_trigger_needs_the_token(client):
+    assert "X-Profile-File" not in client.get("/api/summary", headers={"X-Profile": "1"}).headers
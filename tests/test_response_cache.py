@@ -0,0 +1,55 @@
+import sqlite3
+
+import pytest
+
+import database
+
+
+def etag(client, path="/api/summary"):
+    response = client.get(path)
+    assert response.status_code == 200
+    return response.headers["ETag"]
+
+
+def test_conditional_get_is_a_304_until_a_write(client):
+    tag = etag(client)
+    assert client.get("/api/summary", headers={"If-None-Match": tag}).status_code == 304
+
+    database.add_transaction("income", "Salary", 500)
+    response = client.get("/api/summary", headers={"If-None-Match": tag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != tag
+    assert response.get_json()["total_income"] == 500
+
+
+@pytest.mark.parametrize("write", [
+    lambda: database.add_bulk_transactions(
+        [("expense", "Food", float(i + 1), f"2025-01-01 10:{i // 60:02d}:{i % 60:02d}") for i in range(150)]),
+    lambda: database.set_monthly_budget("2025-01", 1000),
+    lambda: database.apply_transaction_batch([("add", ("expense", "Food", 5.0, "2025-01-01 10:00:00"))]),
+], ids=["bulk insert", "budget", "batch"])
+def test_every_write_path_changes_the_etag(client, write):
+    tag = etag(client)
+    write()
+    assert etag(client) != tag
+
+
+def test_writes_from_another_process_change_the_etag(client):
+    tag = etag(client, "/api/transactions")
+    # A plain connection, as another worker or the CLI would have: the triggers bump the version
+    conn = sqlite3.connect(database.DB_NAME)
+    with conn:
+        conn.execute("INSERT INTO transactions (type, category, amount, date) "
+                     "VALUES ('expense', 'Food', 1, '2025-01-01 10:00:00')")
+    conn.close()
+    response = client.get("/api/transactions", headers={"If-None-Match": tag})
+    assert response.status_code == 200
+    assert len(response.get_json()["transactions"]) == 1
+
+
+def test_errors_are_not_cached(client):
+    # A cached error body would come back the second time as a 200
+    for _ in range(2):
+        response = client.get("/api/transactions?after=garbage")
+        assert response.status_code == 400
+        assert "ETag" not in response.headers
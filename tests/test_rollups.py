@@ -0,0 +1,81 @@
+import pytest
+
+import database
+
+ROWS = [
+    ("income", "Salary", 50000.0, "2025-01-01 09:00:00"),
+    ("expense", "Food", 1200.0, "2025-01-02 12:00:00"),
+    ("expense", "Rent", 15000.0, "2025-01-05 08:00:00"),
+    ("expense", "Food", 800.0, "2025-02-03 19:30:00"),
+    ("income", "Freelance", 7000.0, "2025-02-10 10:00:00"),
+]
+
+
+def bulk_rows(count):
+    return [(("income", "expense")[i % 2], f"Category {i % 7}", float(i % 97 + 1),
+             f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d} 10:00:00") for i in range(count)]
+
+
+def direct_summary():
+    with database.get_connection() as conn:
+        income, expense = conn.execute("""
+            SELECT COALESCE(SUM(CASE WHEN type = 'income' THEN amount END), 0),
+                   COALESCE(SUM(CASE WHEN type = 'expense' THEN amount END), 0)
+            FROM transactions
+        """).fetchone()
+    return pytest.approx((income, expense, income - expense))
+
+
+def assert_rollups_exact():
+    assert database.verify_rollups() == []
+    assert database.get_summary() == direct_summary()
+
+
+def test_rollups_follow_single_row_writes(ledger):
+    for trans_type, category, amount, _ in ROWS:
+        database.add_transaction(trans_type, category, amount)
+    assert_rollups_exact()
+
+    with database.get_connection() as conn:
+        ids = [row[0] for row in conn.execute("SELECT id FROM transactions ORDER BY id")]
+    assert database.update_transaction_by_id(ids[1], "expense", "Transport", 450.0)
+    assert database.update_transaction_by_id(ids[0], "expense", "Salary", 50000.0)
+    assert_rollups_exact()
+
+    assert database.delete_transaction_by_id(ids[2])
+    assert_rollups_exact()
+
+
+@pytest.mark.parametrize("count", [10, 5000])
+def test_rollups_follow_bulk_inserts(ledger, count):
+    # Below and above BULK_INSERT_MIN_ROWS: per-row triggers vs one delta per batch
+    database.add_bulk_transactions(ROWS)
+    generation = database.get_ledger_version()[0]
+    counts = database.add_bulk_transactions(bulk_rows(count))
+    assert counts["inserted"] == count
+    assert_rollups_exact()
+    assert database.get_ledger_version()[0] > generation
+
+    with database.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN "
+                            f"({', '.join('?' * len(database.INSERT_TRIGGERS))})",
+                            database.INSERT_TRIGGERS).fetchone()[0] == len(database.INSERT_TRIGGERS)
+    database.add_transaction("expense", "Food", 10.0)
+    assert_rollups_exact()
+
+
+def test_daily_balances_follow_bulk_inserts(ledger):
+    database.add_bulk_transactions(ROWS)
+    assert database.balance_at("2025-01-31")["balance"] == pytest.approx(50000 - 1200 - 15000)
+    # A backdated bulk import moves every later running total
+    backdated = [("expense", "Fees", 1.0, f"2024-12-31 10:{i // 60:02d}:{i % 60:02d}") for i in range(200)]
+    database.add_bulk_transactions(backdated)
+    assert database.balance_at("2025-01-31")["balance"] == pytest.approx(50000 - 1200 - 15000 - 200)
+
+
+def test_failed_bulk_insert_keeps_triggers(ledger):
+    database.add_bulk_transactions(ROWS)
+    with pytest.raises(database.DuplicateTransactionError):
+        database.add_bulk_transactions(bulk_rows(200) + ROWS[:1], on_duplicate="fail")
+    database.add_transaction("income", "Gifts", 100.0)
+    assert_rollups_exact()
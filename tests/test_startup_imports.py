@@ -0,0 +1,17 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("reportlab", "numpy", "pandas", "matplotlib")
+
+
+@pytest.mark.parametrize("module", ["report_generator", "analysis", "finance_tracker"])
+def test_entry_points_defer_heavy_imports(module):
+    script = (f"import sys, {module}\n"
+              f"print(' '.join(m for m in {HEAVY!r} if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=ROOT), check=True)
+    assert result.stdout.strip() == ""